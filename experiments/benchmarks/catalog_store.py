@@ -0,0 +1,141 @@
+"""
+Catalog Startup Benchmark
+Compares what src/app/main.py used to do at import (pandas read of both CSVs
+plus a merge on a string-replaced key) with opening the memory-mapped
+catalog store, each in a fresh process: wall time, peak RSS, and the cost of
+100 product lookups and one attribute query.
+
+Usage:
+    python experiments/benchmarks/catalog_store.py [--styles data/styles.csv --images data/images.csv]
+    python experiments/benchmarks/catalog_store.py --synthetic 44000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.catalog_store import build_catalog_store
+
+PROJECT_ROOT = str(Path(__file__).parent.parent.parent)
+
+# ru_maxrss of a child can report the parent's peak (it survives fork/exec), so read VmHWM
+PEAK_RSS = """
+import resource
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+"""
+
+PANDAS_MERGE = PEAK_RSS + """
+import json, sys, time
+started = time.perf_counter()
+import pandas as pd
+images_df = pd.read_csv(sys.argv[1])
+styles_df = pd.read_csv(sys.argv[2], on_bad_lines="skip", quotechar='"')
+merged_df = pd.merge(images_df, styles_df, left_on=images_df["filename"].str.replace(".jpg", ""),
+                     right_on="id", how="inner")
+load = time.perf_counter() - started
+ids = merged_df["id"].sample(100, random_state=0).tolist()
+started = time.perf_counter()
+for i in ids:
+    merged_df[merged_df["id"] == i].iloc[0].to_dict()
+lookups = time.perf_counter() - started
+started = time.perf_counter()
+len(merged_df[(merged_df["season"] == "Winter") & (merged_df["gender"] == "Men")])
+query = time.perf_counter() - started
+print(json.dumps({"load_s": load, "lookup_100_s": lookups, "query_s": query,
+                  "max_rss_mb": peak_rss_mb()}))
+"""
+
+STORE_OPEN = PEAK_RSS + """
+import json, sys, time
+sys.path.insert(0, sys.argv[2])
+started = time.perf_counter()
+from src.catalog_store import CatalogStore
+catalog = CatalogStore(sys.argv[1])
+load = time.perf_counter() - started
+import random
+ids = random.Random(0).sample(list(catalog.ids()), min(100, len(catalog)))
+started = time.perf_counter()
+for i in ids:
+    catalog.get(i)
+lookups = time.perf_counter() - started
+started = time.perf_counter()
+int(catalog.mask(season="Winter", gender="Men").sum())
+query = time.perf_counter() - started
+print(json.dumps({"load_s": load, "lookup_100_s": lookups, "query_s": query,
+                  "max_rss_mb": peak_rss_mb()}))
+"""
+
+
+def write_synthetic_catalog(directory: str, rows: int):
+    """styles.csv/images.csv shaped like the Kaggle fashion dataset."""
+    rng = random.Random(0)
+    genders = ["Men", "Women", "Boys", "Girls", "Unisex"]
+    categories = [("Apparel", "Topwear", "Tshirts"), ("Apparel", "Bottomwear", "Jeans"),
+                  ("Footwear", "Shoes", "Casual Shoes"), ("Accessories", "Watches", "Watches")]
+    colours = ["Black", "White", "Blue", "Navy Blue", "Grey", "Red", "Green", "Brown", "Pink"]
+    seasons = ["Summer", "Fall", "Winter", "Spring"]
+    usages = ["Casual", "Formal", "Sports", "Ethnic", "Party"]
+    styles = Path(directory) / "styles.csv"
+    images = Path(directory) / "images.csv"
+    with open(styles, "w") as s, open(images, "w") as im:
+        s.write("id,gender,masterCategory,subCategory,articleType,baseColour,season,year,usage,productDisplayName\n")
+        im.write("filename,link\n")
+        for i in range(1, rows + 1):
+            master, sub, article = rng.choice(categories)
+            colour = rng.choice(colours)
+            gender = rng.choice(genders)
+            s.write(f"{i},{gender},{master},{sub},{article},{colour},{rng.choice(seasons)},"
+                    f"{rng.randint(2010, 2023)},{rng.choice(usages)},Brand {gender} {colour} {article} {i}\n")
+            im.write(f"{i}.jpg,http://assets.example.com/images/{i}.jpg\n")
+    return str(styles), str(images)
+
+
+def run(script: str, *args) -> dict:
+    output = subprocess.run([sys.executable, "-c", script, *args], capture_output=True, text=True)
+    if output.returncode != 0:
+        return {"error": output.stderr.strip().splitlines()[-1]}
+    return json.loads(output.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark catalog loading at API startup.")
+    parser.add_argument("--styles", default="data/styles.csv")
+    parser.add_argument("--images", default="data/images.csv")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate a synthetic catalog with this many rows")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        styles, images = args.styles, args.images
+        if args.synthetic or not os.path.exists(styles):
+            styles, images = write_synthetic_catalog(tmp, args.synthetic or 44000)
+        store_dir = os.path.join(tmp, "catalog_store")
+        build_catalog_store(styles, images, store_dir)
+
+        results = {
+            "pandas merge (old main.py)": run(PANDAS_MERGE, images, styles),
+            "catalog store (mmap)": run(STORE_OPEN, store_dir, PROJECT_ROOT),
+        }
+    print(f"{'variant':<28} {'load ms':>9} {'100 gets ms':>12} {'query ms':>9} {'max RSS MB':>11}")
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<28} {r['error']}")
+            continue
+        print(f"{name:<28} {r['load_s'] * 1e3:>9.1f} {r['lookup_100_s'] * 1e3:>12.2f} "
+              f"{r['query_s'] * 1e3:>9.3f} {r['max_rss_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
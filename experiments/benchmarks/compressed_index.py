@@ -0,0 +1,224 @@
+"""
+Compressed Vector Index Report
+Memory saved vs recall lost when the catalog embeddings are stored as
+float16 or product-quantized codes (src/vector_index.py storage options),
+against the current float32 index. Every variant is rebuilt from the same
+vectors and metadata; recall@k is measured against the exact float32 top-k
+for text queries (sampled catalog captions plus data/eval.jsonl, embedded
+with the API's text model).
+
+"Scanned" is what a full search reads: the whole matrix for float32/float16,
+only the codes for PQ. PQ still maps its float16 matrix to re-rank each
+shortlist, so the report lists that matrix next to the codes and measures
+what is actually resident (Rss of the index's mapped files, Linux only)
+after the query run; that is what each worker ends up holding. float16
+halves memory but is slower to scan than float32, as numpy converts it
+block by block.
+
+These storages only apply to the numpy backend and the attribute pre-filter
+index. With VECTOR_BACKEND=chroma (the default), every worker still loads
+Chroma's full float32 HNSW index, whatever VECTOR_INDEX_STORAGE is.
+
+Usage:
+    python experiments/benchmarks/compressed_index.py [--index ./models/vector_index]
+    python experiments/benchmarks/compressed_index.py --pq-subspaces 32 64 128 --rerank 10 100 256 1000
+    python experiments/benchmarks/compressed_index.py --synthetic 44000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.vector_index import (
+    EMBEDDINGS_FILE, PQ_CODEBOOKS_FILE, PQ_CODES_FILE, VECTOR_INDEX_DIR, VectorIndex, build_vector_index
+)
+
+
+class IndexCollection:
+    """Chroma-like paged get() over an existing vector index, to rebuild it with other storage."""
+
+    def __init__(self, index: VectorIndex):
+        self.index = index
+
+    def get(self, include, limit, offset):
+        rows = range(offset, min(offset + limit, len(self.index)))
+        return {
+            "ids": [self.index.ids[i] for i in rows],
+            "embeddings": np.asarray(self.index.embeddings[offset:offset + len(rows)], dtype=np.float32),
+            "metadatas": [json.loads(self.index.metadatas[i]) for i in rows],
+            "documents": [self.index.texts[i] for i in rows],
+        }
+
+
+class SyntheticCollection:
+    """Clustered vectors (items share articleType/colour) without metadata."""
+
+    def __init__(self, rows: int, dim: int = 512, clusters: int = 200, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+        self.embeddings = centers[rng.integers(clusters, size=rows)] + \
+            0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+
+    def get(self, include, limit, offset):
+        rows = range(offset, min(offset + limit, len(self.embeddings)))
+        return {"ids": [str(i) for i in rows], "embeddings": self.embeddings[offset:offset + len(rows)],
+                "metadatas": [{} for _ in rows], "documents": ["" for _ in rows]}
+
+
+def text_queries(index: VectorIndex, n_captions: int) -> np.ndarray:
+    from hnsw_sweep import embed_queries, load_queries
+
+    captions = [index.texts[i] for i in range(len(index))]
+    queries = load_queries(captions, n_captions)
+    print(f"Embedding {len(queries)} queries...")
+    return embed_queries(queries)
+
+
+def vector_bytes(index: VectorIndex) -> dict:
+    """Bytes per vector scanned by a full search, on disk for the vectors, and PQ's re-rank matrix."""
+    files = [EMBEDDINGS_FILE] + ([PQ_CODES_FILE, PQ_CODEBOOKS_FILE] if index.storage == "pq" else [])
+    disk = sum(os.path.getsize(os.path.join(index.directory, name)) for name in files)
+    scanned = index.codes.shape[1] if index.storage == "pq" else index.embeddings.dtype.itemsize * index.dim
+    rerank_mb = index.embeddings.nbytes / 2 ** 20 if index.storage == "pq" else None
+    return {"scanned_bytes_per_vector": int(scanned), "disk_mb": disk / 2 ** 20, "rerank_matrix_mb": rerank_mb}
+
+
+def resident_mb(index: VectorIndex) -> Optional[float]:
+    """Resident MB of this process's mappings of the index's vector files, or None without /proc."""
+    paths = {os.path.realpath(os.path.join(index.directory, name))
+             for name in (EMBEDDINGS_FILE, PQ_CODES_FILE)}
+    try:
+        with open("/proc/self/smaps") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    resident_kb, in_index = 0, False
+    for line in lines:
+        fields = line.split()
+        if "-" in fields[0] and len(fields) >= 5:  # Mapping header: address perms offset dev inode [path]
+            in_index = len(fields) >= 6 and fields[5] in paths
+        elif in_index and fields[0] == "Rss:":
+            resident_kb += int(fields[1])
+    return resident_kb / 2 ** 10
+
+
+def measure(index: VectorIndex, reference: VectorIndex, queries: np.ndarray, k: int) -> dict:
+    truth = [reference.search(query, k)[0] for query in queries]
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        found.append(index.search(query, k)[0])
+        latencies.append(time.perf_counter() - started)
+    return {
+        f"recall_at_{k}": float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])),
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+    }
+
+
+def _mb(value: Optional[float]) -> str:
+    return "" if value is None else f"{value:.1f}"
+
+
+def format_report(results, rows: int, dim: int, k: int, source: str, queries: int) -> str:
+    lines = [
+        "# Compressed Vector Index Report",
+        "",
+        f"Source: {source} ({rows} vectors, dim {dim}); recall@{k} against exact float32 search.",
+        "",
+        f"| storage | PQ subspaces | re-rank | scanned B/vector | scanned MB | scanned MB at 10x "
+        f"| scan saved vs float32 | + float16 re-rank matrix MB | resident MB | resident saved vs float32 "
+        f"| disk MB | recall@{k} | p50 ms |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    baseline = results[0]["scanned_bytes_per_vector"]
+    baseline_resident = results[0]["resident_mb"]
+    for r in results:
+        scanned_mb = r["scanned_bytes_per_vector"] * rows / 2 ** 20
+        resident_saved = "" if r["resident_mb"] is None or not baseline_resident \
+            else f"{1 - r['resident_mb'] / baseline_resident:.1%}"
+        lines.append(
+            f"| {r['storage']} | {r.get('subspaces', '')} | {r.get('rerank', '')} "
+            f"| {r['scanned_bytes_per_vector']} | {scanned_mb:.1f} | {10 * scanned_mb:.1f} "
+            f"| {1 - r['scanned_bytes_per_vector'] / baseline:.1%} | {_mb(r['rerank_matrix_mb'])} "
+            f"| {_mb(r['resident_mb'])} | {resident_saved} | {r['disk_mb']:.1f} "
+            f"| {r[f'recall_at_{k}']:.3f} | {r['p50_ms']:.2f} |")
+    lines += [
+        "",
+        f"Resident MB is the Rss of the index's mapped vector files after {queries} queries per row; PQ "
+        "rows of one index share its mappings, so each includes the shortlists of the rows above it. The "
+        "PQ codes alone understate a worker's footprint: re-ranking faults in float16 pages (plus the "
+        "kernel's fault-around), up to the whole re-rank matrix.",
+        "",
+        "These storages apply to VECTOR_BACKEND=numpy and the attribute pre-filter index only. With "
+        "VECTOR_BACKEND=chroma (the default), each worker still loads Chroma's full float32 HNSW index.",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report memory saved vs recall lost by compressed index storage.")
+    parser.add_argument("--index", default=VECTOR_INDEX_DIR, help="The current (float32) vector index")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many synthetic 512-d vectors instead")
+    parser.add_argument("--captions", type=int, default=500, help="Catalog captions sampled as queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-subspaces", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[10, 100, 256, 1000],
+                        help="PQ shortlist sizes re-ranked exactly (k = no re-ranking beyond the top k)")
+    parser.add_argument("--report", default="experiments/benchmarks/compressed_index_report.md")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic:
+            collection = SyntheticCollection(args.synthetic)
+            rng = np.random.default_rng(1)
+            queries = collection.embeddings[rng.integers(args.synthetic, size=args.captions)] + \
+                0.3 * rng.standard_normal((args.captions, collection.embeddings.shape[1])).astype(np.float32)
+            source = f"synthetic-{args.synthetic}"
+        else:
+            current = VectorIndex(args.index)
+            collection = IndexCollection(current)
+            queries = text_queries(current, args.captions)
+            source = args.index
+
+        variants = [("float32", None)] + [("float16", None)] + [("pq", m) for m in args.pq_subspaces]
+        indexes = {}
+        for storage, subspaces in variants:
+            name = f"{storage}-{subspaces}" if subspaces else storage
+            started = time.perf_counter()
+            build_vector_index(collection, os.path.join(tmp, name), storage=storage, pq_subspaces=subspaces or 0)
+            print(f"Built {name} in {time.perf_counter() - started:.1f}s")
+            indexes[name] = VectorIndex(os.path.join(tmp, name))
+
+        reference = indexes["float32"]
+        results = []
+        for name, index in indexes.items():
+            settings = [{"rerank": rerank} for rerank in args.rerank] if index.storage == "pq" else [{}]
+            for setting in settings:
+                if "rerank" in setting:
+                    index.rerank_candidates = setting["rerank"]
+                    setting["subspaces"] = index.codes.shape[1]
+                result = {"storage": index.storage, **setting, **vector_bytes(index),
+                          **measure(index, reference, queries, args.k)}
+                results.append({**result, "resident_mb": resident_mb(index)})
+        report = format_report(results, len(reference), reference.dim, args.k, source, len(queries))
+
+    print()
+    print(report)
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        f.write(report)
+    print(f"Report saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
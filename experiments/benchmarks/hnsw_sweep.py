@@ -0,0 +1,252 @@
+"""
+HNSW Parameter Sweep
+Measures what Chroma's HNSW settings cost and buy on our own data. The stored
+catalog embeddings are read from chroma_db, queries are the text embeddings
+of a sample of catalog captions plus data/eval.jsonl, and ground truth is an
+exact brute-force search in the collection's distance space. For every
+(M, ef_construction) an hnswlib index (the library Chroma uses) is built and
+then searched at every ef_search:
+
+    recall@k, p50/p99 single-query latency, build time, serialized index size
+
+Results are printed as a table, written to JSON and logged to MLflow (one
+nested run per configuration). Chroma's defaults are M=16,
+ef_construction=100, ef_search=10.
+
+Usage:
+    python experiments/benchmarks/hnsw_sweep.py [--chroma ./chroma_db --captions 500 --k 10]
+    python experiments/benchmarks/hnsw_sweep.py --m 8 16 32 --ef-construction 100 200 --ef-search 10 50 100
+    python experiments/benchmarks/hnsw_sweep.py --synthetic 44000 --no-mlflow
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+EVAL_DATA_PATH = Path(__file__).parent.parent.parent / "data" / "eval.jsonl"
+MLFLOW_EXPERIMENT = "StyleSync-HNSW-Tuning"
+CHROMA_DEFAULTS = {"M": 16, "ef_construction": 100, "ef_search": 10}
+
+
+def load_collection(chroma_dir: str, collection_name: str, page_size: int = 5000):
+    """(embeddings, captions, distance space) of the persisted collection."""
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=chroma_dir).get_collection(collection_name)
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    embeddings, captions = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            break
+        embeddings.extend(page["embeddings"])
+        captions.extend(d or "" for d in page["documents"])
+        offset += len(page["ids"])
+    if not embeddings:
+        raise SystemExit(f"Collection {collection_name} in {chroma_dir} is empty")
+    return np.asarray(embeddings, dtype=np.float32), captions, space
+
+
+def load_queries(captions, n_captions: int, seed: int = 0):
+    """A sample of catalog captions plus the eval set's queries."""
+    rng = random.Random(seed)
+    queries = rng.sample([c for c in captions if c], min(n_captions, sum(1 for c in captions if c)))
+    if EVAL_DATA_PATH.exists():
+        with open(EVAL_DATA_PATH) as f:
+            queries.extend(json.loads(line)["query"] for line in f if line.strip())
+    return queries
+
+
+def embed_queries(queries, batch_size: int = 64) -> np.ndarray:
+    from src.components import CHECKPOINT, MODEL_NAME
+    from src.embeddings import load_openclip_embedder
+
+    embedder = load_openclip_embedder(MODEL_NAME, CHECKPOINT)
+    vectors = []
+    for i in range(0, len(queries), batch_size):
+        vectors.extend(embedder.embed_documents(queries[i:i + batch_size]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_data(rows: int, n_queries: int, dim: int = 512, clusters: int = 200, seed: int = 0):
+    """Clustered vectors (catalog items share articleType/colour) and nearby queries."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(clusters, size=rows)] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    queries = data[rng.integers(rows, size=n_queries)] + 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    return data, queries
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def ground_truth(data: np.ndarray, queries: np.ndarray, k: int, space: str, batch_size: int = 256) -> np.ndarray:
+    """Exact top-k row ids per query in the index's distance space."""
+    if space == "cosine":
+        data, queries = _normalized(data), _normalized(queries)
+    squared_norms = (data ** 2).sum(axis=1)
+    truth = []
+    for i in range(0, len(queries), batch_size):
+        block = queries[i:i + batch_size]
+        scores = block @ data.T
+        # Smaller is better: -ip (ip/cosine) or |x|^2 - 2 q.x (l2, |q|^2 is constant per query)
+        distances = squared_norms - 2 * scores if space == "l2" else -scores
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+        truth.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(truth)
+
+
+def recall_at_k(found, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def build_index(data: np.ndarray, space: str, m: int, ef_construction: int, threads: int):
+    import hnswlib
+
+    index = hnswlib.Index(space=space, dim=data.shape[1])
+    started = time.perf_counter()
+    index.init_index(max_elements=len(data), ef_construction=ef_construction, M=m, random_seed=0)
+    index.add_items(data, np.arange(len(data)), num_threads=threads)
+    build_s = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.bin")
+        index.save_index(path)
+        size_mb = os.path.getsize(path) / 2 ** 20
+    return index, build_s, size_mb
+
+
+def search(index, queries: np.ndarray, k: int, ef_search: int):
+    """Single-query searches on one thread, as the API issues them."""
+    index.set_ef(max(ef_search, k))
+    index.set_num_threads(1)
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        labels, _ = index.knn_query(query, k=k)
+        latencies.append(time.perf_counter() - started)
+        found.append(labels[0])
+    latencies = np.asarray(latencies) * 1e3
+    return found, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def sweep(data, queries, truth, space, ms, ef_constructions, ef_searches, k, threads):
+    results = []
+    for m in ms:
+        for ef_construction in ef_constructions:
+            index, build_s, size_mb = build_index(data, space, m, ef_construction, threads)
+            for ef_search in ef_searches:
+                found, p50, p99 = search(index, queries, k, ef_search)
+                results.append({
+                    "M": m, "ef_construction": ef_construction, "ef_search": ef_search,
+                    f"recall_at_{k}": recall_at_k(found, truth),
+                    "p50_ms": p50, "p99_ms": p99, "build_s": build_s, "index_mb": size_mb,
+                })
+                print(f"  M={m} ef_construction={ef_construction} ef_search={ef_search}: "
+                      f"recall@{k}={results[-1][f'recall_at_{k}']:.3f} p50={p50:.3f}ms", flush=True)
+    return results
+
+
+def exact_latency(data: np.ndarray, queries: np.ndarray, k: int, space: str):
+    """p50/p99 of a single-query brute-force scan, the baseline HNSW has to beat."""
+    latencies = []
+    for query in queries[:200]:
+        started = time.perf_counter()
+        ground_truth(data, query[None, :], k, space)
+        latencies.append(time.perf_counter() - started)
+    latencies = np.asarray(latencies) * 1e3
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def format_table(results, k: int) -> str:
+    header = (f"{'M':>4} {'ef_constr':>9} {'ef_search':>9} {f'recall@{k}':>9} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'index MB':>9}")
+    lines = [header, "-" * len(header)]
+    for r in results:
+        default = all(r[key] == value for key, value in CHROMA_DEFAULTS.items())
+        lines.append(f"{r['M']:>4} {r['ef_construction']:>9} {r['ef_search']:>9} {r[f'recall_at_{k}']:>9.3f} "
+                     f"{r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f} {r['build_s']:>8.1f} {r['index_mb']:>9.1f}"
+                     + ("  (chroma default)" if default else ""))
+    return "\n".join(lines)
+
+
+def log_to_mlflow(results, context: dict, table: str, output: str):
+    import mlflow
+
+    mlflow.set_experiment(MLFLOW_EXPERIMENT)
+    with mlflow.start_run(run_name=f"hnsw-sweep-{context['source']}"):
+        mlflow.log_params(context)
+        for r in results:
+            params = {key: r[key] for key in ("M", "ef_construction", "ef_search")}
+            with mlflow.start_run(run_name="M{M}-efc{ef_construction}-ef{ef_search}".format(**params), nested=True):
+                mlflow.log_params({**params, **context})
+                mlflow.log_metrics({key: value for key, value in r.items() if key not in params})
+        mlflow.log_text(table, "hnsw_sweep.txt")
+        mlflow.log_artifact(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters for recall and latency on the catalog.")
+    parser.add_argument("--chroma", default="./chroma_db")
+    parser.add_argument("--collection", default="style_sync")
+    parser.add_argument("--captions", type=int, default=500, help="Catalog captions sampled as queries")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many synthetic vectors instead of chroma_db")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Threads used to build each index")
+    parser.add_argument("--output", default="experiments/benchmarks/hnsw_sweep_results.json")
+    parser.add_argument("--no-mlflow", action="store_true")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        data, query_vectors = synthetic_data(args.synthetic, args.captions)
+        space, source = "l2", f"synthetic-{args.synthetic}"
+    else:
+        data, captions, space = load_collection(args.chroma, args.collection)
+        queries = load_queries(captions, args.captions)
+        print(f"Embedding {len(queries)} queries...")
+        query_vectors = embed_queries(queries)
+        source = "chroma_db"
+    print(f"{len(data)} vectors (dim {data.shape[1]}, space {space}), {len(query_vectors)} queries")
+
+    started = time.perf_counter()
+    truth = ground_truth(data, query_vectors, args.k, space)
+    print(f"Exact ground truth in {time.perf_counter() - started:.1f}s")
+    exact_p50, exact_p99 = exact_latency(data, query_vectors, args.k, space)
+
+    results = sweep(data, query_vectors, truth, space, args.m, args.ef_construction, args.ef_search,
+                    args.k, args.threads)
+    table = format_table(results, args.k)
+    print()
+    print(table)
+    print(f"\nExact numpy scan: p50={exact_p50:.3f}ms p99={exact_p99:.3f}ms (recall 1.0)")
+
+    context = {"source": source, "vectors": len(data), "dim": int(data.shape[1]), "space": space,
+               "queries": len(query_vectors), "k": args.k}
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({**context, "exact_p50_ms": exact_p50, "exact_p99_ms": exact_p99, "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if not args.no_mlflow:
+        log_to_mlflow(results, context, table, args.output)
+        print("View MLflow UI with: mlflow ui")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Gunicorn settings for multi-worker deployments with Prometheus multiprocess metrics.
+
+Usage:
+    PROMETHEUS_MULTIPROC_DIR=/tmp/stylesync_metrics \
+        gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker -w 4 src.app:app
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+# Each worker writes its own guardrail log and stats checkpoint (src/guardrails/stats.py)
+os.environ.setdefault("GUARDRAIL_LOG_PER_WORKER", "1")
+GUARDRAIL_LOG_DIR = Path(__file__).parent / "logs"
+
+
+def on_starting(server):
+    """Start from an empty metrics directory so counters of a previous run are not re-exported."""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+    # Guardrail counts are kept across runs: fold the previous workers' files into the total
+    if GUARDRAIL_LOG_DIR.is_dir():
+        _guardrail_stats_module().compact_worker_stats(GUARDRAIL_LOG_DIR)
+
+
+def _guardrail_stats_module():
+    # Loaded by path: importing the src.guardrails package would start its log writer thread before fork
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location(
+        "guardrail_stats", Path(__file__).parent / "src" / "guardrails" / "stats.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def child_exit(server, worker):
+    """Drop the live-gauge files of an exited worker."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,77 +1,48 @@
 import os
-import boto3
-import io
-import base64
-import torch
-import open_clip
-from fastapi import FastAPI, HTTPException
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
-from langsmith import traceable
-import traceback
+from src.tracing import traceable
 
 # Guardrails
-from src.guardrails import InputGuardrails, OutputGuardrails
+from src.guardrails import InputGuardrails, InputVerdict, OutputGuardrails
+from src.guardrails.logger import guardrail_stats
+
+# Executors and admission control
+from src.concurrency import ConcurrencyLimiter, Overloaded, RateLimiter, run_cpu, run_io
+
+# Lazily built models and clients
+from src.components import GEMINI_MODEL, Components
+
+# Semantic response cache
+from src.cache import SemanticResponseCache, filters_key
+
+# Async, batched log writer
+from src.log_pipeline import configure_logging
 
 # Metrics
-from src.metrics import create_metrics_tracker, generate_latest, CONTENT_TYPE_LATEST
-from fastapi.responses import Response
+from src.metrics import MetricsTracker, create_metrics_tracker, metrics_payload, CONTENT_TYPE_LATEST
+from fastapi.responses import Response, StreamingResponse, JSONResponse
+import asyncio
+import json
 import time
 
 load_dotenv()
 
 # Configuration
-CHROMA_DB_DIR = "./chroma_db"
-MODEL_NAME = "ViT-B-32"
-CHECKPOINT = "laion2b_s34b_b79k"
 S3_BUCKET = os.environ.get("S3_BUCKET_NAME", "stylesync-mlops-data")
+# Up to 3 images per query go through the S3 pool (S3_POOL_SIZE threads) in one fetch stage
+CHAT_BATCH_MAX_QUERIES = int(os.environ.get("CHAT_BATCH_MAX_QUERIES", "200"))
 
-app = FastAPI(title="Style Sync API")
-
-# --- 1. Initialize Models (Global for now) ---
-print("Initializing models...")
-
-# OpenCLIP for Embedding Query
-model, _, preprocess = open_clip.create_model_and_transforms(MODEL_NAME, pretrained=CHECKPOINT)
-tokenizer = open_clip.get_tokenizer(MODEL_NAME)
-
-class OpenCLIPEmbedder:
-    def __init__(self, model, tokenizer):
-        self.model = model
-        self.tokenizer = tokenizer
-        
-    def embed_documents(self, texts):
-        with torch.no_grad():
-            text = self.tokenizer(texts)
-            text_features = self.model.encode_text(text)
-            text_features /= text_features.norm(dim=-1, keepdim=True)
-            return text_features.tolist()
-    
-    def embed_query(self, text):
-        return self.embed_documents([text])[0]
-
-embedding_function = OpenCLIPEmbedder(model, tokenizer)
-
-# Chroma Vector Store
-vectorstore = Chroma(
-    collection_name="style_sync",
-    embedding_function=embedding_function,
-    persist_directory=CHROMA_DB_DIR
-)
-
-# S3 Client
-s3_client = boto3.client('s3')
-
-# Gemini
-# Ensure GOOGLE_API_KEY is in env
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+# --- 1. Components ---
+# Set by create_app(); models and clients inside are only built on first use
+components: Components = None
 
-print("Initialization complete.")
+router = APIRouter()
 
 # --- 2. Helper Functions ---
 
@@ -79,33 +50,19 @@ print("Initialization complete.")
 def get_image_base64(s3_uri: str) -> str:
     """Downloads image from S3 and converts to Base64."""
     try:
-        # Parse S3 URI (s3://bucket/key)
-        parts = s3_uri.replace("s3://", "").split("/", 1)
-        bucket = parts[0]
-        key = parts[1]
-        
-        response = s3_client.get_object(Bucket=bucket, Key=key)
-        image_bytes = response['Body'].read()
-        
-        return base64.b64encode(image_bytes).decode('utf-8')
+        return components.image_fetcher.get_image_base64(s3_uri)
     except Exception as e:
         print(f"Error fetching image {s3_uri}: {e}")
         return None
 
-def generate_presigned_url(s3_uri: str, expiration=3600) -> str:
-    """Generate a presigned URL to share an S3 object"""
-    try:
-        parts = s3_uri.replace("s3://", "").split("/", 1)
-        bucket = parts[0]
-        key = parts[1]
-        response = s3_client.generate_presigned_url('get_object',
-                                                    Params={'Bucket': bucket,
-                                                            'Key': key},
-                                                    ExpiresIn=expiration)
-        return response
-    except Exception as e:
-        logging.error(f"Error generating presigned URL for {s3_uri}: {e}")
-        return None
+def generate_presigned_url(s3_uri: str, expiration: Optional[int] = None) -> Optional[str]:
+    """Generate a presigned URL to share an S3 object (reused until near expiry)"""
+    return components.image_fetcher.generate_presigned_url(s3_uri, expiration)
+
+@traceable(name="fetch_catalog_images")
+def fetch_catalog_images(s3_uris: List[str], derivative_uris: Optional[List[Optional[str]]] = None):
+    """Fetches all images (and presigned URLs) for the retrieved docs concurrently."""
+    return components.image_fetcher.fetch_all(s3_uris, derivative_uris)
 
 @traceable(name="determine_filters")
 def determine_filters(query: str) -> dict:
@@ -134,20 +91,32 @@ def determine_filters(query: str) -> dict:
     else:
         return {"$and": conditions}
 
+@traceable(name="embed_query")
+def embed_query(query: str) -> List[float]:
+    return components.embedding_function.embed_query(query)
+
 @traceable(name="retrieve_documents")
-def retrieve_documents(query: str, filters: dict, k: int = 3):
-    return vectorstore.similarity_search(
-        query, 
-        k=k,
-        filter=filters if filters else None
-    )
+def retrieve_documents(query: str, filters: dict, k: int = 3, query_embedding: List[float] = None):
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    return components.vector_backend.search(query_embedding, k, filters if filters else None)
+
+@traceable(name="retrieve_documents_batch")
+def retrieve_documents_batch(query_embeddings: List[List[float]], filters: dict, k: int = 3):
+    """Top-k documents for several query embeddings under the same filters (batched by the backend)."""
+    return components.vector_backend.search_many(query_embeddings, k, filters if filters else None)
+
+GEMINI_ERROR_RESPONSE = "I found some items, but I'm having trouble analyzing them right now."
+
+NO_ITEMS_RESPONSE = "I couldn't find any matching items in the catalog."
+
+class AdviceUnavailable(Exception):
+    """Gemini failed to answer; the user gets GEMINI_ERROR_RESPONSE and nothing is cached."""
+
+def build_advice_message(query: str, images_data: List[str]):
+    """Construct the multimodal Gemini message for a query and its catalog images."""
+    from langchain_core.messages import HumanMessage
 
-@traceable(name="generate_fashion_advice")
-def generate_fashion_advice(query: str, images_data: List[str]):
-    if not images_data:
-        return "I couldn't find any matching items in the catalog."
-        
-    # Construct Multimodal Message
     message_content = [
         {"type": "text", "text": f"User Query: {query}\n\nHere are some images from our catalog. Please analyze them and provide fashion advice based on these specific items. Refer to them as 'the suggested items'. \n\nCRITICAL INSTRUCTION: Provide a simple list of the 3 items with a 1-sentence reason for each. NO INTRO. NO OUTRO. NO FLUFF. JUST THE LIST."}
     ]
@@ -158,14 +127,61 @@ def generate_fashion_advice(query: str, images_data: List[str]):
             "image_url": {"url": f"data:image/jpeg;base64,{b64}"}
         })
         
-    msg = HumanMessage(content=message_content)
+    return HumanMessage(content=message_content)
+
+def gemini_token_usage(message) -> Tuple[int, int]:
+    """(input, output) token counts from the usage metadata of a Gemini response or chunk."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+
+@traceable(name="generate_fashion_advice")
+def generate_fashion_advice(query: str, images_data: List[str], metrics_tracker: Optional[MetricsTracker] = None):
+    if not images_data:
+        return NO_ITEMS_RESPONSE
+        
+    msg = build_advice_message(query, images_data)
+    
+    start = time.perf_counter()
+    try:
+        ai_response = components.llm.invoke([msg])
+    except Exception as e:
+        print(f"Gemini Error: {e}")
+        if metrics_tracker:
+            metrics_tracker.track_stage('gemini', time.perf_counter() - start)
+        raise AdviceUnavailable(str(e)) from e
+    if metrics_tracker:
+        metrics_tracker.track_generation(time.perf_counter() - start, *gemini_token_usage(ai_response),
+                                         model=GEMINI_MODEL)
+    return ai_response.content
+
+async def stream_fashion_advice(query: str, images_data: List[str], metrics_tracker: Optional[MetricsTracker] = None):
+    """
+    Yields Gemini answer chunks as they arrive (LangChain streaming API).
+    Raises AdviceUnavailable if Gemini fails, possibly after some chunks were yielded.
+    """
+    if not images_data:
+        yield NO_ITEMS_RESPONSE
+        return
     
+    msg = build_advice_message(query, images_data)
+    
+    start = time.perf_counter()
+    input_tokens = output_tokens = 0
     try:
-        ai_response = llm.invoke([msg])
-        return ai_response.content
+        async for chunk in components.llm.astream([msg]):
+            # Chunk usage is additive, as when LangChain merges chunks
+            chunk_input, chunk_output = gemini_token_usage(chunk)
+            input_tokens += chunk_input
+            output_tokens += chunk_output
+            if chunk.content:
+                yield chunk.content
     except Exception as e:
         print(f"Gemini Error: {e}")
-        return "I found some items, but I'm having trouble analyzing them right now."
+        raise AdviceUnavailable(str(e)) from e
+    finally:
+        if metrics_tracker:
+            metrics_tracker.track_generation(time.perf_counter() - start, input_tokens, output_tokens,
+                                             model=GEMINI_MODEL)
 
 # --- 3. API Endpoints ---
 
@@ -176,121 +192,237 @@ class ChatResponse(BaseModel):
     response: str
     recommended_items: List[dict]
 
-# Logging Setup
+class ChatBatchRequest(BaseModel):
+    queries: List[str]
+
+class ChatBatchItem(BaseModel):
+    query: str
+    response: Optional[str] = None
+    recommended_items: List[dict] = []
+    error: Optional[str] = None
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatBatchItem]
+
+# Logging Setup: records are formatted and written (batched, size-rotated) on a background thread;
+# hot-path calls use %-style args so nothing is formatted when the level is disabled
 import logging
-logging.basicConfig(filename='api_debug.log', level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+configure_logging('api_debug.log')
 
 # Initialize guardrails
 input_guardrails = InputGuardrails()
 output_guardrails = OutputGuardrails()
 
+# Paraphrases of an already answered intent are served from here
+response_cache = SemanticResponseCache()
+
+# Admission control for /chat
+request_limiter = ConcurrencyLimiter()
+
+# Caps the Gemini fan-out of /chat/batch (shared by all batches in this worker)
+gemini_limiter = RateLimiter()
+
+def metadata_s3_uri(metadata: dict) -> Optional[str]:
+    """S3 URI of an item's original image, from its metadata."""
+    s3_uri = metadata.get('s3_uri')
+    if not s3_uri and metadata.get('id'):
+        s3_uri = f"s3://{S3_BUCKET}/style-sync/raw/fashion/images/{metadata.get('id')}.jpg"
+    return s3_uri
+
+def doc_s3_uri(doc) -> Optional[str]:
+    """S3 URI of a retrieved item's original image."""
+    return metadata_s3_uri(doc.metadata)
+
+def cache_entry(response_text: str, recommended_items: List[dict]) -> dict:
+    """
+    Semantic cache entry for an answer. Items keep their S3 URI rather than the
+    presigned URL, which may expire long before the entry does.
+    """
+    return {
+        "response": response_text,
+        "recommended_items": [{**item, "s3_uri": metadata_s3_uri(item.get("metadata", {})) or item["s3_uri"]}
+                              for item in recommended_items]
+    }
+
+def from_cache_entry(entry: dict) -> dict:
+    """A cached answer with its items' URLs presigned again (reusing cached URLs that are still valid)."""
+    recommended_items = []
+    for item in entry["recommended_items"]:
+        url = generate_presigned_url(item["s3_uri"]) if item["s3_uri"].startswith("s3://") else None
+        recommended_items.append({**item, "s3_uri": url or item["s3_uri"]})
+    return {"response": entry["response"], "recommended_items": recommended_items}
+
+def build_recommendations(docs_with_uri, fetch_results):
+    """Gemini images and frontend items for (doc, s3_uri) pairs and their fetch results (same order)."""
+    images_data = []
+    recommended_items = []
+    for (doc, s3_uri), fetched in zip(docs_with_uri, fetch_results):
+        if not fetched.ok:
+            logging.warning("Failed to fetch image: %s (%s)", s3_uri, fetched.error)
+            continue
+        images_data.append(fetched.image_b64)
+        recommended_items.append({
+            "productDisplayName": doc.metadata.get("productDisplayName"),
+            "s3_uri": fetched.presigned_url if fetched.presigned_url else s3_uri, # Use presigned if available
+            "metadata": doc.metadata
+        })
+    return images_data, recommended_items
+
+async def collect_recommendations(results, metrics_tracker: MetricsTracker):
+    """S3-Gemini Bridge: fetch the retrieved items' images and build the frontend item list."""
+    logging.info("Processing results...")
+    docs_with_uri = [(doc, s3_uri) for doc in results if (s3_uri := doc_s3_uri(doc))]
+    
+    fetch_results, fetch_time = await run_io(
+        fetch_catalog_images,
+        [s3_uri for _, s3_uri in docs_with_uri],
+        # Gemini gets the downsized ingest-time derivative when the item has one
+        [doc.metadata.get('derivative_s3_uri') for doc, _ in docs_with_uri]
+    )
+    images_data, recommended_items = build_recommendations(docs_with_uri, fetch_results)
+    metrics_tracker.track_image_fetch(fetch_time, sum(not r.ok for r in fetch_results))
+    # Presigning runs inside the fetch stage; report its total separately
+    metrics_tracker.track_stage('presign', sum(r.presign_seconds for r in fetch_results))
+    logging.info("Fetched %d/%d images in %.3fs", len(images_data), len(docs_with_uri), fetch_time)
+    return images_data, recommended_items
+
 @traceable(name="chat_endpoint_flow")
-async def chat_endpoint_flow(request: ChatRequest):
+async def chat_endpoint_flow(request: ChatRequest, metrics_tracker: Optional[MetricsTracker] = None,
+                             use_cache: bool = True, input_verdict: Optional[InputVerdict] = None):
     logging.info("Entering chat_endpoint_flow")
+    metrics_tracker = metrics_tracker or create_metrics_tracker()
     query = request.query
-    logging.info(f"Received query: {query}")
+    logging.info("Received query: %s", query)
     
-    # INPUT GUARDRAILS: Validate query before processing
-    is_valid, message, details = input_guardrails.validate(query)
-    if not is_valid:
-        logging.warning(f"Input blocked by guardrails: {message}")
+    # INPUT GUARDRAILS: Validate query before processing (reusing the caller's verdict if it has one)
+    verdict = input_verdict
+    if verdict is None:
+        with metrics_tracker.span('guardrails'):
+            verdict = input_guardrails.check(query)
+    if not verdict.is_valid:
+        logging.warning(f"Input blocked by guardrails: {verdict.message}")
         return ChatResponse(
-            response=message,
+            response=verdict.message,
             recommended_items=[]
         )
     
     # 1. Logic Router
     try:
-        filters = determine_filters(query)
-        logging.info(f"Applied filters: {filters}")
+        with metrics_tracker.span('filter_routing'):
+            filters = determine_filters(query)
+        logging.info("Applied filters: %s", filters)
     except Exception as e:
         logging.error(f"Error in determine_filters: {e}")
         raise
 
+    # Semantic response cache (same intent under the same filters)
+    with metrics_tracker.span('query_embedding'):
+        query_embedding = await run_cpu(embed_query, query)
+    if use_cache:
+        cached = response_cache.lookup(query_embedding, filters)
+        if cached is not None:
+            logging.info("Served response from semantic cache")
+            return ChatResponse(**from_cache_entry(cached))
+
     # 2. Retrieval
     try:
-        results = retrieve_documents(query, filters)
+        retrieval_start = time.perf_counter()
+        results = await run_cpu(retrieve_documents, query, filters, query_embedding=query_embedding)
+        metrics_tracker.track_retrieval(time.perf_counter() - retrieval_start)
         if not isinstance(results, list):
             logging.error(f"retrieve_documents returned non-list: {type(results)} - {results}")
             results = []
-        logging.info(f"Retrieved {len(results)} documents")
+        logging.info("Retrieved %d documents", len(results))
     except Exception as e:
         logging.error(f"Error in retrieve_documents: {e}")
         raise
     
     # 3. S3-Gemini Bridge
-    images_data = []
-    recommended_items = []
-    
-    logging.info("Processing results...")
-    for doc in results:
-        try:
-            s3_uri = doc.metadata.get('s3_uri')
-            if not s3_uri and doc.metadata.get('id'):
-                s3_uri = f"s3://{S3_BUCKET}/style-sync/raw/fashion/images/{doc.metadata.get('id')}.jpg"
-            
-            if s3_uri:
-                logging.info(f"Fetching image: {s3_uri}")
-                b64_image = get_image_base64(s3_uri)
-                if b64_image:
-                    images_data.append(b64_image)
-                    
-                    # Generate Presigned URL for Frontend
-                    presigned_url = generate_presigned_url(s3_uri)
-                    
-                    recommended_items.append({
-                        "productDisplayName": doc.metadata.get("productDisplayName"),
-                        "s3_uri": presigned_url if presigned_url else s3_uri, # Use presigned if available
-                        "metadata": doc.metadata
-                    })
-                else:
-                    logging.warning(f"Failed to fetch image: {s3_uri}")
-        except Exception as e:
-            logging.error(f"Error processing doc {doc.metadata.get('id')}: {e}")
+    images_data, recommended_items = await collect_recommendations(results, metrics_tracker)
     
     # 4. Generate Response
     try:
         logging.info("Generating response...")
-        response_text = generate_fashion_advice(query, images_data)
+        response_text, failed = await generate_answer(query, images_data, metrics_tracker)
         logging.info("Response generated.")
     except Exception as e:
         logging.error(f"Error in generate_fashion_advice: {e}")
         raise
     
-    # OUTPUT GUARDRAILS: Moderate response before returning
-    is_safe, moderated_response, mod_details = output_guardrails.moderate(
-        response_text, 
-        [item.get("metadata", {}) for item in recommended_items]
-    )
-    if not is_safe:
-        logging.warning(f"Output moderated by guardrails: {mod_details}")
-        response_text = moderated_response
-
+    # OUTPUT GUARDRAILS: Moderate response before returning (and caching it)
+    _, response_text = finish_answer(response_text, failed, recommended_items, query_embedding, filters,
+                                     metrics_tracker)
     return ChatResponse(
         response=response_text,
         recommended_items=recommended_items
     )
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def generate_answer(query: str, images_data: List[str],
+                          metrics_tracker: MetricsTracker) -> Tuple[str, bool]:
+    """(answer text, failed) from Gemini, called on the I/O pool."""
+    try:
+        return await run_io(generate_fashion_advice, query, images_data, metrics_tracker), False
+    except AdviceUnavailable:
+        return GEMINI_ERROR_RESPONSE, True
+
+def finish_answer(response_text: str, failed: bool, recommended_items: List[dict], query_embedding: List[float],
+                  filters: dict, metrics_tracker: MetricsTracker) -> Tuple[bool, str]:
+    """
+    Output guardrails and response caching for one answer, shared by /chat, /chat/batch and /chat/stream.
+    Returns (is_safe, text to send). Only complete, safe answers with items are cached; a failed
+    generation becomes GEMINI_ERROR_RESPONSE and is retried next time.
+    """
+    if failed:
+        return True, GEMINI_ERROR_RESPONSE
+    is_safe, response_text = moderate_response(response_text, recommended_items, metrics_tracker)
+    if recommended_items and is_safe:
+        response_cache.store(query_embedding, filters, cache_entry(response_text, recommended_items))
+    return is_safe, response_text
+
+def moderate_response(response_text: str, recommended_items: List[dict],
+                      metrics_tracker: MetricsTracker) -> Tuple[bool, str]:
+    """Run output guardrails on an answer; returns (is_safe, text to send)."""
+    with metrics_tracker.span('output_moderation'):
+        is_safe, moderated_response, mod_details = output_guardrails.moderate(
+            response_text, 
+            [item.get("metadata", {}) for item in recommended_items]
+        )
+    metrics_tracker.track_guardrail('output', _output_rule_label(is_safe), is_safe)
+    if not is_safe:
+        logging.warning(f"Output moderated by guardrails: {mod_details}")
+        return is_safe, moderated_response
+    return is_safe, response_text
+
+def _output_rule_label(is_safe: bool) -> str:
+    # Output moderation only blocks on toxicity; hallucination and off-topic are warnings
+    return 'none' if is_safe else 'toxicity'
+
+def _is_truthy(value: Optional[str]) -> bool:
+    # isinstance also covers direct calls (e.g. debug_500.py) where the Header default is passed through
+    return isinstance(value, str) and value.strip().lower() in ("1", "true", "yes")
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, x_cache_bypass: Optional[str] = Header(None)):
+    """Send X-Cache-Bypass: true to skip the semantic response cache lookup (the fresh answer is still cached)."""
     logging.info("Hit /chat endpoint")
+    try:
+        async with request_limiter:
+            return await _handle_chat(request, use_cache=not _is_truthy(x_cache_bypass))
+    except Overloaded as e:
+        logging.warning(f"Rejected /chat request: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def _handle_chat(request: ChatRequest, use_cache: bool = True):
     metrics_tracker = create_metrics_tracker()
     metrics_tracker.start_request()
     
     try:
-        # Track guardrail check
-        is_valid, _, details = input_guardrails.validate(request.query)
-        
-        # Defensive check for details
-        if details and not isinstance(details, dict):
-             logging.error(f"Guardrail details is not a dict: {type(details)} - {details}")
-             details = {}
-
-        rule = details.get('pii_types', [details.get('matched_pattern', 'unknown')])[0] if details else 'none'
-        metrics_tracker.track_guardrail('input', str(rule), is_valid)
+        # One guardrail scan per request, shared by the metrics and the blocking logic
+        with metrics_tracker.span('guardrails'):
+            verdict = input_guardrails.check(request.query)
+        metrics_tracker.track_guardrail('input', verdict.rule, verdict.is_valid)
         
-        result = await chat_endpoint_flow(request)
+        result = await chat_endpoint_flow(request, metrics_tracker, use_cache=use_cache, input_verdict=verdict)
         metrics_tracker.end_request('success')
         return result
     except Exception as e:
@@ -298,20 +430,298 @@ async def chat_endpoint(request: ChatRequest):
         logging.error("Exception caught in chat_endpoint:", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/health")
+async def _answer_batch_item(query: str, images_data: List[str], recommended_items: List[dict],
+                             query_embedding: List[float], filters: dict,
+                             metrics_tracker: MetricsTracker) -> Tuple[bool, str]:
+    async with gemini_limiter:
+        response_text, failed = await generate_answer(query, images_data, metrics_tracker)
+    return finish_answer(response_text, failed, recommended_items, query_embedding, filters, metrics_tracker)
+
+@traceable(name="chat_batch_flow")
+async def chat_batch_flow(queries: List[str], metrics_tracker: MetricsTracker,
+                          use_cache: bool = True) -> List[ChatBatchItem]:
+    """
+    /chat for many queries in one pass:
+    - input guardrails over the whole batch
+    - one embed_documents call for every query that passed
+    - one vector search per distinct filter set, with all of its query embeddings
+    - each catalog image fetched once, however many answers it appears in
+    - Gemini calls run concurrently under gemini_limiter
+    A failure in one item's retrieval or generation only fails that item.
+    """
+    items = [ChatBatchItem(query=query) for query in queries]
+
+    with metrics_tracker.span('guardrails'):
+        verdicts = await run_cpu(input_guardrails.check_many, queries)
+    pending = []
+    for i, verdict in enumerate(verdicts):
+        metrics_tracker.track_guardrail('input', verdict.rule, verdict.is_valid)
+        if verdict.is_valid:
+            pending.append(i)
+        else:
+            items[i].response = verdict.message
+    if not pending:
+        return items
+
+    with metrics_tracker.span('filter_routing'):
+        filters = {i: determine_filters(queries[i]) for i in pending}
+    with metrics_tracker.span('query_embedding'):
+        vectors = await run_cpu(components.embedding_function.embed_documents, [queries[i] for i in pending])
+    embeddings = dict(zip(pending, vectors))
+
+    if use_cache:
+        misses = []
+        for i in pending:
+            cached = response_cache.lookup(embeddings[i], filters[i])
+            if cached is None:
+                misses.append(i)
+            else:
+                cached = from_cache_entry(cached)
+                items[i].response = cached["response"]
+                items[i].recommended_items = cached["recommended_items"]
+        logging.info("Batch: %d/%d queries served from semantic cache", len(pending) - len(misses), len(pending))
+        pending = misses
+
+    # Retrieval: one multi-embedding search per filter set
+    groups = {}
+    for i in pending:
+        groups.setdefault(filters_key(filters[i]), []).append(i)
+    retrieval_start = time.perf_counter()
+    results = {}
+    for indices in groups.values():
+        try:
+            docs = await run_cpu(retrieve_documents_batch, [embeddings[i] for i in indices], filters[indices[0]])
+            results.update(zip(indices, docs))
+        except Exception as e:
+            logging.error(f"Batch retrieval failed for filters {filters[indices[0]]}: {e}")
+            for i in indices:
+                items[i].error = f"Retrieval failed: {e}"
+    metrics_tracker.track_retrieval(time.perf_counter() - retrieval_start)
+    logging.info("Batch: %d searches for %d queries", len(groups), len(pending))
+
+    # Image fetch, deduplicated across the batch
+    docs_with_uri = {i: [(doc, s3_uri) for doc in docs if (s3_uri := doc_s3_uri(doc))] for i, docs in results.items()}
+    unique = {}
+    for pairs in docs_with_uri.values():
+        for doc, s3_uri in pairs:
+            unique.setdefault(s3_uri, doc.metadata.get('derivative_s3_uri'))
+    fetch_results, fetch_time = await run_io(fetch_catalog_images, list(unique), list(unique.values()))
+    fetched = dict(zip(unique, fetch_results))
+    metrics_tracker.track_image_fetch(fetch_time, sum(not r.ok for r in fetch_results))
+    metrics_tracker.track_stage('presign', sum(r.presign_seconds for r in fetch_results))
+    logging.info("Batch: fetched %d unique images in %.3fs", len(unique), fetch_time)
+
+    # Generation + output guardrails, concurrently
+    order = list(docs_with_uri)
+    recommendations = {
+        i: build_recommendations(docs_with_uri[i], [fetched[s3_uri] for _, s3_uri in docs_with_uri[i]])
+        for i in order
+    }
+    answers = await asyncio.gather(
+        *(_answer_batch_item(queries[i], *recommendations[i], embeddings[i], filters[i], metrics_tracker)
+          for i in order),
+        return_exceptions=True
+    )
+    for i, answer in zip(order, answers):
+        if isinstance(answer, Exception):
+            logging.error(f"Batch item {i} failed: {answer}")
+            items[i].error = str(answer)
+            continue
+        items[i].response = answer[1]
+        items[i].recommended_items = recommendations[i][1]
+    return items
+
+@router.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch_endpoint(request: ChatBatchRequest, x_cache_bypass: Optional[str] = Header(None)):
+    """
+    Answer a list of queries in one call (for merchandising tools and batch jobs).
+    Results come back in request order; an item that failed has `error` set.
+    """
+    logging.info("Hit /chat/batch endpoint (%d queries)", len(request.queries))
+    if len(request.queries) > CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {CHAT_BATCH_MAX_QUERIES} queries per batch")
+    try:
+        async with request_limiter:
+            return await _handle_chat_batch(request, use_cache=not _is_truthy(x_cache_bypass))
+    except Overloaded as e:
+        logging.warning(f"Rejected /chat/batch request: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def _handle_chat_batch(request: ChatBatchRequest, use_cache: bool = True):
+    metrics_tracker = create_metrics_tracker('/chat/batch')
+    metrics_tracker.start_request()
+    try:
+        results = await chat_batch_flow(request.queries, metrics_tracker, use_cache=use_cache)
+        metrics_tracker.end_request('success')
+        return ChatBatchResponse(results=results)
+    except Exception as e:
+        metrics_tracker.end_request('error')
+        logging.error("Exception caught in chat_batch_endpoint:", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def chat_event_stream(request: ChatRequest, use_cache: bool = True):
+    """
+    /chat pipeline as Server-Sent Events:
+    - items: recommended items (presigned URLs + metadata), sent as soon as retrieval and S3 are done
+    - token: Gemini answer chunks as they arrive
+    - done: final (moderated) answer; `failed` is set if Gemini broke off, in which case the
+      response is GEMINI_ERROR_RESPONSE and replaces any tokens already sent
+    - error: pipeline failure
+    """
+    metrics_tracker = create_metrics_tracker('/chat/stream')
+    metrics_tracker.start_request()
+    query = request.query
+    # Ended in `finally`, so a client disconnect (GeneratorExit/CancelledError) is counted too
+    status = 'disconnected'
+    
+    try:
+        with metrics_tracker.span('guardrails'):
+            verdict = input_guardrails.check(query)
+        metrics_tracker.track_guardrail('input', verdict.rule, verdict.is_valid)
+        if not verdict.is_valid:
+            logging.warning(f"Input blocked by guardrails: {verdict.message}")
+            yield _sse("items", {"recommended_items": []})
+            metrics_tracker.track_first_byte('items')
+            yield _sse("done", {"response": verdict.message, "moderated": False, "failed": False})
+            status = 'success'
+            return
+        
+        with metrics_tracker.span('filter_routing'):
+            filters = determine_filters(query)
+        with metrics_tracker.span('query_embedding'):
+            query_embedding = await run_cpu(embed_query, query)
+        
+        cached = response_cache.lookup(query_embedding, filters) if use_cache else None
+        if cached is not None:
+            logging.info("Served streamed response from semantic cache")
+            cached = from_cache_entry(cached)
+            yield _sse("items", {"recommended_items": cached["recommended_items"]})
+            metrics_tracker.track_first_byte('items')
+            yield _sse("done", {"response": cached["response"], "moderated": False, "failed": False})
+            status = 'success'
+            return
+        
+        retrieval_start = time.perf_counter()
+        results = await run_cpu(retrieve_documents, query, filters, query_embedding=query_embedding)
+        metrics_tracker.track_retrieval(time.perf_counter() - retrieval_start)
+        images_data, recommended_items = await collect_recommendations(results, metrics_tracker)
+        yield _sse("items", {"recommended_items": recommended_items})
+        metrics_tracker.track_first_byte('items')
+        
+        chunks = []
+        failed = False
+        try:
+            async for chunk in stream_fashion_advice(query, images_data, metrics_tracker):
+                if not chunks:
+                    metrics_tracker.track_first_byte('first_token')
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+        except AdviceUnavailable:
+            failed = True
+        
+        # Tokens are already on the wire, so moderation can only replace the final answer
+        is_safe, response_text = finish_answer("".join(chunks), failed, recommended_items, query_embedding,
+                                               filters, metrics_tracker)
+        yield _sse("done", {"response": response_text, "moderated": not is_safe, "failed": failed})
+        status = 'success'
+    except Exception as e:
+        status = 'error'
+        logging.error("Exception caught in chat_event_stream:", exc_info=True)
+        yield _sse("error", {"detail": str(e)})
+    finally:
+        metrics_tracker.end_request(status)
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse holding an admission slot until the response is over,
+    however it ends: completed, client disconnected mid-stream, or failed
+    before the body was ever iterated.
+    """
+
+    def __init__(self, content, limiter: ConcurrencyLimiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                # A disconnect cancels the sender without closing the generator; close it now
+                await self.body_iterator.aclose()
+            finally:
+                self.limiter.release()
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, x_cache_bypass: Optional[str] = Header(None)):
+    """Streaming variant of /chat (text/event-stream)."""
+    logging.info("Hit /chat/stream endpoint")
+    try:
+        await request_limiter.acquire()
+    except Overloaded as e:
+        logging.warning(f"Rejected /chat/stream request: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    # The slot is held until the response is over, not just until the body is exhausted
+    return AdmittedStreamingResponse(chat_event_stream(request, use_cache=not _is_truthy(x_cache_bypass)),
+                                     request_limiter, media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/health")
 def health():
     return {"status": "ok"}
 
-@app.get("/metrics")
+@router.get("/ready")
+def ready():
+    """Readiness probe: 200 once models are loaded and warmed up, 503 before."""
+    if components.ready:
+        return {"status": "ready"}
+    if components.warmup_error:
+        return JSONResponse(status_code=503, content={"status": "error", "detail": components.warmup_error})
+    return JSONResponse(status_code=503, content={"status": "warming_up"})
+
+@router.get("/guardrails/stats")
+def guardrails_stats():
+    """Guardrail event counts by event type and rule (kept incrementally, not read from the log)."""
+    return guardrail_stats.snapshot()
+
+@router.get("/metrics")
 def metrics():
-    """Prometheus metrics endpoint."""
-    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
-
-# Standard CORS Configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    """Prometheus metrics endpoint (all workers when PROMETHEUS_MULTIPROC_DIR is set)."""
+    return Response(content=metrics_payload(), media_type=CONTENT_TYPE_LATEST)
+
+def create_app(app_components: Optional[Components] = None, warm_up: bool = True) -> FastAPI:
+    """
+    Build the API.
+
+    Args:
+        app_components: Components to serve with (defaults to lazily loaded real ones)
+        warm_up: Load models and run a dummy embed + search in the background at startup
+    """
+    global components
+    components = app_components or Components()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if warm_up:
+            threading.Thread(target=components.warm_up, name="warm-up", daemon=True).start()
+        yield
+
+    app = FastAPI(title="Style Sync API", lifespan=lifespan)
+    app.include_router(router)
+
+    # Standard CORS Configuration
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+app = create_app()
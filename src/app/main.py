@@ -1,20 +1,36 @@
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, HTTPException, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
 import boto3
-import pandas as pd
+import re
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
-# import io
-# from PIL import Image
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.catalog_store import CATALOG_STORE_DIR, open_catalog_store
+from src.concurrency import run_cpu
+from src.zero_shot import catalog_labels, decode_image, load_zero_shot_classifier
+
+# Configuration
+PREDICT_BATCH_MAX_FILES = int(os.environ.get("PREDICT_BATCH_MAX_FILES", "32"))
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_classifier()
+    yield
+
+
 # Initialize FastAPI app
-app = FastAPI(title="StyleSync API", description="AI Fashion Styling API")
+app = FastAPI(title="StyleSync API", description="AI Fashion Styling API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -40,6 +56,7 @@ class PredictionResult(BaseModel):
     color: str
     style: str
     confidence: float
+    scores: Dict[str, float]
     recommendations: List[str]
 
 
@@ -49,23 +66,42 @@ class StylistAdvice(BaseModel):
     matching_products: List[int]
 
 
-# Load data (you might want to cache this)
-try:
-    images_df = pd.read_csv("data/images.csv")
-    styles_df = pd.read_csv("data/styles.csv", on_bad_lines="skip", quotechar='"')
+# Product catalog: memory-mapped columnar store, (re)built from the CSVs when they change.
+# A failed build stops the worker instead of serving without a catalog.
+catalog = open_catalog_store(CATALOG_STORE_DIR, "data/styles.csv", "data/images.csv")
+if catalog is None:
+    print("No catalog data; product lookups are disabled")
+
+# Catalog attributes a free-text question can name, e.g. "black formal shoes for men"
+ASK_ATTRIBUTES = ("gender", "baseColour", "articleType", "season", "usage")
+MATCHING_PRODUCTS_LIMIT = 3
+
+
+def _words(text: str) -> str:
+    return " " + " ".join(re.findall(r"[a-z0-9]+", text.lower())) + " "
 
-    # Merge data
-    merged_df = pd.merge(
-        images_df,
-        styles_df,
-        left_on=images_df["filename"].str.replace(".jpg", ""),
-        right_on="id",
-        how="inner",
-    )
-except Exception as e:
-    print(f"Dummy data: {e}")
-    # Create dummy data if files don't exist
-    merged_df = pd.DataFrame()
+
+def matching_products(text: str, limit: int = MATCHING_PRODUCTS_LIMIT) -> List[int]:
+    """Ids of catalog products whose attributes are all named in the text."""
+    if catalog is None:
+        return []
+    words = _words(text)
+    conditions = {}
+    for column in ASK_ATTRIBUTES:
+        named = [value for value in catalog.categories.get(column, []) if _words(value) in words]
+        if named:
+            conditions[column] = named
+    if not conditions:
+        return []
+    return [int(i) for i in catalog.ids(catalog.mask(**conditions))[:limit]]
+
+
+def similar_products(subcategory: str, colour: str, limit: int = 3) -> List[str]:
+    """Names of a few catalog products with the given subcategory and colour."""
+    if catalog is None or not {"subCategory", "baseColour", "productDisplayName"} <= set(catalog.columns):
+        return []
+    positions = catalog.mask(subCategory=subcategory, baseColour=colour).nonzero()[0][:limit]
+    return [catalog.value("productDisplayName", int(position)) for position in positions]
 
 
 @app.get("/")
@@ -78,31 +114,73 @@ def health():
     return {"status": "ok"}
 
 
-@app.post("/predict")
-async def predict(file: UploadFile = File(...), text: str = Form("")):
-    """Predict fashion attributes from uploaded image"""
-    # Read image
-    # image_data = await file.read()
-    # image = Image.open(io.BytesIO(image_data))
+@app.get("/products/{product_id}")
+def get_product(product_id: int):
+    """Catalog row of a product"""
+    product = catalog.get(product_id) if catalog is not None else None
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
 
-    # Here you would add your actual ML model prediction
-    # For now, return mock predictions
+# Zero-shot classifier over the catalog's labels, built at startup
+classifier = None
 
+
+def load_classifier():
+    global classifier
+    labels = catalog_labels(catalog) if catalog is not None else {}
+    if not labels:
+        print("No catalog labels; /predict is disabled")
+        return
+    try:
+        classifier = load_zero_shot_classifier(labels)
+    except Exception as e:
+        print(f"Zero-shot model unavailable: {e}")
+
+
+def to_prediction_result(prediction: dict) -> dict:
+    scores = prediction["scores"]
     return {
-        "category": "Topwear",
-        "subcategory": "Shirts",
-        "color": "Blue",
-        "style": "Casual",
-        "confidence": 0.92,
-        "recommendations": [
-            "Pair with slim-fit jeans",
-            "Add a leather jacket for layering",
-            "Accessorize with a silver watch",
-        ],
-        "user_question": text,
+        "category": prediction.get("category", ""),
+        "subcategory": prediction.get("subcategory", ""),
+        "color": prediction.get("colour", ""),
+        "style": prediction.get("usage", ""),
+        # The least certain attribute bounds how much the whole prediction can be trusted
+        "confidence": min(scores.values()) if scores else 0.0,
+        "scores": scores,
+        "recommendations": similar_products(prediction.get("subcategory"), prediction.get("colour")),
     }
 
 
+async def predict_uploads(files: List[UploadFile]) -> List[dict]:
+    if classifier is None:
+        raise HTTPException(status_code=503, detail="Prediction model is not loaded")
+    uploads = [await file.read() for file in files]
+    try:
+        images = await run_cpu(lambda: [decode_image(data) for data in uploads])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # One image forward pass and one matmul for the whole batch
+    predictions = await run_cpu(classifier.predict, images)
+    return [to_prediction_result(prediction) for prediction in predictions]
+
+
+@app.post("/predict")
+async def predict(file: UploadFile = File(...), text: str = Form("")):
+    """Predict fashion attributes from uploaded image (CLIP zero-shot over catalog labels)"""
+    result = (await predict_uploads([file]))[0]
+    return {**result, "user_question": text}
+
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """Predict fashion attributes for several uploaded images in one pass"""
+    if len(files) > PREDICT_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {PREDICT_BATCH_MAX_FILES} images per batch")
+    return {"predictions": await predict_uploads(files)}
+
+
 @app.post("/ask")
 async def ask_stylist(text: str):
     """Get fashion advice from AI stylist"""
@@ -114,5 +192,5 @@ async def ask_stylist(text: str):
             "Formal: Blazer + Button-down + Tailored trousers",
             "Evening: Silk dress + Statement jewelry",
         ],
-        "matching_products": [1, 5, 12],
+        "matching_products": matching_products(text),
     }
@@ -0,0 +1,25 @@
+# src/cache/__init__.py
+# Exports are resolved on first access, so importing one cache module (e.g.
+# src.cache.lru from the guardrails) does not load the others and their
+# dependencies.
+import importlib
+
+_EXPORTS = {
+    "LRUCache": ".lru",
+    "ImageCache": ".image_cache",
+    "CachedImage": ".image_cache",
+    "PresignedUrlCache": ".presign_cache",
+    "EmbeddingCache": ".embedding_cache",
+    "CachedEmbedder": ".embedding_cache",
+    "normalize_query": ".embedding_cache",
+    "SemanticResponseCache": ".response_cache",
+    "filters_key": ".response_cache",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,151 @@
+"""
+Query embedding cache for the CLIP text tower.
+- Keys are normalized query text, so "summer dress" and "Summer dress " share an entry
+- Memory tier: per-process LRU
+- Disk tier (optional): SQLite database shared by all workers and kept across restarts
+Every entry is scoped to a model key (model name + checkpoint), so switching
+models never serves vectors from the old one.
+"""
+
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from src.metrics import record_cache_event
+from .lru import LRUCache
+
+# Configuration
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "./.cache/query_embeddings.sqlite")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize query text for cache keys.
+    Mirrors the whitespace cleanup and lowercasing the CLIP tokenizer already
+    applies, so normalized and raw text embed identically.
+    """
+    return " ".join(text.split()).lower()
+
+
+class SQLiteEmbeddingStore:
+    """Persistent embedding store shared between processes."""
+
+    def __init__(self, path: str, model_key: str):
+        self.path = path
+        self.model_key = model_key
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text))"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, texts: List[str]) -> Dict[str, List[float]]:
+        if not texts:
+            return {}
+        placeholders = ",".join("?" * len(texts))
+        rows = self._connection().execute(
+            f"SELECT text, vector FROM query_embeddings WHERE model = ? AND text IN ({placeholders})",
+            [self.model_key, *texts]
+        ).fetchall()
+        found = {}
+        for text, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            found[text] = vector.tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO query_embeddings (model, text, vector) VALUES (?, ?, ?)",
+            [(self.model_key, text, array("f", vector).tobytes()) for text, vector in items.items()]
+        )
+        conn.commit()
+
+
+class EmbeddingCache:
+    """Memory LRU in front of an optional persistent store."""
+
+    def __init__(self, model_key: str, max_entries: int = EMBEDDING_CACHE_SIZE,
+                 store_path: Optional[str] = EMBEDDING_CACHE_PATH):
+        """
+        Args:
+            model_key: Identifies the model/checkpoint that produced the vectors
+            max_entries: Size of the in-memory LRU
+            store_path: SQLite file for the persistent tier (None or "" disables it)
+        """
+        self.model_key = model_key
+        self.memory = LRUCache(
+            max_entries=max_entries,
+            on_evict=lambda key, value: record_cache_event("embedding", "memory", "eviction")
+        )
+        self.store = SQLiteEmbeddingStore(store_path, model_key) if store_path else None
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Look up normalized keys, returning only the ones found."""
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                found[key] = vector
+        record_cache_event("embedding", "memory", "hit", len(found))
+        record_cache_event("embedding", "memory", "miss", len(missing))
+
+        if missing and self.store is not None:
+            stored = self.store.get_many(missing)
+            for key, vector in stored.items():
+                self.memory.put(key, vector)
+            found.update(stored)
+            record_cache_event("embedding", "disk", "hit", len(stored))
+            record_cache_event("embedding", "disk", "miss", len(missing) - len(stored))
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        for key, vector in items.items():
+            self.memory.put(key, vector)
+        if self.store is not None:
+            self.store.put_many(items)
+
+
+class CachedEmbedder:
+    """Wraps an embedder (embed_documents/embed_query) with an EmbeddingCache."""
+
+    def __init__(self, embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [normalize_query(text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        misses = [key for key in dict.fromkeys(keys) if key not in found]
+        if misses:
+            computed = dict(zip(misses, self.embedder.embed_documents(misses)))
+            self.cache.put_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,176 @@
+"""
+Two-tier cache for catalog images sent through the S3-Gemini bridge.
+- Memory tier: LRU bounded by a byte budget
+- Disk tier: size-capped directory shared by all workers on the node (the cap
+  and LRU order are derived from the directory, so they hold across workers)
+Entries hold the ready-to-send Base64 string plus the S3 ETag it was fetched
+with, so repeat hits skip both the download and the encoding, and stale
+entries can be revalidated with a conditional GET.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.metrics import record_cache_event
+from .lru import LRUCache
+
+# Configuration
+IMAGE_CACHE_MEMORY_BYTES = int(os.environ.get("IMAGE_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "./.cache/images")
+IMAGE_CACHE_DISK_BYTES = int(os.environ.get("IMAGE_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+IMAGE_CACHE_MAX_AGE = float(os.environ.get("IMAGE_CACHE_MAX_AGE", "86400"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedImage:
+    """A cached catalog image."""
+    image_b64: str
+    etag: Optional[str]
+    stored_at: float
+
+
+class DiskImageStore:
+    """
+    Size-capped on-disk store with least-recently-used eviction.
+
+    Workers share the directory, so nothing about it is kept in process:
+    recency is each file's mtime (set on write, touched on hits) and usage is
+    re-derived from the directory on every put. One scandir per put is small
+    next to the S3 download that precedes it.
+    """
+
+    SUFFIX = ".b64"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.total_bytes = self._usage()[1]  # As of the last scan
+
+    def _usage(self):
+        """(entries oldest first as (mtime_ns, name, size), total bytes) of the directory."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another worker mid-scan
+                entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        entries.sort()
+        return entries, sum(size for _, _, size in entries)
+
+    def _touch(self, path: Path):
+        # Filesystem timestamps are coarse; stamp with the clock so recency is strictly ordered
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    @classmethod
+    def _filename(cls, key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + cls.SUFFIX
+
+    def get(self, key: str) -> Optional[CachedImage]:
+        path = self.directory / self._filename(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                etag, stored_at = f.readline().rstrip("\n").split("\t")
+                image_b64 = f.read()
+            self._touch(path)
+        except (OSError, ValueError):
+            return None
+        return CachedImage(image_b64=image_b64, etag=etag or None, stored_at=float(stored_at))
+
+    def put(self, key: str, image: CachedImage) -> int:
+        """Store an image and return the number of entries evicted to make room."""
+        name = self._filename(key)
+        path = self.directory / name
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        payload = f"{image.etag or ''}\t{image.stored_at}\n{image.image_b64}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            self._touch(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write image cache entry {path}: {e}")
+            return 0
+        return self._evict(keep=name)
+
+    def _evict(self, keep: str) -> int:
+        """Remove the least recently used entries until the directory fits max_bytes."""
+        entries, total = self._usage()
+        evicted = 0
+        for _, name, size in entries:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(self.directory / name)
+                evicted += 1
+            except FileNotFoundError:
+                pass  # Already evicted by another worker
+            total -= size
+        self.total_bytes = total
+        return evicted
+
+
+class ImageCache:
+    """Memory + disk cache of Base64-encoded catalog images keyed by S3 URI."""
+
+    def __init__(self, memory_bytes: int = IMAGE_CACHE_MEMORY_BYTES,
+                 disk_dir: Optional[str] = IMAGE_CACHE_DIR,
+                 disk_bytes: int = IMAGE_CACHE_DISK_BYTES,
+                 max_age: float = IMAGE_CACHE_MAX_AGE):
+        """
+        Args:
+            memory_bytes: Byte budget of the in-process LRU
+            disk_dir: Directory of the on-disk tier (None or "" disables it)
+            disk_bytes: Size cap of the on-disk tier
+            max_age: Seconds after which an entry is revalidated against its ETag
+        """
+        self.max_age = max_age
+        self.memory = LRUCache(
+            max_bytes=memory_bytes,
+            sizeof=lambda image: len(image.image_b64),
+            on_evict=lambda key, value: record_cache_event("image", "memory", "eviction")
+        )
+        self.disk = DiskImageStore(disk_dir, disk_bytes) if disk_dir else None
+
+    def get(self, s3_uri: str) -> Optional[CachedImage]:
+        """Look up an image, promoting disk hits into memory."""
+        image = self.memory.get(s3_uri)
+        if image is not None:
+            record_cache_event("image", "memory", "hit")
+            return image
+        record_cache_event("image", "memory", "miss")
+
+        if self.disk is None:
+            return None
+        image = self.disk.get(s3_uri)
+        if image is None:
+            record_cache_event("image", "disk", "miss")
+            return None
+        record_cache_event("image", "disk", "hit")
+        self.memory.put(s3_uri, image)
+        return image
+
+    def put(self, s3_uri: str, image_b64: str, etag: Optional[str] = None) -> CachedImage:
+        image = CachedImage(image_b64=image_b64, etag=etag, stored_at=time.time())
+        self.memory.put(s3_uri, image)
+        if self.disk is not None:
+            evicted = self.disk.put(s3_uri, image)
+            if evicted:
+                record_cache_event("image", "disk", "eviction", evicted)
+        return image
+
+    def is_fresh(self, image: CachedImage) -> bool:
+        return time.time() - image.stored_at < self.max_age
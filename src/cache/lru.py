@@ -0,0 +1,85 @@
+"""
+Thread-safe LRU cache bounded by entry count and/or total byte size.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """In-process LRU cache shared by the serving caches."""
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = None,
+                 on_evict: Callable[[Hashable, Any], None] = None):
+        """
+        Args:
+            max_entries: Maximum number of entries (None for unbounded)
+            max_bytes: Maximum total size of values as measured by sizeof (None for unbounded)
+            sizeof: Function returning the size of a value in bytes (defaults to len)
+            on_evict: Called with (key, value) for every entry pushed out by the bounds
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or len
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Never cache a value that would evict everything else
+            self.pop(key)
+            return
+
+        evicted = []
+        with self._lock:
+            if key in self._data:
+                self.total_bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self.total_bytes += size
+            while self._over_budget():
+                old_key, (old_value, old_size) = self._data.popitem(last=False)
+                self.total_bytes -= old_size
+                evicted.append((old_key, old_value))
+
+        if self.on_evict:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value, size = self._data.pop(key)
+            self.total_bytes -= size
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def _over_budget(self) -> bool:
+        if self.max_entries is not None and len(self._data) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,66 @@
+"""
+Expiry-aware cache of S3 presigned URLs.
+Hands back the same URL until it is within a refresh margin of expiring, which
+saves the HMAC signing per item and keeps URLs stable for browser/CDN caching.
+A URL signed with temporary (STS / instance role) credentials stops working
+when their session token expires, even if its own expiration is later, so an
+entry is only reused until the earlier of the two.
+"""
+
+import os
+import time
+from typing import Callable, Optional
+
+from src.metrics import record_cache_event
+from .lru import LRUCache
+
+# Configuration
+PRESIGN_CACHE_SIZE = int(os.environ.get("PRESIGN_CACHE_SIZE", "10000"))
+PRESIGN_REFRESH_MARGIN = float(os.environ.get("PRESIGN_REFRESH_MARGIN", "300"))
+
+
+class PresignedUrlCache:
+    """Bounded, thread-safe cache of presigned URLs keyed by (S3 URI, lifetime)."""
+
+    def __init__(self, max_entries: int = PRESIGN_CACHE_SIZE,
+                 refresh_margin: float = PRESIGN_REFRESH_MARGIN):
+        """
+        Args:
+            max_entries: Maximum number of URLs kept
+            refresh_margin: Seconds before expiry at which a URL is re-signed
+        """
+        self.refresh_margin = refresh_margin
+        self._urls = LRUCache(
+            max_entries=max_entries,
+            on_evict=lambda key, value: record_cache_event("presign", "memory", "eviction")
+        )
+
+    def get_or_sign(self, s3_uri: str, expiration: int, sign: Callable[[], Optional[str]],
+                    credentials_expiry: Optional[Callable[[], Optional[float]]] = None) -> Optional[str]:
+        """
+        Return a cached URL for s3_uri, calling sign() when there is none that
+        stays valid for longer than the refresh margin.
+
+        credentials_expiry, if given, returns the epoch time at which the
+        signing credentials expire (None for static keys); it is read after
+        signing, as signing may refresh them.
+        """
+        key = (s3_uri, expiration)
+        # A margin as long as the lifetime would never reuse anything
+        margin = min(self.refresh_margin, expiration / 2)
+        now = time.time()
+
+        entry = self._urls.get(key)
+        if entry is not None and now < entry[1] - margin:
+            record_cache_event("presign", "memory", "hit")
+            return entry[0]
+        record_cache_event("presign", "memory", "miss")
+
+        url = sign()
+        if url:
+            expires_at = now + expiration
+            credentials_expires_at = credentials_expiry() if credentials_expiry is not None else None
+            if credentials_expires_at is not None:
+                expires_at = min(expires_at, credentials_expires_at)
+            self._urls.put(key, (url, expires_at))
+        return url
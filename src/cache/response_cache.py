@@ -0,0 +1,146 @@
+"""
+Semantic response cache for /chat.
+Serves a previous response when a new query's embedding is close enough
+(cosine similarity above a threshold) to one already answered under the
+same resolved filters, so paraphrases of a known intent skip retrieval,
+the S3 fetches and the Gemini call. Entries hold S3 URIs, not presigned
+URLs; the app presigns them again when serving a hit.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from src.metrics import record_cache_event
+
+# Configuration
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "1000"))
+
+
+def filters_key(filters: Optional[dict]) -> str:
+    """Stable key for a determine_filters() result."""
+    return json.dumps(filters, sort_keys=True)
+
+
+class _Bucket:
+    """Entries sharing one filter set, with a lazily rebuilt embedding matrix."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # entry id -> (vector, response, expires_at)
+        self._ids = []
+        self._matrix = None
+
+    def add(self, entry_id: int, vector: np.ndarray, response: dict, expires_at: float):
+        self.entries[entry_id] = (vector, response, expires_at)
+        self._matrix = None
+
+    def remove(self, entry_id: int):
+        if self.entries.pop(entry_id, None) is not None:
+            self._matrix = None
+
+    def best_match(self, vector: np.ndarray):
+        """Return (entry id, similarity) of the closest entry."""
+        if self._matrix is None:
+            self._ids = list(self.entries)
+            self._matrix = np.stack([self.entries[i][0] for i in self._ids])
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        return self._ids[best], float(similarities[best])
+
+
+class SemanticResponseCache:
+    """TTL- and size-bounded cache of chat responses looked up by query embedding."""
+
+    def __init__(self, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_SIZE):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            ttl: Seconds a response stays servable
+            max_entries: Maximum number of cached responses (least recently used evicted first)
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._buckets = {}
+        self._order = OrderedDict()  # entry id -> bucket key, least recently used first
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: List[float], filters: Optional[dict]) -> Optional[dict]:
+        """Return a cached response for a semantically matching query, or None."""
+        key = filters_key(filters)
+        vector = self._normalize(embedding)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                record_cache_event("response", "memory", "miss")
+                return None
+            self._expire(bucket, key)
+            if not bucket.entries:
+                record_cache_event("response", "memory", "miss")
+                return None
+
+            entry_id, similarity = bucket.best_match(vector)
+            if similarity < self.threshold:
+                record_cache_event("response", "memory", "miss")
+                return None
+            self._order.move_to_end(entry_id)
+            record_cache_event("response", "memory", "hit")
+            return dict(bucket.entries[entry_id][1])
+
+    def store(self, embedding: List[float], filters: Optional[dict], response: dict):
+        key = filters_key(filters)
+        vector = self._normalize(embedding)
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _Bucket())
+            # Replace a near-duplicate instead of growing the bucket
+            if bucket.entries:
+                entry_id, similarity = bucket.best_match(vector)
+                if similarity >= self.threshold:
+                    bucket.remove(entry_id)
+                    self._order.pop(entry_id, None)
+
+            entry_id = next(self._ids)
+            bucket.add(entry_id, vector, dict(response), time.time() + self.ttl)
+            self._order[entry_id] = key
+
+            while len(self._order) > self.max_entries:
+                old_id, old_key = self._order.popitem(last=False)
+                self._remove(old_id, old_key)
+                record_cache_event("response", "memory", "eviction")
+
+    def _expire(self, bucket: _Bucket, key: str):
+        now = time.time()
+        expired = [entry_id for entry_id, entry in bucket.entries.items() if entry[2] <= now]
+        for entry_id in expired:
+            self._order.pop(entry_id, None)
+            self._remove(entry_id, key)
+        if expired:
+            record_cache_event("response", "memory", "expired", len(expired))
+
+    def _remove(self, entry_id: int, key: str):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return
+        bucket.remove(entry_id)
+        if not bucket.entries:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._order)
@@ -0,0 +1,201 @@
+"""
+Catalog Image Fetch Stage
+Pulls the top-k catalog images for a request from S3 in parallel over a
+pooled client, so the stage costs roughly one S3 round-trip instead of k.
+"""
+
+import base64
+import logging
+import os
+import time
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Configuration
+S3_POOL_SIZE = int(os.environ.get("S3_POOL_SIZE", "10"))
+S3_FETCH_TIMEOUT = float(os.environ.get("S3_FETCH_TIMEOUT", "5.0"))
+PRESIGN_EXPIRATION = int(os.environ.get("PRESIGN_EXPIRATION", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+def parse_s3_uri(s3_uri: str) -> Tuple[str, str]:
+    """Split s3://bucket/key into (bucket, key)."""
+    parts = s3_uri.replace("s3://", "").split("/", 1)
+    return parts[0], parts[1]
+
+
+def credentials_expiry(s3_client) -> Optional[float]:
+    """
+    Epoch time at which the client's signing credentials expire, or None for
+    static keys. botocore exposes this only on its private refreshable
+    credentials (_request_signer._credentials._expiry_time).
+    """
+    signer = getattr(s3_client, "_request_signer", None)
+    expiry_time = getattr(getattr(signer, "_credentials", None), "_expiry_time", None)
+    return expiry_time.timestamp() if expiry_time is not None else None
+
+
+def _is_not_modified(error: Exception) -> bool:
+    """True if a conditional GET failed only because the object is unchanged."""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in ('304', 'NotModified')
+
+
+@dataclass
+class ImageFetchResult:
+    """Outcome of fetching a single catalog image."""
+    s3_uri: str
+    image_b64: Optional[str] = None
+    presigned_url: Optional[str] = None
+    error: Optional[str] = None
+    presign_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.image_b64 is not None
+
+
+class CatalogImageFetcher:
+    """Fetches catalog images (and presigned URLs) concurrently from S3."""
+
+    def __init__(self, s3_client, pool_size: int = S3_POOL_SIZE,
+                 timeout: float = S3_FETCH_TIMEOUT,
+                 presign_expiration: int = PRESIGN_EXPIRATION,
+                 cache=None, presign_cache=None):
+        """
+        Args:
+            s3_client: boto3 S3 client; its connection pool should be at least pool_size
+            pool_size: Maximum number of objects fetched at the same time
+            timeout: Seconds to wait for each object, counted from when its own fetch starts
+            presign_expiration: Lifetime of generated presigned URLs in seconds
+            cache: Optional ImageCache consulted before going to S3
+            presign_cache: Optional PresignedUrlCache reused until URLs near expiry
+        """
+        self.s3_client = s3_client
+        self.cache = cache
+        self.presign_cache = presign_cache
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.presign_expiration = presign_expiration
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="s3-fetch")
+
+    def get_image_base64(self, s3_uri: str) -> str:
+        """Download an image from S3 (or the cache) and return it Base64-encoded."""
+        cached = self.cache.get(s3_uri) if self.cache is not None else None
+        if cached is not None and self.cache.is_fresh(cached):
+            return cached.image_b64
+
+        bucket, key = parse_s3_uri(s3_uri)
+        params = {'Bucket': bucket, 'Key': key}
+        if cached is not None and cached.etag:
+            params['IfNoneMatch'] = cached.etag
+        try:
+            response = self.s3_client.get_object(**params)
+        except Exception as e:
+            if cached is not None and _is_not_modified(e):
+                # Unchanged since we cached it; just restart its max-age clock
+                return self.cache.put(s3_uri, cached.image_b64, cached.etag).image_b64
+            raise
+
+        image_b64 = base64.b64encode(response['Body'].read()).decode('utf-8')
+        if self.cache is not None:
+            self.cache.put(s3_uri, image_b64, response.get('ETag'))
+        return image_b64
+
+    def generate_presigned_url(self, s3_uri: str, expiration: Optional[int] = None) -> Optional[str]:
+        """Return a presigned GET URL (reusing a cached one if possible), or None if signing fails."""
+        expiration = expiration or self.presign_expiration
+        if self.presign_cache is None:
+            return self._sign(s3_uri, expiration)
+        return self.presign_cache.get_or_sign(s3_uri, expiration, lambda: self._sign(s3_uri, expiration),
+                                              lambda: credentials_expiry(self.s3_client))
+
+    def _sign(self, s3_uri: str, expiration: int) -> Optional[str]:
+        try:
+            bucket, key = parse_s3_uri(s3_uri)
+            return self.s3_client.generate_presigned_url('get_object',
+                                                         Params={'Bucket': bucket, 'Key': key},
+                                                         ExpiresIn=expiration)
+        except Exception as e:
+            logger.error(f"Error generating presigned URL for {s3_uri}: {e}")
+            return None
+
+    def _fetch_one(self, s3_uri: str, derivative_uri: Optional[str] = None) -> ImageFetchResult:
+        image_b64 = None
+        if derivative_uri:
+            # Prefer the ingest-time Gemini-sized derivative; the original is the fallback
+            try:
+                image_b64 = self.get_image_base64(derivative_uri)
+            except Exception as e:
+                logger.warning(f"Derivative {derivative_uri} unavailable, using original: {e}")
+        if image_b64 is None:
+            try:
+                image_b64 = self.get_image_base64(s3_uri)
+            except Exception as e:
+                return ImageFetchResult(s3_uri=s3_uri, error=str(e))
+        presign_start = time.perf_counter()
+        presigned_url = self.generate_presigned_url(s3_uri)
+        return ImageFetchResult(
+            s3_uri=s3_uri,
+            image_b64=image_b64,
+            presigned_url=presigned_url,
+            presign_seconds=time.perf_counter() - presign_start
+        )
+
+    def fetch_all(self, s3_uris: List[str],
+                  derivative_uris: Optional[List[Optional[str]]] = None) -> Tuple[List[ImageFetchResult], float]:
+        """
+        Fetch all images concurrently.
+
+        Failures and timeouts are reported per object instead of failing the
+        whole stage, so callers can continue with whatever arrived. Each object
+        gets the full timeout from when a pool thread picks it up, so objects
+        queued behind a busy pool are not timed out early; an object that never
+        gets a thread (the pool is stuck on hung fetches) is given up after one
+        timeout per wave of pool_size objects.
+
+        Args:
+            s3_uris: Original images (presigned URLs always point at these)
+            derivative_uris: Optional downsized copy per image, inlined instead of the original when present
+
+        Returns:
+            Tuple of (results in input order, stage wall time in seconds)
+        """
+        start = time.perf_counter()
+        derivative_uris = derivative_uris or [None] * len(s3_uris)
+        started = [None] * len(s3_uris)  # perf_counter() at which each fetch got a thread
+        futures = [self._executor.submit(self._fetch_started, started, i, uri, derivative)
+                   for i, (uri, derivative) in enumerate(zip(s3_uris, derivative_uris))]
+        queue_deadline = start + self.timeout * math.ceil(len(s3_uris) / self.pool_size)
+
+        results = [None] * len(s3_uris)
+        pending = set(range(len(s3_uris)))
+        while pending:
+            now = time.perf_counter()
+            for i in list(pending):
+                if futures[i].done():
+                    results[i] = futures[i].result()
+                elif started[i] is not None and now >= started[i] + self.timeout:
+                    results[i] = ImageFetchResult(s3_uri=s3_uris[i], error=f"timed out after {self.timeout}s")
+                elif started[i] is None and now >= queue_deadline and futures[i].cancel():
+                    results[i] = ImageFetchResult(s3_uri=s3_uris[i], error="timed out waiting for a fetch thread")
+                else:
+                    continue
+                pending.discard(i)
+            if pending:
+                deadlines = [queue_deadline if started[i] is None else started[i] + self.timeout for i in pending]
+                wait([futures[i] for i in pending], timeout=max(0.0, min(deadlines) - now),
+                     return_when=FIRST_COMPLETED)
+
+        return results, time.perf_counter() - start
+
+    def _fetch_started(self, started: List[Optional[float]], i: int, s3_uri: str,
+                       derivative_uri: Optional[str]) -> ImageFetchResult:
+        started[i] = time.perf_counter()
+        return self._fetch_one(s3_uri, derivative_uri)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
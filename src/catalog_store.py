@@ -0,0 +1,378 @@
+"""
+Columnar Catalog Store
+The product catalog (styles.csv joined with images.csv) is built once into a
+directory of flat column files that the API memory-maps at startup, instead
+of parsing and merging both CSVs with pandas on every import:
+
+    <dir>/manifest.json          row count, column kinds, category dictionaries, source CSV mtimes/sizes
+    <dir>/<col>.npy              int columns (missing = -1)
+    <dir>/<col>.codes.npy        dictionary-encoded category columns (missing = -1)
+    <dir>/<col>.offsets.npy      string columns: row i is data[offsets[i]:offsets[i + 1]]
+    <dir>/<col>.data.npy         string columns: concatenated UTF-8 bytes
+    <dir>/id_index.npy           product id -> row position (-1 if absent)
+
+Column pages are shared by all workers on a host and only touched when read.
+The store is rebuilt when a source CSV's mtime or size no longer matches the
+manifest. Workers starting together serialize on <dir>.lock, so only the
+first one builds; each build writes to its own temporary directory.
+Lookups by product id are O(1) through id_index; attribute queries are
+vectorized comparisons over the category codes.
+
+Usage:
+    python -m src.catalog_store --styles data/styles.csv --images data/images.csv --output data/catalog_store
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CATALOG_STORE_DIR = os.environ.get("CATALOG_STORE_DIR", "./data/catalog_store")
+
+MANIFEST_FILE = "manifest.json"
+ID_INDEX_FILE = "id_index.npy"
+
+# Column -> kind; columns missing from the CSVs are left out of the store
+SCHEMA = {
+    "id": "int",
+    "gender": "category",
+    "masterCategory": "category",
+    "subCategory": "category",
+    "articleType": "category",
+    "baseColour": "category",
+    "season": "category",
+    "year": "int",
+    "usage": "category",
+    "productDisplayName": "string",
+    "filename": "string",
+    "link": "string",
+}
+
+
+def _read_csv_rows(path: str) -> Iterable[dict]:
+    """Rows of a CSV as dicts, skipping malformed lines (as pandas on_bad_lines='skip')."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        for row in reader:
+            if len(row) == len(header):
+                yield dict(zip(header, row))
+
+
+def _parse_int(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return -1
+
+
+def write_string_column(directory: str, name: str, values: List[str]):
+    """Write a string column as <name>.offsets.npy + <name>.data.npy (concatenated UTF-8)."""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"{name}.data.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+class StringColumn:
+    """Memory-mapped string column written by write_string_column."""
+
+    def __init__(self, directory: str, name: str):
+        self.offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+        self.data = np.load(os.path.join(directory, f"{name}.data.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        return bytes(self.data[self.offsets[position]:self.offsets[position + 1]]).decode("utf-8")
+
+
+def make_build_directory(output_dir: str, suffix: str = ".tmp-") -> str:
+    """A new, uniquely named directory next to output_dir, so concurrent builds never share one."""
+    output_dir = output_dir.rstrip("/")
+    parent = os.path.dirname(output_dir) or "."
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix=os.path.basename(output_dir) + suffix, dir=parent)
+
+
+def replace_directory(tmp_dir: str, output_dir: str):
+    """Swap a freshly written directory in, so readers never see a half-written one."""
+    old_dir = make_build_directory(output_dir, ".old-")
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _lock_file(f):
+    """Block until this process holds an exclusive lock on the open file f."""
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        import msvcrt
+
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # Gives up after ~10s; keep waiting
+                return
+            except OSError:
+                pass
+    fcntl.flock(f, fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        import msvcrt
+
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def build_lock(output_dir: str):
+    """Exclusive lock on <output_dir>.lock, held while the store is checked and built."""
+    path = f"{output_dir.rstrip('/')}.lock"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as f:
+        _lock_file(f)
+        try:
+            yield
+        finally:
+            _unlock_file(f)
+
+
+def source_files(styles_csv: str, images_csv: Optional[str] = None) -> Dict[str, Optional[dict]]:
+    """mtime and size of each source CSV (None if it does not exist), as stored in the manifest."""
+    sources = {}
+    for name, path in (("styles", styles_csv), ("images", images_csv)):
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            sources[name] = {"mtime": stat.st_mtime, "size": stat.st_size}
+        else:
+            sources[name] = None
+    return sources
+
+
+def build_catalog_store(styles_csv: str, images_csv: Optional[str] = None,
+                        output_dir: str = CATALOG_STORE_DIR) -> str:
+    """
+    Join styles.csv with images.csv (on id = filename without .jpg) and write the store.
+    Products without an image row are kept, with empty filename/link.
+    """
+    sources = source_files(styles_csv, images_csv)
+    images = {}
+    if images_csv and os.path.exists(images_csv):
+        for row in _read_csv_rows(images_csv):
+            images[os.path.splitext(row.get("filename", ""))[0]] = row
+
+    rows = []
+    for row in _read_csv_rows(styles_csv):
+        image = images.get(row.get("id", "").strip(), {})
+        rows.append({**row, "filename": image.get("filename", ""), "link": image.get("link", "")})
+    columns = {name: kind for name, kind in SCHEMA.items() if rows and name in rows[0]}
+    if "id" not in columns:
+        raise ValueError(f"{styles_csv} has no id column")
+
+    tmp_dir = make_build_directory(output_dir)
+    try:
+        _write_columns(tmp_dir, rows, columns, sources)
+        replace_directory(tmp_dir, output_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    logger.info(f"Wrote catalog store ({len(rows)} products, {len(columns)} columns) to {output_dir}")
+    return output_dir
+
+
+def _write_columns(tmp_dir: str, rows: List[dict], columns: Dict[str, str], sources: dict):
+    manifest = {"rows": len(rows), "columns": {}, "sources": sources}
+    for name, kind in columns.items():
+        values = [(row.get(name) or "").strip() for row in rows]
+        entry = {"kind": kind}
+        if kind == "int":
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.array([_parse_int(v) for v in values], dtype=np.int32))
+        elif kind == "category":
+            categories = sorted({v for v in values if v})
+            lookup = {category: code for code, category in enumerate(categories)}
+            dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+            codes = np.array([lookup.get(v, -1) for v in values], dtype=dtype)
+            np.save(os.path.join(tmp_dir, f"{name}.codes.npy"), codes)
+            entry["categories"] = categories
+        else:
+            write_string_column(tmp_dir, name, values)
+        manifest["columns"][name] = entry
+
+    ids = np.load(os.path.join(tmp_dir, "id.npy"))
+    id_index = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int32)
+    valid = ids >= 0
+    id_index[ids[valid]] = np.flatnonzero(valid)
+    np.save(os.path.join(tmp_dir, ID_INDEX_FILE), id_index)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+
+def has_catalog_store(directory: str = CATALOG_STORE_DIR) -> bool:
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+
+def is_current(directory: str, styles_csv: str, images_csv: Optional[str] = None) -> bool:
+    """True if the store exists and was built from the CSVs as they are now."""
+    if not has_catalog_store(directory):
+        return False
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f).get("sources") == source_files(styles_csv, images_csv)
+
+
+class CatalogStore:
+    """Read-only, memory-mapped view of a build_catalog_store directory."""
+
+    def __init__(self, directory: str = CATALOG_STORE_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        self.rows = manifest["rows"]
+        self.kinds = {name: entry["kind"] for name, entry in manifest["columns"].items()}
+        self.categories = {name: entry["categories"] for name, entry in manifest["columns"].items()
+                           if entry["kind"] == "category"}
+        self._codes = {name: {category: code for code, category in enumerate(values)}
+                       for name, values in self.categories.items()}
+        self._arrays = {}
+        for name, kind in self.kinds.items():
+            if kind == "int":
+                self._arrays[name] = self._load(f"{name}.npy")
+            elif kind == "category":
+                self._arrays[name] = self._load(f"{name}.codes.npy")
+            else:
+                self._arrays[name] = StringColumn(directory, name)
+        self.id_index = self._load(ID_INDEX_FILE)
+
+    def _load(self, filename: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, filename), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.kinds)
+
+    # Row access
+
+    def position(self, product_id) -> Optional[int]:
+        """Row position of a product id, or None."""
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= product_id < len(self.id_index):
+            return None
+        position = int(self.id_index[product_id])
+        return position if position >= 0 else None
+
+    def value(self, name: str, position: int):
+        """One cell; None for missing category/int values, "" for missing strings."""
+        kind = self.kinds[name]
+        if kind == "string":
+            return self._arrays[name][position]
+        raw = int(self._arrays[name][position])
+        if raw < 0:
+            return None
+        return self.categories[name][raw] if kind == "category" else raw
+
+    def row(self, position: int) -> dict:
+        return {name: self.value(name, position) for name in self.kinds}
+
+    def get(self, product_id) -> Optional[dict]:
+        """Product row by id in O(1), or None."""
+        position = self.position(product_id)
+        return self.row(position) if position is not None else None
+
+    def rows_at(self, positions: Iterable[int]) -> List[dict]:
+        return [self.row(int(position)) for position in positions]
+
+    # Vectorized queries
+
+    def codes(self, name: str) -> np.ndarray:
+        """Category codes (or int values) of a column, one per row."""
+        return self._arrays[name]
+
+    def mask(self, **conditions) -> np.ndarray:
+        """
+        Boolean row mask for equality conditions, e.g. mask(season="Winter", gender=["Men", "Unisex"]).
+        int columns also accept a (min, max) tuple, either end None, e.g. year=(2022, None).
+        Unknown category values match nothing.
+        """
+        result = np.ones(self.rows, dtype=bool)
+        for name, wanted in conditions.items():
+            column = self._arrays[name]
+            if self.kinds[name] == "category":
+                values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+                codes = [self._codes[name][v] for v in values if v in self._codes[name]]
+                result &= np.isin(column, codes)
+            elif isinstance(wanted, tuple):
+                low, high = wanted
+                if low is not None:
+                    result &= column >= low
+                if high is not None:
+                    result &= column <= high
+            else:
+                result &= column == wanted
+        return result
+
+    def ids(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        column = self._arrays["id"]
+        return np.asarray(column if mask is None else column[mask])
+
+    def value_counts(self, name: str) -> Dict[str, int]:
+        """Products per category value."""
+        codes = np.asarray(self._arrays[name])
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.categories[name]))
+        return {category: int(count) for category, count in zip(self.categories[name], counts)}
+
+
+def open_catalog_store(directory: str = CATALOG_STORE_DIR, styles_csv: Optional[str] = None,
+                       images_csv: Optional[str] = None) -> Optional[CatalogStore]:
+    """
+    Memory-map the store, (re)building it first if it is missing or older than the CSVs.
+    Without the CSVs an existing store is used as is. Returns None when there is no catalog at all.
+    """
+    if not styles_csv or not os.path.exists(styles_csv):
+        return CatalogStore(directory) if has_catalog_store(directory) else None
+    if not is_current(directory, styles_csv, images_csv):
+        with build_lock(directory):
+            # Another worker may have built it while this one waited for the lock
+            if not is_current(directory, styles_csv, images_csv):
+                build_catalog_store(styles_csv, images_csv, directory)
+    return CatalogStore(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the memory-mapped catalog store.")
+    parser.add_argument("--styles", default="data/styles.csv")
+    parser.add_argument("--images", default="data/images.csv")
+    parser.add_argument("--output", default=CATALOG_STORE_DIR)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    build_catalog_store(args.styles, args.images, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Serving Components
+Heavy dependencies (OpenCLIP/torch, Chroma, boto3, Gemini) are imported and
+built on first use instead of at import time, so the API boots fast and
+tests can inject lightweight fakes for any component.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from src.cache import ImageCache, PresignedUrlCache, EmbeddingCache, CachedEmbedder
+from src.catalog_images import CatalogImageFetcher, S3_POOL_SIZE, S3_FETCH_TIMEOUT
+from src.embeddings import EmbeddingBatcher, load_openclip_embedder, embedder_model_key
+from src.vector_index import VECTOR_INDEX_DIR, VectorIndex, has_vector_index
+from src.vectorstores import VECTOR_BACKENDS, ChromaBackend, NumpyBackend
+
+# Configuration
+CHROMA_DB_DIR = "./chroma_db"
+MODEL_NAME = "ViT-B-32"
+CHECKPOINT = "laion2b_s34b_b79k"
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+# chroma (default) or numpy (exact scan of the memory-mapped vector index; build it with `make vector-index`)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+
+logger = logging.getLogger(__name__)
+
+
+class Components:
+    """Lazily initialized serving components."""
+
+    NAMES = ("text_embedder", "embedding_function", "vectorstore", "attribute_index", "vector_backend",
+             "s3_client", "image_fetcher", "llm")
+
+    def __init__(self, backend: str = VECTOR_BACKEND, **overrides):
+        """
+        Args:
+            backend: Vector backend to build, one of VECTOR_BACKENDS (unless vector_backend is overridden)
+            **overrides: Ready-made instances for any of NAMES (e.g. fakes in tests)
+        """
+        unknown = set(overrides) - set(self.NAMES)
+        if unknown:
+            raise TypeError(f"Unknown components: {sorted(unknown)}")
+        if backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unknown vector backend {backend!r}; expected one of {VECTOR_BACKENDS}")
+        self.backend = backend
+        self._instances = dict(overrides)
+        self._lock = threading.RLock()
+        self.ready = False
+        self.warmup_error = None
+
+    def _get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = getattr(self, f"_build_{name}")()
+                logger.info(f"Initialized {name} in {time.perf_counter() - started:.2f}s")
+            return self._instances[name]
+
+    @property
+    def text_embedder(self):
+        """Raw OpenCLIP text embedder."""
+        return self._get("text_embedder")
+
+    @property
+    def embedding_function(self):
+        """Query embedder used by the pipeline (cache -> micro-batcher -> text embedder)."""
+        return self._get("embedding_function")
+
+    @property
+    def vectorstore(self):
+        """LangChain Chroma store (only built for the chroma backend or ingest-side use)."""
+        return self._get("vectorstore")
+
+    @property
+    def vector_backend(self):
+        """Retrieval backend used by the pipeline (src.vectorstores)."""
+        return self._get("vector_backend")
+
+    @property
+    def attribute_index(self):
+        """Bitmap pre-filter index over the collection, or None if it has not been built."""
+        return self._get("attribute_index")
+
+    @property
+    def s3_client(self):
+        return self._get("s3_client")
+
+    @property
+    def image_fetcher(self):
+        return self._get("image_fetcher")
+
+    @property
+    def llm(self):
+        return self._get("llm")
+
+    def _build_text_embedder(self):
+        return load_openclip_embedder(MODEL_NAME, CHECKPOINT)
+
+    def _build_embedding_function(self):
+        # Repeated queries skip the text-tower forward pass; concurrent misses share one batched pass
+        return CachedEmbedder(
+            EmbeddingBatcher(self.text_embedder),
+            EmbeddingCache(model_key=embedder_model_key(MODEL_NAME, CHECKPOINT))
+        )
+
+    def _build_vectorstore(self):
+        from langchain_chroma import Chroma
+
+        return Chroma(
+            collection_name="style_sync",
+            embedding_function=self.embedding_function,
+            persist_directory=CHROMA_DB_DIR
+        )
+
+    def _build_attribute_index(self):
+        if not has_vector_index(VECTOR_INDEX_DIR):
+            return None
+        index = VectorIndex(VECTOR_INDEX_DIR)
+        collection = getattr(self.vectorstore, "_collection", None)
+        if collection is not None and collection.count() != len(index):
+            # Built before the last ingest; its candidate sets would miss or invent items
+            logger.warning(f"Vector index in {VECTOR_INDEX_DIR} has {len(index)} vectors but the collection "
+                           f"has {collection.count()}; rebuild it (make vector-index). Using ANN only.")
+            return None
+        return index
+
+    def _build_vector_backend(self):
+        if self.backend == "numpy":
+            return NumpyBackend(VectorIndex(VECTOR_INDEX_DIR))
+        return ChromaBackend(self.vectorstore, self.attribute_index)
+
+    def _build_s3_client(self):
+        import boto3
+        from botocore.config import Config as BotoConfig
+
+        # Connection pool sized for the concurrent image fetch stage
+        return boto3.client('s3', config=BotoConfig(
+            max_pool_connections=S3_POOL_SIZE,
+            connect_timeout=S3_FETCH_TIMEOUT,
+            read_timeout=S3_FETCH_TIMEOUT,
+            retries={'max_attempts': 2}
+        ))
+
+    def _build_image_fetcher(self):
+        return CatalogImageFetcher(self.s3_client, cache=ImageCache(), presign_cache=PresignedUrlCache())
+
+    def _build_llm(self):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        # Ensure GOOGLE_API_KEY is in env
+        return ChatGoogleGenerativeAI(model=GEMINI_MODEL)
+
+    def warm_up(self):
+        """
+        Build every component and run a dummy embed + search so the first
+        real request does not pay for model loading. Sets ready when done.
+        """
+        started = time.perf_counter()
+        try:
+            # Use the raw embedder so a cached vector cannot skip the forward pass
+            vector = self.text_embedder.embed_query("warm up")
+            self.embedding_function
+            self.vector_backend.search(vector, k=1)
+            self.image_fetcher
+            self.llm
+        except Exception as e:
+            self.warmup_error = str(e)
+            logger.error(f"Warm-up failed: {e}", exc_info=True)
+            return
+        self.ready = True
+        logger.info(f"Warm-up complete in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,130 @@
+"""
+Concurrency helpers for the async API.
+- Bounded executors that keep blocking work (torch, Chroma, boto3, Gemini) off the event loop
+- Admission control: a concurrency limiter with a bounded wait queue that fails fast when full
+- Rate limiting for fan-out to external APIs (e.g. Gemini calls of a /chat/batch request)
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from src.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS
+
+# Configuration
+CPU_EXECUTOR_WORKERS = int(os.environ.get("CPU_EXECUTOR_WORKERS", str(os.cpu_count() or 2)))
+IO_EXECUTOR_WORKERS = int(os.environ.get("IO_EXECUTOR_WORKERS", "32"))
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("MAX_CONCURRENT_REQUESTS", "16"))
+MAX_QUEUED_REQUESTS = int(os.environ.get("MAX_QUEUED_REQUESTS", "32"))
+REQUEST_QUEUE_TIMEOUT = float(os.environ.get("REQUEST_QUEUE_TIMEOUT", "10"))
+GEMINI_MAX_CONCURRENT = int(os.environ.get("GEMINI_MAX_CONCURRENT", "8"))
+GEMINI_RATE_PER_SECOND = float(os.environ.get("GEMINI_RATE_PER_SECOND", "10"))
+
+# CPU-bound inference and vector search
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu-inference")
+# Network-bound S3 and Gemini calls
+io_executor = ThreadPoolExecutor(max_workers=IO_EXECUTOR_WORKERS, thread_name_prefix="io")
+
+
+async def run_in_executor(executor, fn, *args, **kwargs):
+    """Run a blocking call on an executor, keeping context vars (e.g. LangSmith trace parents)."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, ctx.run, functools.partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn, *args, **kwargs):
+    return await run_in_executor(cpu_executor, fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    return await run_in_executor(io_executor, fn, *args, **kwargs)
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted."""
+
+
+class ConcurrencyLimiter:
+    """
+    Async context manager admitting at most max_concurrent requests.
+
+    Up to max_queue further requests wait for a slot (for at most
+    queue_timeout seconds); anything beyond that is rejected immediately.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+                 max_queue: int = MAX_QUEUED_REQUESTS,
+                 queue_timeout: float = REQUEST_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    async def acquire(self):
+        """Wait for a slot, raising Overloaded if the queue is full or the wait times out."""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        if self.waiting >= self.max_queue:
+            ADMISSION_REJECTIONS.labels(reason='queue_full').inc()
+            raise Overloaded("Server is busy, please retry shortly.")
+
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.set(self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_REJECTIONS.labels(reason='queue_timeout').inc()
+            raise Overloaded("Server is busy, please retry shortly.")
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.set(self.waiting)
+
+    def release(self):
+        self._semaphore.release()
+
+
+class RateLimiter:
+    """
+    Async context manager for calls to a rate-limited API: at most
+    max_concurrent calls in flight, and call starts spaced so no more than
+    rate_per_second begin per second (0 disables the spacing).
+    """
+
+    def __init__(self, rate_per_second: float = GEMINI_RATE_PER_SECOND,
+                 max_concurrent: int = GEMINI_MAX_CONCURRENT):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.max_concurrent = max_concurrent
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self.interval:
+            # Reserve the next start slot before sleeping, so waiters are spaced in arrival order
+            now = asyncio.get_running_loop().time()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+            if start > now:
+                try:
+                    await asyncio.sleep(start - now)
+                except BaseException:
+                    self._semaphore.release()
+                    raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+        return False
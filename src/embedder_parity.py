@@ -0,0 +1,134 @@
+"""
+Embedder Parity Check
+Compares an optimized CPU inference mode (int8 / torchscript) against the
+fp32 text encoder on the catalog before it is enabled with EMBEDDER_MODE:
+- Cosine agreement between fp32 and optimized embeddings of catalog captions
+- Top-k overlap of the catalog items each caption retrieves
+- Single-query latency and batch throughput of both
+
+Usage:
+    python -m src.embedder_parity --mode int8 [--samples 500] [--k 10]
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from src.components import CHROMA_DB_DIR, MODEL_NAME, CHECKPOINT
+from src.embeddings import EMBEDDER_MODES, optimize_for_cpu
+
+COLLECTION_NAME = "style_sync"
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity summary between two embedding matrices."""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = np.sum(reference * candidate, axis=1)
+    return {
+        "mean": float(cosines.mean()),
+        "p5": float(np.percentile(cosines, 5)),
+        "min": float(cosines.min()),
+    }
+
+
+def top_k(queries: np.ndarray, catalog: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k most similar catalog rows for each query (unordered)."""
+    scores = queries @ catalog.T
+    return np.argpartition(-scores, kth=min(k, catalog.shape[0] - 1), axis=1)[:, :k]
+
+
+def top_k_overlap(reference: np.ndarray, candidate: np.ndarray, catalog: np.ndarray, k: int) -> float:
+    """Mean fraction of the reference top-k also returned by the candidate."""
+    ref_ids = top_k(reference, catalog, k)
+    cand_ids = top_k(candidate, catalog, k)
+    overlaps = [len(set(r) & set(c)) / k for r, c in zip(ref_ids, cand_ids)]
+    return float(np.mean(overlaps))
+
+
+def measure_latency(embedder, texts: List[str], runs: int, batch_size: int) -> Dict[str, float]:
+    """Single-query p50/p99 latency (ms) and batched throughput (texts/s)."""
+    embedder.embed_documents(texts[:batch_size])  # warm up
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        embedder.embed_query(texts[i % len(texts)])
+        timings.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embedder.embed_documents(texts[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "batch_texts_per_s": len(texts) / elapsed,
+    }
+
+
+def load_catalog(samples: int):
+    """Catalog captions (sampled) and all stored image embeddings from Chroma."""
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=CHROMA_DB_DIR).get_collection(COLLECTION_NAME)
+    data = collection.get(include=["documents", "embeddings"])
+    captions = [doc for doc in data["documents"] if doc]
+    rng = np.random.default_rng(0)
+    picked = rng.choice(len(captions), size=min(samples, len(captions)), replace=False)
+    catalog = np.asarray(data["embeddings"], dtype=np.float32)
+    return [captions[i] for i in picked], catalog
+
+
+def run_parity_check(mode: str, samples: int, k: int, runs: int, batch_size: int) -> dict:
+    import open_clip
+
+    captions, catalog = load_catalog(samples)
+    model, _, _ = open_clip.create_model_and_transforms(MODEL_NAME, pretrained=CHECKPOINT)
+    model.eval()
+    tokenizer = open_clip.get_tokenizer(MODEL_NAME)
+
+    reference_embedder = optimize_for_cpu(model, tokenizer, "fp32")
+    candidate_embedder = optimize_for_cpu(model, tokenizer, mode)
+
+    reference = np.asarray(reference_embedder.embed_documents(captions), dtype=np.float32)
+    candidate = np.asarray(candidate_embedder.embed_documents(captions), dtype=np.float32)
+
+    return {
+        "mode": mode,
+        "samples": len(captions),
+        "catalog_size": int(catalog.shape[0]),
+        "cosine_agreement": cosine_agreement(reference, candidate),
+        f"top{k}_overlap": top_k_overlap(reference, candidate, catalog, k),
+        "latency": {
+            "fp32": measure_latency(reference_embedder, captions, runs, batch_size),
+            mode: measure_latency(candidate_embedder, captions, runs, batch_size),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare an optimized text encoder against fp32.")
+    parser.add_argument("--mode", choices=[m for m in EMBEDDER_MODES if m != "fp32"], default="int8")
+    parser.add_argument("--samples", type=int, default=500, help="Catalog captions to embed")
+    parser.add_argument("--k", type=int, default=10, help="Top-k for the retrieval overlap")
+    parser.add_argument("--runs", type=int, default=100, help="Single-query latency runs")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Fail if mean cosine is lower")
+    parser.add_argument("--min-overlap", type=float, default=0.9, help="Fail if top-k overlap is lower")
+    args = parser.parse_args(argv)
+
+    report = run_parity_check(args.mode, args.samples, args.k, args.runs, args.batch_size)
+    print(json.dumps(report, indent=2))
+
+    passed = (report["cosine_agreement"]["mean"] >= args.min_cosine
+              and report[f"top{args.k}_overlap"] >= args.min_overlap)
+    print(f"Parity {'PASSED' if passed else 'FAILED'} for EMBEDDER_MODE={args.mode}")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Serving-side text embedding helpers.
+- OpenCLIPEmbedder: CLIP text tower exposed as a LangChain-style embedding function
+- EmbeddingBatcher: coalesces concurrent embed calls into one batched forward pass
+- Optional CPU inference modes: dynamic int8 quantization or a frozen TorchScript graph
+- Text-only loading from the memory-mapped text-tower artifact when it has been built
+torch/open_clip are imported on first use so importing this module stays cheap.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from src.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_DELAY
+from src.text_tower import TEXT_TOWER_DIR, has_text_tower, load_text_tower, read_config
+
+# Configuration
+EMBED_BATCH_MAX_SIZE = int(os.environ.get("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBED_BATCH_MAX_WAIT_MS", "5"))
+# fp32 (default), int8 or torchscript; check with `python -m src.embedder_parity --mode <mode>` before enabling
+EMBEDDER_MODE = os.environ.get("EMBEDDER_MODE", "fp32")
+EMBEDDER_MODES = ("fp32", "int8", "torchscript")
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class OpenCLIPEmbedder:
+    def __init__(self, model, tokenizer, encode_text=None):
+        """
+        Args:
+            model: OpenCLIP model (or anything with encode_text)
+            tokenizer: OpenCLIP tokenizer
+            encode_text: Optional replacement for model.encode_text (e.g. a TorchScript graph)
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.encode_text = encode_text or model.encode_text
+        
+    def embed_documents(self, texts):
+        import torch
+
+        with torch.no_grad():
+            text = self.tokenizer(texts)
+            text_features = self.encode_text(text)
+            text_features /= text_features.norm(dim=-1, keepdim=True)
+            return text_features.tolist()
+    
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def optimize_for_cpu(model, tokenizer, mode: str) -> OpenCLIPEmbedder:
+    """
+    Wrap a fp32 model in an embedder using the requested CPU inference mode.
+    - fp32: unchanged
+    - int8: dynamic int8 quantization of the Linear layers (weights int8, activations quantized on the fly)
+    - torchscript: encode_text traced and frozen into an optimized TorchScript graph
+    """
+    import torch
+
+    if mode not in EMBEDDER_MODES:
+        raise ValueError(f"Unknown embedder mode {mode!r}; expected one of {EMBEDDER_MODES}")
+    if mode == "fp32":
+        return OpenCLIPEmbedder(model, tokenizer)
+    if mode == "int8":
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return OpenCLIPEmbedder(quantized, tokenizer)
+
+    class TextEncoder(torch.nn.Module):
+        def __init__(self, clip_model):
+            super().__init__()
+            self.clip_model = clip_model
+
+        def forward(self, tokens):
+            return self.clip_model.encode_text(tokens)
+
+    example = tokenizer(["a photo of a red summer dress", "blue denim jeans"])
+    with torch.no_grad():
+        traced = torch.jit.trace(TextEncoder(model).eval(), example, check_trace=False)
+        graph = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    return OpenCLIPEmbedder(model, tokenizer, encode_text=graph)
+
+
+def load_openclip_embedder(model_name: str, checkpoint: str, mode: str = EMBEDDER_MODE,
+                           text_tower_dir: str = TEXT_TOWER_DIR) -> OpenCLIPEmbedder:
+    """
+    Load the OpenCLIP text encoder and tokenizer for query embedding.
+    Uses the memory-mapped text-tower artifact when one built from the same
+    checkpoint exists (see src.text_tower), otherwise the full CLIP model.
+    """
+    if has_text_tower(text_tower_dir):
+        config = read_config(text_tower_dir)
+        if (config["model_name"], config["checkpoint"]) == (model_name, checkpoint):
+            logger.info(f"Loading text tower from {text_tower_dir} ({mode})...")
+            model, tokenizer = load_text_tower(text_tower_dir)
+            return optimize_for_cpu(model, tokenizer, mode)
+        logger.warning(f"Text tower in {text_tower_dir} was built from {config['model_name']} "
+                       f"({config['checkpoint']}); loading the full model instead")
+
+    import open_clip
+
+    logger.info(f"Loading OpenCLIP model: {model_name} ({checkpoint}, {mode})...")
+    model, _, _ = open_clip.create_model_and_transforms(model_name, pretrained=checkpoint)
+    model.eval()
+    tokenizer = open_clip.get_tokenizer(model_name)
+    return optimize_for_cpu(model, tokenizer, mode)
+
+
+def embedder_model_key(model_name: str, checkpoint: str, mode: str = EMBEDDER_MODE) -> str:
+    """Cache key for vectors produced by a model/checkpoint/inference mode."""
+    key = f"{model_name}/{checkpoint}"
+    # Optimized modes produce slightly different vectors, so they must not share entries
+    return key if mode == "fp32" else f"{key}/{mode}"
+
+
+class _PendingText:
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batcher in front of an embedder.
+
+    Texts submitted from concurrent requests are collected for up to
+    max_wait_ms (or until max_batch_size is reached) and embedded with a
+    single embed_documents call; each caller gets back only its own vectors.
+    """
+
+    def __init__(self, embedder, max_batch_size: int = EMBED_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBED_BATCH_MAX_WAIT_MS):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        pending = [_PendingText(text) for text in texts]
+        for item in pending:
+            self._queue.put(item)
+        return [item.future.result() for item in pending]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[_PendingText]):
+        started = time.perf_counter()
+        for item in batch:
+            EMBEDDING_QUEUE_DELAY.observe(started - item.enqueued_at)
+        EMBEDDING_BATCH_SIZE.observe(len(batch))
+
+        # Identical texts in the same window share one row of the batch
+        unique_texts = list(dict.fromkeys(item.text for item in batch))
+        try:
+            vectors = dict(zip(unique_texts, self.embedder.embed_documents(unique_texts)))
+        except Exception as e:
+            logger.error(f"Batched embedding of {len(unique_texts)} texts failed: {e}")
+            for item in batch:
+                item.future.set_exception(e)
+            return
+        for item in batch:
+            item.future.set_result(vectors[item.text])
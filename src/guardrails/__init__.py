@@ -1,6 +1,7 @@
 # src/guardrails/__init__.py
-from .input_validators import InputGuardrails
+from .input_validators import InputGuardrails, InputVerdict, RuleMatch
 from .output_moderators import OutputGuardrails
 from .logger import GuardrailLogger
+from .stats import GuardrailStats
 
-__all__ = ["InputGuardrails", "OutputGuardrails", "GuardrailLogger"]
+__all__ = ["InputGuardrails", "InputVerdict", "RuleMatch", "OutputGuardrails", "GuardrailLogger", "GuardrailStats"]
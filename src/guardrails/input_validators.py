@@ -2,24 +2,66 @@
 Input Validation Guardrails
 - PII Detection: Blocks queries containing personal information
 - Prompt Injection Filter: Blocks attempts to manipulate the model
+
+A query is scanned once per request, reporting every rule that matched.
+A cheap keyword gate first drops rules that cannot match (no digits, no
+"@", no trigger word), so ordinary fashion queries skip most of the regex
+work. The remaining rules run separately, so matches of different rules may
+overlap (a phone number glued to an email address reports both).
 """
 
 import re
-from typing import Tuple
+from dataclasses import dataclass, field
+from typing import List, Tuple
 from .logger import GuardrailLogger
 
 logger = GuardrailLogger()
 
+PII_BLOCKED_MESSAGE = "Query blocked: Personal information detected. Please remove sensitive data."
+INJECTION_BLOCKED_MESSAGE = "Query blocked: Potentially harmful prompt pattern detected."
+PASSED_MESSAGE = "Query passed all input validations"
+
+_DIGIT = re.compile(r'\d')
+
+
+@dataclass
+class RuleMatch:
+    """One guardrail rule hit in the scanned text."""
+    rule: str
+    category: str  # "pii" or "injection"
+    start: int
+    end: int
+    text: str
+
+
+@dataclass
+class InputVerdict:
+    """Outcome of scanning one query; computed once and shared by metrics and blocking."""
+    is_valid: bool
+    message: str
+    details: dict
+    matches: List[RuleMatch] = field(default_factory=list)
+
+    @property
+    def rule(self) -> str:
+        """Bounded rule label: the blocking rule name, or 'none' if the query passed."""
+        if self.is_valid:
+            return "none"
+        return self.details.get("pii_types", [self.details.get("rule", "unknown")])[0]
+
+    def as_tuple(self) -> Tuple[bool, str, dict]:
+        return (self.is_valid, self.message, self.details)
+
 
 class InputGuardrails:
     """Input validation guardrails for the RAG pipeline."""
-    
+
     # PII Patterns
     EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
     PHONE_PATTERN = re.compile(r'(\+?1?[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}')
     SSN_PATTERN = re.compile(r'\b\d{3}[-]?\d{2}[-]?\d{4}\b')
     CREDIT_CARD_PATTERN = re.compile(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b')
-    
+
     # Prompt Injection Patterns
     INJECTION_PATTERNS = [
         re.compile(r'ignore\s+(all\s+)?(previous|prior|above)\s+(instructions?|prompts?)', re.IGNORECASE),
@@ -33,60 +75,84 @@ class InputGuardrails:
         re.compile(r'jailbreak', re.IGNORECASE),
         re.compile(r'bypass\s+(safety|filter|guard)', re.IGNORECASE),
     ]
-    
+    # Rule names (metric labels) for INJECTION_PATTERNS, in the same order
+    INJECTION_RULES = [
+        "ignore_instructions", "disregard_previous", "forget_instructions", "role_override",
+        "pretend", "act_as", "system_prefix", "system_tag", "jailbreak", "bypass_safety",
+    ]
+    # A lowercase literal every match of the rule contains (the keyword gate)
+    INJECTION_KEYWORDS = [
+        "ignore", "disregard", "forget", "you", "pretend", "act", "system", "<", "jailbreak", "bypass",
+    ]
+
+    # Most specific PII first: the first matching rule is the verdict's rule label
+    PII_RULES = [
+        ("credit_card", CREDIT_CARD_PATTERN),
+        ("ssn", SSN_PATTERN),
+        ("email", EMAIL_PATTERN),
+        ("phone", PHONE_PATTERN),
+    ]
+
+    def __init__(self):
+        self._rules = [(name, "pii", pattern) for name, pattern in self.PII_RULES]
+        self._rules += [(name, "injection", pattern)
+                        for name, pattern in zip(self.INJECTION_RULES, self.INJECTION_PATTERNS)]
+        self._keywords = dict(zip(self.INJECTION_RULES, self.INJECTION_KEYWORDS))
+        self._keywords["email"] = "@"
+
+    def _candidate_rules(self, query: str) -> List[Tuple[str, str, re.Pattern]]:
+        """(name, category, pattern) of the rules that can possibly match the query, in rule order."""
+        # Non-ASCII text skips the gate: re.IGNORECASE folds some characters (e.g. U+0130) that str.lower() does not
+        if not query.isascii():
+            return self._rules
+        lowered = query.lower()
+        has_digit = _DIGIT.search(query) is not None
+        candidates = []
+        for rule in self._rules:
+            keyword = self._keywords.get(rule[0])
+            if (keyword in lowered) if keyword else has_digit:
+                candidates.append(rule)
+        return candidates
+
+    def _rule_matches(self, query: str) -> List[RuleMatch]:
+        """Every match of every candidate rule, in rule order."""
+        return [RuleMatch(name, category, match.start(), match.end(), match.group())
+                for name, category, pattern in self._candidate_rules(query)
+                for match in pattern.finditer(query)]
+
+    def scan(self, query: str) -> List[RuleMatch]:
+        """Every rule match in the query, in text order."""
+        return sorted(self._rule_matches(query), key=lambda m: m.start)
+
+    def check(self, query: str) -> InputVerdict:
+        """Scan the query once and log the verdict."""
+        # Rule order: PII types by specificity, and the injection the sequential checks would report
+        matches = self._rule_matches(query)
+        pii_types = list(dict.fromkeys(m.rule for m in matches if m.category == "pii"))
+        injection = next((m for m in matches if m.category == "injection"), None)
+        matches.sort(key=lambda m: m.start)
+
+        if pii_types:
+            verdict = InputVerdict(False, PII_BLOCKED_MESSAGE, {"pii_types": pii_types}, matches)
+            logger.log_event("INPUT_BLOCKED", "PII_DETECTED", query, verdict.details)
+        elif injection:
+            verdict = InputVerdict(False, INJECTION_BLOCKED_MESSAGE,
+                                   {"matched_pattern": injection.text, "rule": injection.rule}, matches)
+            logger.log_event("INPUT_BLOCKED", "PROMPT_INJECTION", query, verdict.details)
+        else:
+            verdict = InputVerdict(True, PASSED_MESSAGE, {}, matches)
+            logger.log_event("INPUT_PASSED", "ALL_CHECKS", query, {})
+        return verdict
+
+    def check_many(self, queries: List[str]) -> List[InputVerdict]:
+        """Verdicts for a batch of queries (e.g. /chat/batch), in input order."""
+        return [self.check(query) for query in queries]
+
     def validate(self, query: str) -> Tuple[bool, str, dict]:
         """
         Validate input query against all guardrails.
-        
+
         Returns:
             Tuple of (is_valid, message, details)
         """
-        # Check PII
-        pii_result = self._check_pii(query)
-        if not pii_result[0]:
-            logger.log_event("INPUT_BLOCKED", "PII_DETECTED", query, pii_result[2])
-            return pii_result
-        
-        # Check Prompt Injection
-        injection_result = self._check_prompt_injection(query)
-        if not injection_result[0]:
-            logger.log_event("INPUT_BLOCKED", "PROMPT_INJECTION", query, injection_result[2])
-            return injection_result
-        
-        logger.log_event("INPUT_PASSED", "ALL_CHECKS", query, {})
-        return (True, "Query passed all input validations", {})
-    
-    def _check_pii(self, query: str) -> Tuple[bool, str, dict]:
-        """Check for PII in the query."""
-        detected = {}
-        
-        if self.EMAIL_PATTERN.search(query):
-            detected["email"] = True
-        if self.PHONE_PATTERN.search(query):
-            detected["phone"] = True
-        if self.SSN_PATTERN.search(query):
-            detected["ssn"] = True
-        if self.CREDIT_CARD_PATTERN.search(query):
-            detected["credit_card"] = True
-        
-        if detected:
-            return (
-                False,
-                "Query blocked: Personal information detected. Please remove sensitive data.",
-                {"pii_types": list(detected.keys())}
-            )
-        
-        return (True, "No PII detected", {})
-    
-    def _check_prompt_injection(self, query: str) -> Tuple[bool, str, dict]:
-        """Check for prompt injection attempts."""
-        for pattern in self.INJECTION_PATTERNS:
-            match = pattern.search(query)
-            if match:
-                return (
-                    False,
-                    "Query blocked: Potentially harmful prompt pattern detected.",
-                    {"matched_pattern": match.group()}
-                )
-        
-        return (True, "No injection detected", {})
+        return self.check(query).as_tuple()
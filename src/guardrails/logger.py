@@ -5,30 +5,64 @@ Logs all guardrail events for monitoring and auditing.
 
 import logging
 import json
+import os
+import random
 from datetime import datetime
 from pathlib import Path
 
+from ..log_pipeline import AsyncHandler, file_handler, console_handler
+from .stats import GuardrailStats, StatsHandler, WorkerGuardrailStats, scan_log_file
+
+# Fraction of *_PASSED events that are logged (blocked events and warnings are always logged)
+GUARDRAIL_PASS_SAMPLE_RATE = float(os.environ.get("GUARDRAIL_PASS_SAMPLE_RATE", "0.01"))
+# Set for multi-worker servers (gunicorn.conf.py does): one log + checkpoint per worker, stats summed on read
+GUARDRAIL_LOG_PER_WORKER = os.environ.get("GUARDRAIL_LOG_PER_WORKER", "").lower() in ("1", "true", "yes")
+
 # Setup guardrail-specific logger
 guardrail_logger = logging.getLogger("guardrails")
 guardrail_logger.setLevel(logging.INFO)
+guardrail_logger.propagate = False
 
-# File handler for guardrail events
 log_dir = Path(__file__).parent.parent.parent / "logs"
 log_dir.mkdir(exist_ok=True)
 
-file_handler = logging.FileHandler(log_dir / "guardrails.log")
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-guardrail_logger.addHandler(file_handler)
+# Running counters, checkpointed with the log position so they survive restarts.
+# A log file and its checkpoint must have a single writer, so each worker gets its own.
+if GUARDRAIL_LOG_PER_WORKER:
+    guardrail_stats = WorkerGuardrailStats(log_dir)
+else:
+    guardrail_stats = GuardrailStats(log_dir / "guardrails.log", log_dir / "guardrails_stats.json")
+
+# File (size-rotated), counters and console output, all handled off the request thread
+_file_handler = file_handler(guardrail_stats.log_file)
+guardrail_logger.addHandler(AsyncHandler(
+    _file_handler,
+    StatsHandler(guardrail_stats, _file_handler),
+    console_handler('%(asctime)s - GUARDRAIL - %(message)s'),
+))
+
+
+class _JsonEvent:
+    """Serialized with json.dumps only when the writer thread formats the record."""
+    __slots__ = ("event",)
+
+    def __init__(self, event: dict):
+        self.event = event
 
-# Also log to console
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('%(asctime)s - GUARDRAIL - %(message)s'))
-guardrail_logger.addHandler(console_handler)
+    def __str__(self):
+        return json.dumps(self.event)
 
 
 class GuardrailLogger:
     """Logger for guardrail events."""
     
+    def __init__(self, pass_sample_rate: float = GUARDRAIL_PASS_SAMPLE_RATE):
+        """
+        Args:
+            pass_sample_rate: Fraction of *_PASSED events to log (0 disables them)
+        """
+        self.pass_sample_rate = pass_sample_rate
+    
     def log_event(self, event_type: str, rule: str, content: str, details: dict):
         """
         Log a guardrail event.
@@ -39,6 +73,21 @@ class GuardrailLogger:
             content: The content that triggered (truncated)
             details: Additional details about the event
         """
+        if "BLOCKED" in event_type:
+            level = logging.WARNING
+        elif "WARNING" in event_type:
+            level = logging.INFO
+        elif "PASSED" in event_type:
+            # Pass events are the bulk of traffic; keep a sample of them (but count them all)
+            if self.pass_sample_rate <= 0 or random.random() >= self.pass_sample_rate:
+                guardrail_stats.record(event_type, rule)
+                return
+            level = logging.INFO
+        else:
+            level = logging.DEBUG
+        if not guardrail_logger.isEnabledFor(level):
+            return
+
         event = {
             "timestamp": datetime.utcnow().isoformat(),
             "event_type": event_type,
@@ -46,39 +95,15 @@ class GuardrailLogger:
             "content_preview": content[:100] if content else "",
             "details": details
         }
-        
-        # Log based on severity
-        if "BLOCKED" in event_type:
-            guardrail_logger.warning(json.dumps(event))
-        elif "WARNING" in event_type:
-            guardrail_logger.info(json.dumps(event))
-        else:
-            guardrail_logger.debug(json.dumps(event))
+        if "PASSED" in event_type:
+            event["sample_rate"] = self.pass_sample_rate
+        guardrail_logger.log(level, "%s", _JsonEvent(event))
     
     def get_stats(self, log_file: Path = None) -> dict:
-        """Get statistics from guardrail logs."""
+        """
+        Get statistics of guardrail events.
+        Served from the in-memory counters; pass log_file to scan a specific log instead.
+        """
         if log_file is None:
-            log_file = log_dir / "guardrails.log"
-        
-        stats = {
-            "total_events": 0,
-            "blocked_inputs": 0,
-            "blocked_outputs": 0,
-            "warnings": 0,
-            "by_rule": {}
-        }
-        
-        try:
-            with open(log_file, 'r') as f:
-                for line in f:
-                    if "INPUT_BLOCKED" in line:
-                        stats["blocked_inputs"] += 1
-                    elif "OUTPUT_BLOCKED" in line:
-                        stats["blocked_outputs"] += 1
-                    elif "WARNING" in line:
-                        stats["warnings"] += 1
-                    stats["total_events"] += 1
-        except FileNotFoundError:
-            pass
-        
-        return stats
+            return guardrail_stats.snapshot()
+        return scan_log_file(log_file)
@@ -5,11 +5,38 @@ Output Moderation Guardrails
 """
 
 import re
-from typing import Tuple, List
+from typing import FrozenSet, Tuple, List
+from src.cache.lru import LRUCache
 from .logger import GuardrailLogger
 
 logger = GuardrailLogger()
 
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# Name words too generic to show that a specific product was referenced
+NAME_STOPWORDS = frozenset({
+    "with", "from", "pack", "mens", "women", "womens", "girls", "boys", "unisex", "kids", "pair", "pairs",
+})
+FASHION_TERMS = frozenset({
+    "item", "product", "recommend", "recommended", "recommendation", "suggest", "suggested", "suggestion",
+    "style", "styled", "styling", "outfit", "wear", "wearing", "fashion", "fashionable",
+})
+
+
+def _normalize(token: str) -> str:
+    # Light plural folding so "shirts" in the answer matches "Shirt" in the name
+    return token[:-1] if len(token) > 4 and token.endswith("s") else token
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Lowercase alphanumeric tokens of text, plural-folded."""
+    return frozenset(_normalize(token) for token in _TOKEN.findall(text.lower()))
+
+
+def product_name_tokens(name: str) -> FrozenSet[str]:
+    """Distinctive tokens of a product name (longer than 3 characters, not generic)."""
+    return frozenset(token for token in tokenize(name) if len(token) > 3 and token not in NAME_STOPWORDS)
+
 
 class OutputGuardrails:
     """Output moderation guardrails for the RAG pipeline."""
@@ -28,6 +55,13 @@ class OutputGuardrails:
         re.compile(r'\b(invest|stock|crypto|bitcoin)\b', re.IGNORECASE),
     ]
     
+    def __init__(self, product_cache_size: int = 10000):
+        """
+        Args:
+            product_cache_size: Number of per-product name token sets kept (keyed by product id)
+        """
+        self._product_tokens = LRUCache(max_entries=product_cache_size)
+
     def moderate(self, response: str, retrieved_products: List[dict]) -> Tuple[bool, str, dict]:
         """
         Moderate output response.
@@ -58,7 +92,11 @@ class OutputGuardrails:
             # Don't block, just log warning
         
         logger.log_event("OUTPUT_PASSED", "ALL_CHECKS", response[:100], {})
-        return (True, response, {"toxicity": "passed", "hallucination": hallucination_result[1]})
+        return (True, response, {
+            "toxicity": "passed",
+            "hallucination": hallucination_result[1],
+            "referenced_products": hallucination_result[2].get("referenced_products", []),
+        })
     
     def _check_toxicity(self, response: str) -> Tuple[bool, str, dict]:
         """Check for toxic content in response."""
@@ -73,41 +111,44 @@ class OutputGuardrails:
         
         return (True, "No toxicity detected", {})
     
+    def _tokens_for(self, product: dict) -> FrozenSet[str]:
+        """Name token set of a product, cached per product id."""
+        name = product.get("productDisplayName") or ""
+        product_id = product.get("id")
+        if product_id is None:
+            return product_name_tokens(name)
+        cached = self._product_tokens.get(product_id)
+        # Keep the name alongside so a renamed product is re-tokenized
+        if cached is None or cached[0] != name:
+            cached = (name, product_name_tokens(name))
+            self._product_tokens.put(product_id, cached)
+        return cached[1]
+
     def _check_hallucination(self, response: str, retrieved_products: List[dict]) -> Tuple[bool, str, dict]:
         """
-        Check if response references products that weren't retrieved.
-        Simple heuristic: Check if any product names are mentioned.
+        Check if response references the retrieved products.
+        The response is tokenized once and matched against each product's
+        cached name token set, so cost does not grow with name length.
         """
         if not retrieved_products:
             return (True, "No products to verify", {})
         
-        # Get product names
-        product_names = [p.get("productDisplayName", "") for p in retrieved_products if p.get("productDisplayName")]
-        
-        # Check if at least one product is mentioned (or generic terms used)
-        response_lower = response.lower()
-        
-        mentioned = False
-        for name in product_names:
-            # Check for partial matches (product names can be long)
-            name_words = name.lower().split()[:3]  # First 3 words
-            if any(word in response_lower for word in name_words if len(word) > 3):
-                mentioned = True
-                break
-        
-        # Also accept generic fashion terms
-        fashion_terms = ["item", "product", "recommend", "suggest", "style", "outfit", "wear", "fashion"]
-        if any(term in response_lower for term in fashion_terms):
-            mentioned = True
+        response_tokens = tokenize(response)
+        referenced = [
+            p.get("productDisplayName") for p in retrieved_products
+            if p.get("productDisplayName") and not response_tokens.isdisjoint(self._tokens_for(p))
+        ]
         
-        if not mentioned:
+        # Generic fashion terms still count as staying on the retrieved items
+        if not referenced and response_tokens.isdisjoint(FASHION_TERMS):
             return (
                 False,
                 "Response may contain hallucinated products",
-                {"retrieved_products": [p.get("productDisplayName") for p in retrieved_products[:3]]}
+                {"retrieved_products": [p.get("productDisplayName") for p in retrieved_products[:3]],
+                 "referenced_products": []}
             )
         
-        return (True, "Response references retrieved products", {})
+        return (True, "Response references retrieved products", {"referenced_products": referenced})
     
     def _check_off_topic(self, response: str) -> Tuple[bool, str, dict]:
         """Check if response goes off-topic from fashion."""
@@ -0,0 +1,314 @@
+"""
+Incremental Guardrail Statistics
+Counters by event type and rule are updated as events are written, so
+stats are returned from memory instead of rescanning guardrails.log.
+They are checkpointed periodically together with the log file position
+(inode + byte offset); on restart the checkpoint is loaded and only the
+lines written after it are replayed, following size-based rotation.
+
+Byte offsets and rotation are only meaningful for a log with one writer.
+With several worker processes (gunicorn -w N), each worker therefore writes
+its own <name>.<pid>.log and <name>_stats.<pid>.json (WorkerGuardrailStats),
+and a stats read sums every worker's counters: its own from memory, the
+others from their checkpoint plus their log lines written after it, re-read
+at most once per checkpoint interval. compact_worker_stats() folds a
+previous run's per-worker files into <name>_stats.compacted.json at server
+start, so totals survive restarts, and keeps the logs of the last few runs.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Configuration
+GUARDRAIL_STATS_CHECKPOINT_INTERVAL = float(os.environ.get("GUARDRAIL_STATS_CHECKPOINT_INTERVAL", "30"))
+GUARDRAIL_LOG_KEEP_RUNS = int(os.environ.get("GUARDRAIL_LOG_KEEP_RUNS", "3"))
+
+logger = logging.getLogger(__name__)
+
+
+def parse_event(line: str) -> Optional[dict]:
+    """The JSON event of a guardrails.log line ('<time> - <LEVEL> - {...}'), or None."""
+    start = line.find("{")
+    if start < 0:
+        return None
+    try:
+        return json.loads(line[start:])
+    except ValueError:
+        return None
+
+
+def event_weight(event: dict) -> float:
+    """Number of events a logged line stands for (sampled pass events stand for 1/rate)."""
+    rate = event.get("sample_rate")
+    return 1.0 / rate if rate else 1.0
+
+
+def _snapshot(by_event_type: Dict[str, float], by_rule: Dict[str, float]) -> dict:
+    by_event_type = {k: round(v) for k, v in by_event_type.items()}
+    by_rule = {k: round(v) for k, v in by_rule.items()}
+    return {
+        "total_events": sum(by_event_type.values()),
+        "blocked_inputs": by_event_type.get("INPUT_BLOCKED", 0),
+        "blocked_outputs": by_event_type.get("OUTPUT_BLOCKED", 0),
+        "warnings": sum(v for k, v in by_event_type.items() if "WARNING" in k),
+        "by_event_type": by_event_type,
+        "by_rule": by_rule,
+    }
+
+
+def _add(totals: Tuple[Dict[str, float], Dict[str, float]], counts: Tuple[Dict[str, float], Dict[str, float]]):
+    for total, part in zip(totals, counts):
+        for key, value in part.items():
+            total[key] = total.get(key, 0) + value
+
+
+class GuardrailStats:
+    """Thread-safe guardrail event counters with file-offset checkpoints."""
+
+    def __init__(self, log_file, checkpoint_file=None,
+                 checkpoint_interval: float = GUARDRAIL_STATS_CHECKPOINT_INTERVAL):
+        """
+        Args:
+            log_file: Guardrail log (rotated copies are <log_file>.1, .2, ...)
+            checkpoint_file: JSON file the counters and log position are saved to and
+                restored from at construction (None: start empty, no checkpoints)
+            checkpoint_interval: Minimum seconds between checkpoints
+        """
+        self.log_file = Path(log_file)
+        self.checkpoint_file = Path(checkpoint_file) if checkpoint_file else None
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self._reset()
+        if self.checkpoint_file:
+            self._load()
+
+    def _reset(self):
+        self.by_event_type = {}
+        self.by_rule = {}
+
+    # Counting
+
+    def record(self, event_type: str, rule: str, weight: float = 1.0):
+        with self._lock:
+            self._count(event_type, rule, weight)
+
+    def _count(self, event_type: str, rule: str, weight: float):
+        self.by_event_type[event_type] = self.by_event_type.get(event_type, 0) + weight
+        self.by_rule[rule] = self.by_rule.get(rule, 0) + weight
+
+    def counts(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Unrounded (by_event_type, by_rule) counters."""
+        with self._lock:
+            return dict(self.by_event_type), dict(self.by_rule)
+
+    def snapshot(self) -> dict:
+        """Current stats (same shape as the old log scan, plus per-event-type counts)."""
+        return _snapshot(*self.counts())
+
+    # Checkpoints
+
+    def maybe_checkpoint(self, stream, force: bool = False):
+        """Save counters with the position of the (just flushed) log stream."""
+        if not force and time.monotonic() - self._last_checkpoint < self.checkpoint_interval:
+            return
+        if stream is None or self.checkpoint_file is None:
+            return
+        self._last_checkpoint = time.monotonic()
+        position = {"inode": os.fstat(stream.fileno()).st_ino, "offset": stream.tell()}
+        with self._lock:
+            state = {"by_event_type": dict(self.by_event_type), "by_rule": dict(self.by_rule), "log": position}
+        tmp = self.checkpoint_file.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(state))
+            os.replace(tmp, self.checkpoint_file)
+        except OSError as e:
+            logger.warning(f"Could not write guardrail stats checkpoint: {e}")
+
+    def _load(self):
+        """Restore the last checkpoint and replay log lines written after it."""
+        position = None
+        try:
+            state = json.loads(self.checkpoint_file.read_text())
+            self.by_event_type = state["by_event_type"]
+            self.by_rule = state["by_rule"]
+            position = state["log"]
+        except (OSError, ValueError, KeyError):
+            self._reset()
+        for event in self._events_after(position):
+            self._count(event.get("event_type", "UNKNOWN"), event.get("rule", "UNKNOWN"), event_weight(event))
+
+    def _log_files(self) -> List[Path]:
+        """Existing log files, oldest first."""
+        rotated = []
+        index = 1
+        while (candidate := Path(f"{self.log_file}.{index}")).exists():
+            rotated.append(candidate)
+            index += 1
+        files = list(reversed(rotated))
+        if self.log_file.exists():
+            files.append(self.log_file)
+        return files
+
+    def _events_after(self, position: Optional[dict]) -> Iterator[dict]:
+        """Events in the log files after a checkpointed position (everything if None)."""
+        files = [(path, 0) for path in self._log_files()]
+        if position:
+            for i, (path, _) in enumerate(files):
+                if os.stat(path).st_ino == position["inode"]:
+                    # The checkpointed file may since have been rotated to <log>.N
+                    files = [(path, position["offset"])] + files[i + 1:]
+                    break
+            # Otherwise the checkpointed file was rotated away: everything left is newer
+        for path, offset in files:
+            yield from self._read_events(path, offset)
+
+    @staticmethod
+    def _read_events(path: Path, offset: int) -> Iterator[dict]:
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for raw in f:
+                    event = parse_event(raw.decode("utf-8", errors="replace"))
+                    if event:
+                        yield event
+        except OSError:
+            return
+
+
+def _worker_files(log_dir: Path, name: str) -> Dict[int, Tuple[Path, Path]]:
+    """pid -> (log file, checkpoint file) of every worker that left either behind."""
+    pattern = re.compile(rf"^{re.escape(name)}(?:_stats)?\.(\d+)\.(?:log|json)$")
+    pids = {int(m.group(1)) for path in log_dir.iterdir() if (m := pattern.match(path.name))}
+    return {pid: (log_dir / f"{name}.{pid}.log", log_dir / f"{name}_stats.{pid}.json") for pid in pids}
+
+
+def _load_counts(checkpoint_file: Path) -> Tuple[Dict[str, float], Dict[str, float]]:
+    try:
+        state = json.loads(checkpoint_file.read_text())
+        return state["by_event_type"], state["by_rule"]
+    except (OSError, ValueError, KeyError):
+        return {}, {}
+
+
+class WorkerGuardrailStats(GuardrailStats):
+    """
+    Counters of one worker process, checkpointed to its own per-PID files;
+    snapshot() sums the counters of every worker sharing the log directory.
+    """
+
+    def __init__(self, log_dir, name: str = "guardrails", pid: Optional[int] = None,
+                 checkpoint_interval: float = GUARDRAIL_STATS_CHECKPOINT_INTERVAL):
+        """
+        Args:
+            log_dir: Directory shared by all workers
+            name: Log name; this worker writes <name>.<pid>.log
+            pid: Worker id (defaults to os.getpid())
+        """
+        self.log_dir = Path(log_dir)
+        self.name = name
+        self.pid = pid or os.getpid()
+        self._others = None  # Counts of the compacted runs and the other workers
+        self._others_read_at = 0.0
+        super().__init__(self.log_dir / f"{name}.{self.pid}.log", self.log_dir / f"{name}_stats.{self.pid}.json",
+                         checkpoint_interval)
+
+    def snapshot(self) -> dict:
+        """
+        Stats of all workers: this one from memory, the others (and compacted runs)
+        from their files, re-read at most once per checkpoint interval.
+        """
+        now = time.monotonic()
+        if self._others is None or now - self._others_read_at >= self.checkpoint_interval:
+            self._others = self._read_others()
+            self._others_read_at = now
+        totals = ({}, {})
+        _add(totals, self._others)
+        _add(totals, self.counts())
+        return _snapshot(*totals)
+
+    def _read_others(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        totals = _load_counts(self.log_dir / f"{self.name}_stats.compacted.json")
+        for pid, (log_file, checkpoint_file) in _worker_files(self.log_dir, self.name).items():
+            if pid != self.pid:
+                _add(totals, GuardrailStats(log_file, checkpoint_file).counts())
+        return totals
+
+
+def compact_worker_stats(log_dir, name: str = "guardrails", keep_runs: int = GUARDRAIL_LOG_KEEP_RUNS) -> int:
+    """
+    Fold the per-worker counters of a previous run into <name>_stats.compacted.json and
+    retire their files: checkpoints are removed and logs renamed to
+    <name>.<pid>-<time>.log*, so a reused pid starts clean. Retired logs of all but
+    the last keep_runs runs are deleted. Call once at server start, before the
+    workers fork. Returns the number of workers folded in.
+    """
+    log_dir = Path(log_dir)
+    workers = _worker_files(log_dir, name)
+    if not workers:
+        return 0
+    total_file = log_dir / f"{name}_stats.compacted.json"
+    totals = _load_counts(total_file)
+    for log_file, checkpoint_file in workers.values():
+        _add(totals, GuardrailStats(log_file, checkpoint_file).counts())
+
+    tmp = total_file.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"by_event_type": totals[0], "by_rule": totals[1]}))
+    os.replace(tmp, total_file)
+    stamp = time.strftime("%Y%m%d%H%M%S")
+    for pid, (log_file, checkpoint_file) in workers.items():
+        checkpoint_file.unlink(missing_ok=True)
+        for path in log_dir.glob(f"{log_file.name}*"):
+            path.rename(log_dir / path.name.replace(f".{pid}.log", f".{pid}-{stamp}.log", 1))
+    _prune_retired_logs(log_dir, name, keep_runs)
+    return len(workers)
+
+
+def _prune_retired_logs(log_dir: Path, name: str, keep_runs: int):
+    """Delete retired worker logs (<name>.<pid>-<time>.log*) of all but the newest keep_runs runs."""
+    pattern = re.compile(rf"^{re.escape(name)}\.\d+-(\d{{14}})\.log(?:\.\d+)?$")
+    runs = {}
+    for path in log_dir.iterdir():
+        if m := pattern.match(path.name):
+            runs.setdefault(m.group(1), []).append(path)
+    for stamp in sorted(runs)[:max(0, len(runs) - keep_runs)]:
+        for path in runs[stamp]:
+            path.unlink(missing_ok=True)
+
+
+def scan_log_file(log_file) -> dict:
+    """Full scan of one guardrail log into a stats dict (no checkpoint)."""
+    stats = GuardrailStats(log_file)
+    for event in GuardrailStats._read_events(Path(log_file), 0):
+        stats._count(event.get("event_type", "UNKNOWN"), event.get("rule", "UNKNOWN"), event_weight(event))
+    return stats.snapshot()
+
+
+class StatsHandler(logging.Handler):
+    """
+    Counts guardrail events on the log writer thread as they are written,
+    and checkpoints after flushes so counters always match the file offset.
+    """
+
+    def __init__(self, stats: GuardrailStats, file_handler: logging.StreamHandler):
+        super().__init__()
+        self.stats = stats
+        self.file_handler = file_handler
+
+    def emit(self, record):
+        event = getattr(record.args[0], "event", None) if isinstance(record.args, tuple) and record.args else None
+        if event:
+            self.stats.record(event["event_type"], event["rule"])
+
+    def flush(self):
+        self.stats.maybe_checkpoint(self.file_handler.stream)
+
+    def close(self):
+        self.stats.maybe_checkpoint(self.file_handler.stream, force=True)
+        super().close()
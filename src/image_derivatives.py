@@ -0,0 +1,85 @@
+"""
+Gemini-Sized Image Derivatives
+Ingest writes a downsized, recompressed JPEG of every catalog image next to
+the original (under DERIVATIVE_PREFIX) and records it in the Chroma metadata;
+the serving path inlines that derivative into the Gemini prompt instead of
+the full-resolution original, shrinking request payloads and input tokens.
+"""
+
+import csv
+import io
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Configuration
+DERIVATIVE_PREFIX = os.environ.get("DERIVATIVE_PREFIX", "style-sync/derived/fashion/images-gemini")
+DERIVATIVE_MAX_SIDE = int(os.environ.get("DERIVATIVE_MAX_SIDE", "512"))
+DERIVATIVE_QUALITY = int(os.environ.get("DERIVATIVE_QUALITY", "80"))
+DERIVATIVE_REPORT_PATH = os.environ.get("DERIVATIVE_REPORT_PATH", "derivatives_report.csv")
+
+
+def derivative_key(image_id, prefix: str = DERIVATIVE_PREFIX) -> str:
+    return f"{prefix.rstrip('/')}/{image_id}.jpg"
+
+
+def make_derivative(image, max_side: int = DERIVATIVE_MAX_SIDE, quality: int = DERIVATIVE_QUALITY) -> bytes:
+    """
+    Downsize a decoded PIL image so its longest side is at most max_side
+    (never upscaling) and re-encode it as a progressive JPEG.
+    """
+    derivative = image.convert("RGB")
+    derivative.thumbnail((max_side, max_side))
+    buffer = io.BytesIO()
+    derivative.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+@dataclass
+class DerivativeRecord:
+    image_id: str
+    original_bytes: int
+    derivative_bytes: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.derivative_bytes
+
+
+class DerivativeReport:
+    """Bytes saved per image by serving the derivative instead of the original."""
+
+    def __init__(self):
+        self.records: List[DerivativeRecord] = []
+
+    def add(self, image_id, original_bytes: int, derivative_bytes: int):
+        self.records.append(DerivativeRecord(str(image_id), original_bytes, derivative_bytes))
+
+    def summary(self) -> dict:
+        original = sum(r.original_bytes for r in self.records)
+        derivative = sum(r.derivative_bytes for r in self.records)
+        return {
+            "images": len(self.records),
+            "original_bytes": original,
+            "derivative_bytes": derivative,
+            "saved_bytes": original - derivative,
+            "saved_ratio": (original - derivative) / original if original else 0.0,
+        }
+
+    def write_csv(self, path: str = DERIVATIVE_REPORT_PATH, append: bool = True):
+        """Write one row per image; appends so incremental ingest runs accumulate."""
+        new_file = not (append and os.path.exists(path))
+        with open(path, "w" if new_file else "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["id", "original_bytes", "derivative_bytes", "saved_bytes", "saved_ratio"])
+            for r in self.records:
+                ratio = r.saved_bytes / r.original_bytes if r.original_bytes else 0.0
+                writer.writerow([r.image_id, r.original_bytes, r.derivative_bytes, r.saved_bytes, f"{ratio:.4f}"])
+
+
+def build_derivative(image, image_bytes: bytes, max_side: int = DERIVATIVE_MAX_SIDE,
+                     quality: int = DERIVATIVE_QUALITY) -> Optional[bytes]:
+    """Derivative bytes, or None if it would not be smaller than the original."""
+    derivative = make_derivative(image, max_side, quality)
+    return derivative if len(derivative) < len(image_bytes) else None
@@ -1,4 +1,7 @@
 import os
+import sys
+import argparse
+from pathlib import Path
 import boto3
 import pandas as pd
 import io
@@ -11,6 +14,14 @@ from dotenv import load_dotenv
 import logging
 import concurrent.futures
 
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.image_derivatives import (
+    DERIVATIVE_PREFIX, DERIVATIVE_MAX_SIDE, DERIVATIVE_QUALITY, DERIVATIVE_REPORT_PATH,
+    DerivativeReport, build_derivative, derivative_key
+)
+
 load_dotenv()
 
 # Configuration
@@ -37,6 +48,23 @@ missing_handler = logging.FileHandler('missing_images.log')
 missing_logger.addHandler(missing_handler)
 missing_logger.setLevel(logging.WARNING)
 
+def store_derivative(s3_client, image_id, image, image_bytes, max_side=DERIVATIVE_MAX_SIDE,
+                     quality=DERIVATIVE_QUALITY, prefix=DERIVATIVE_PREFIX):
+    """
+    Write the Gemini-sized derivative of an already decoded image to S3.
+    Returns the metadata fields to record, or {} if no derivative was stored.
+    """
+    derivative = build_derivative(image, image_bytes, max_side, quality)
+    if derivative is None:
+        return {}
+    key = derivative_key(image_id, prefix)
+    s3_client.put_object(Bucket=S3_BUCKET, Key=key, Body=derivative, ContentType="image/jpeg")
+    return {
+        "derivative_s3_uri": f"s3://{S3_BUCKET}/{key}",
+        "original_bytes": len(image_bytes),
+        "derivative_bytes": len(derivative),
+    }
+
 def get_s3_client():
     return boto3.client('s3')
 
@@ -83,8 +111,9 @@ class OpenCLIPEmbedder:
     def embed_query(self, text):
         return self.embed_documents([text])[0]
 
-def ingest():
+def ingest(max_side=DERIVATIVE_MAX_SIDE, quality=DERIVATIVE_QUALITY, report_path=DERIVATIVE_REPORT_PATH):
     s3 = get_s3_client()
+    report = DerivativeReport()
     
     try:
         df = load_styles_csv(s3, S3_BUCKET)
@@ -124,7 +153,12 @@ def ingest():
             response = s3.get_object(Bucket=S3_BUCKET, Key=s3_key)
             image_bytes = response['Body'].read()
             image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-            return {"id": image_id, "image": image, "row": row, "status": "success"}
+            try:
+                derivative = store_derivative(s3, image_id, image, image_bytes, max_side, quality)
+            except Exception as e:
+                logger.warning(f"Failed to store derivative for {image_id}: {e}")
+                derivative = {}
+            return {"id": image_id, "image": image, "row": row, "derivative": derivative, "status": "success"}
         except s3.exceptions.NoSuchKey:
             return {"id": image_id, "status": "missing", "error": "NoSuchKey"}
         except Exception as e:
@@ -155,7 +189,11 @@ def ingest():
                         image_features /= image_features.norm(dim=-1, keepdim=True)
                     
                     ids.append(str(res['id']))
-                    metadatas.append(res['row'].to_dict())
+                    metadata = res['row'].to_dict()
+                    metadata.update(res['derivative'])
+                    metadatas.append(metadata)
+                    if res['derivative']:
+                        report.add(res['id'], res['derivative']['original_bytes'], res['derivative']['derivative_bytes'])
                     texts.append(res['row']['rich_caption'])
                     embeddings.append(image_features.squeeze().tolist())
                     
@@ -174,7 +212,66 @@ def ingest():
                 ids=ids
             )
             
+    log_derivative_report(report, report_path)
     logger.info("Ingestion complete.")
 
+def backfill_derivatives(max_side=DERIVATIVE_MAX_SIDE, quality=DERIVATIVE_QUALITY, report_path=DERIVATIVE_REPORT_PATH):
+    """Create derivatives for already ingested items that do not have one yet."""
+    import chromadb
+
+    s3 = get_s3_client()
+    report = DerivativeReport()
+    collection = chromadb.PersistentClient(path=CHROMA_DB_DIR).get_collection("style_sync")
+    data = collection.get(include=["metadatas"])
+    pending = [(item_id, metadata) for item_id, metadata in zip(data['ids'], data['metadatas'])
+               if not metadata.get('derivative_s3_uri')]
+    logger.info(f"Items without a derivative: {len(pending)}")
+
+    def process(item):
+        item_id, metadata = item
+        s3_key = f"style-sync/raw/fashion/images/{item_id}.jpg"
+        try:
+            image_bytes = s3.get_object(Bucket=S3_BUCKET, Key=s3_key)['Body'].read()
+            image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+            return item_id, metadata, store_derivative(s3, item_id, image, image_bytes, max_side, quality)
+        except Exception as e:
+            logger.error(f"Failed to backfill derivative for {item_id}: {e}")
+            return item_id, metadata, {}
+
+    for i in tqdm(range(0, len(pending), BATCH_SIZE), desc="Backfilling Derivatives"):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            done = [res for res in executor.map(process, pending[i:i+BATCH_SIZE]) if res[2]]
+        if done:
+            collection.update(
+                ids=[item_id for item_id, _, _ in done],
+                metadatas=[{**metadata, **derivative} for _, metadata, derivative in done]
+            )
+            for item_id, _, derivative in done:
+                report.add(item_id, derivative['original_bytes'], derivative['derivative_bytes'])
+
+    log_derivative_report(report, report_path)
+
+def log_derivative_report(report, report_path):
+    if not report.records:
+        return
+    report.write_csv(report_path)
+    summary = report.summary()
+    logger.info(
+        f"Derivatives: {summary['images']} images, {summary['original_bytes'] / 1e6:.1f} MB -> "
+        f"{summary['derivative_bytes'] / 1e6:.1f} MB ({summary['saved_ratio']:.0%} saved); "
+        f"per-image report in {report_path}"
+    )
+
 if __name__ == "__main__":
-    ingest()
+    parser = argparse.ArgumentParser(description="Ingest the fashion catalog into ChromaDB.")
+    parser.add_argument("--backfill-derivatives", action="store_true",
+                        help="Only create derivatives for already ingested items")
+    parser.add_argument("--derivative-max-side", type=int, default=DERIVATIVE_MAX_SIDE)
+    parser.add_argument("--derivative-quality", type=int, default=DERIVATIVE_QUALITY)
+    parser.add_argument("--report", default=DERIVATIVE_REPORT_PATH)
+    args = parser.parse_args()
+
+    if args.backfill_derivatives:
+        backfill_derivatives(args.derivative_max_side, args.derivative_quality, args.report)
+    else:
+        ingest(args.derivative_max_side, args.derivative_quality, args.report)
@@ -0,0 +1,162 @@
+"""
+Non-Blocking Log Pipeline
+Request threads only enqueue LogRecords; a background writer thread
+formats them (so json.dumps / %-formatting happens off the request path),
+writes them in batches with one flush per batch, and rotates files by size.
+When the queue is full, records are dropped and counted instead of
+blocking the request.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List
+
+# Configuration
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", "256"))
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_STOP = object()
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that leaves flushing to the end of each batch."""
+
+    def __init__(self, filename, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class AsyncLogWriter:
+    """Background thread draining a bounded queue of records into handlers in batches."""
+
+    def __init__(self, max_queue: int = LOG_QUEUE_SIZE, batch_size: int = LOG_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._worker.start()
+
+    def submit(self, record: logging.LogRecord, handlers: List[logging.Handler]):
+        try:
+            self._queue.put_nowait((record, handlers))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def close(self):
+        """Write everything queued so far and stop the writer."""
+        if self._worker.is_alive():
+            self._queue.put(_STOP)
+            self._worker.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch) -> bool:
+        touched = {}
+        stop = False
+        for item in batch:
+            if item is _STOP:
+                stop = True
+                continue
+            record, handlers = item
+            for handler in handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    touched[id(handler)] = handler
+        for handler in touched.values():
+            handler.flush()
+        return stop
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> AsyncLogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AsyncLogWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+class AsyncHandler(logging.Handler):
+    """
+    Logging handler that hands records to the shared writer thread.
+    The wrapped handlers do the formatting and I/O on that thread.
+    """
+
+    def __init__(self, *handlers: logging.Handler, level=logging.NOTSET, writer: AsyncLogWriter = None):
+        super().__init__(level)
+        self.handlers = list(handlers)
+        self.writer = writer or get_writer()
+
+    def emit(self, record):
+        # The record is formatted later on the writer thread, so its args must not be mutated after logging
+        self.writer.submit(record, self.handlers)
+
+
+def file_handler(path, fmt: str = LOG_FORMAT) -> logging.Handler:
+    handler = BatchedRotatingFileHandler(path)
+    handler.setFormatter(logging.Formatter(fmt))
+    return handler
+
+
+def console_handler(fmt: str = LOG_FORMAT) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(fmt))
+    return handler
+
+
+_configured: Dict[str, AsyncHandler] = {}
+
+
+def configure_logging(filename: str = "api_debug.log", level: str = LOG_LEVEL) -> AsyncHandler:
+    """
+    Route root-logger records for the API to a size-rotated file through the
+    async pipeline. Replaces any handlers set by an earlier basicConfig.
+    Idempotent per filename.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    handler = _configured.get(filename)
+    if handler is None:
+        handler = AsyncHandler(file_handler(filename))
+        _configured[filename] = handler
+    for existing in list(root.handlers):
+        if existing is not handler:
+            root.removeHandler(existing)
+    if handler not in root.handlers:
+        root.addHandler(handler)
+    return handler
@@ -1,11 +1,26 @@
 """
 LLM Metrics for Prometheus
 Tracks latency, token usage, cost, and guardrail violations.
+
+Multi-worker deployments: set PROMETHEUS_MULTIPROC_DIR (an empty directory
+shared by all workers of a node, wiped on every deploy) before starting the
+workers. Each worker then writes its samples to memory-mapped files there,
+and /metrics aggregates all of them at scrape time (see metrics_payload).
 """
 
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+import glob
+import os
+import re
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, Gauge, generate_latest, multiprocess, CONTENT_TYPE_LATEST
+)
 import time
+from contextlib import contextmanager
 from functools import wraps
+from typing import Optional
+
+# Multiprocess mode is decided by prometheus_client at import time from this variable
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
 
 # --- Latency Metrics ---
 LLM_REQUEST_LATENCY = Histogram(
@@ -27,6 +42,49 @@ GENERATION_LATENCY = Histogram(
     buckets=[0.5, 1.0, 2.0, 5.0, 10.0, 30.0]
 )
 
+# Bounded set of pipeline stage labels
+STAGES = (
+    'guardrails', 'filter_routing', 'query_embedding', 'chroma_search',
+    's3_fetch', 'presign', 'gemini', 'output_moderation',
+)
+
+STAGE_LATENCY = Histogram(
+    'request_stage_latency_seconds',
+    'Time spent in each stage of a request',
+    ['endpoint', 'stage'],  # stage is one of STAGES
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+TIME_TO_FIRST_BYTE = Histogram(
+    'stream_time_to_first_byte_seconds',
+    'Time from request start to the first streamed event',
+    ['event'],  # items, first_token
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0]
+)
+
+IMAGE_FETCH_LATENCY = Histogram(
+    'image_fetch_latency_seconds',
+    'Wall time of the concurrent catalog image fetch stage',
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0]
+)
+
+IMAGE_FETCH_FAILURES = Counter(
+    'image_fetch_failures_total',
+    'Catalog images that could not be fetched from S3',
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    'embedding_batch_size',
+    'Number of texts per batched text-encoder forward pass',
+    buckets=[1, 2, 4, 8, 16, 32, 64]
+)
+
+EMBEDDING_QUEUE_DELAY = Histogram(
+    'embedding_queue_delay_seconds',
+    'Time a text waits in the embedding batcher before its batch runs',
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1]
+)
+
 # --- Token Usage Metrics ---
 TOKEN_USAGE = Counter(
     'llm_token_usage_total',
@@ -61,27 +119,58 @@ GUARDRAIL_CHECKS = Counter(
     ['type', 'result']  # input/output, passed/blocked
 )
 
+# --- Vector Search ---
+VECTOR_SEARCHES = Counter(
+    'vector_searches_total',
+    'Vector searches by execution path',
+    ['path']  # exact (bitmap pre-filter + dot product) or ann
+)
+
+# --- Cache Metrics ---
+CACHE_EVENTS = Counter(
+    'cache_events_total',
+    'Cache hits, misses and evictions',
+    ['cache', 'tier', 'event']  # e.g. image/memory/hit
+)
+
 # --- Active Requests ---
 ACTIVE_REQUESTS = Gauge(
     'llm_active_requests',
-    'Number of currently active LLM requests'
+    'Number of currently active LLM requests',
+    multiprocess_mode='livesum'  # summed over live workers
+)
+
+# --- Admission Control ---
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'admission_queue_depth',
+    'Requests waiting for a concurrency slot',
+    multiprocess_mode='livesum'
+)
+
+ADMISSION_REJECTIONS = Counter(
+    'admission_rejections_total',
+    'Requests rejected with 503 by admission control',
+    ['reason']  # queue_full, queue_timeout
 )
 
 
 class MetricsTracker:
     """Helper class to track metrics during request processing."""
     
-    # Gemini pricing (approximate)
+    # Gemini pricing (approximate); models not listed here are not costed
     PRICING = {
         'gemini-2.5-flash': {'input': 0.00025, 'output': 0.0005}  # per 1K tokens
     }
     
-    def __init__(self):
+    def __init__(self, endpoint: str = '/chat'):
+        self.endpoint = endpoint
         self.start_time = None
         self.retrieval_time = 0
         self.generation_time = 0
+        self.image_fetch_time = 0
         self.input_tokens = 0
         self.output_tokens = 0
+        self.stage_times = {}
     
     def start_request(self):
         """Start tracking a request."""
@@ -92,32 +181,63 @@ class MetricsTracker:
         """End tracking a request."""
         if self.start_time:
             latency = time.time() - self.start_time
-            LLM_REQUEST_LATENCY.labels(endpoint='/chat', status=status).observe(latency)
-            REQUEST_COUNT.labels(endpoint='/chat', status=status).inc()
+            LLM_REQUEST_LATENCY.labels(endpoint=self.endpoint, status=status).observe(latency)
+            REQUEST_COUNT.labels(endpoint=self.endpoint, status=status).inc()
         ACTIVE_REQUESTS.dec()
     
+    def track_first_byte(self, event: str):
+        """Track time from request start to a streamed event."""
+        if self.start_time:
+            TIME_TO_FIRST_BYTE.labels(event=event).observe(time.time() - self.start_time)
+    
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as one of STAGES."""
+        _check_stage(stage)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.track_stage(stage, time.perf_counter() - start)
+    
+    def track_stage(self, stage: str, duration: float):
+        """Track time spent in a pipeline stage (accumulated per request)."""
+        _check_stage(stage)
+        self.stage_times[stage] = self.stage_times.get(stage, 0) + duration
+        STAGE_LATENCY.labels(endpoint=self.endpoint, stage=stage).observe(duration)
+    
     def track_retrieval(self, duration: float):
         """Track retrieval latency."""
         self.retrieval_time = duration
         RETRIEVAL_LATENCY.observe(duration)
+        self.track_stage('chroma_search', duration)
     
-    def track_generation(self, duration: float, input_tokens: int = 0, output_tokens: int = 0):
-        """Track generation latency and token usage."""
+    def track_generation(self, duration: float, input_tokens: int = 0, output_tokens: int = 0,
+                         model: Optional[str] = None):
+        """Track generation latency, token usage and, for a priced model, its cost."""
         self.generation_time = duration
         self.input_tokens = input_tokens
         self.output_tokens = output_tokens
         
         GENERATION_LATENCY.observe(duration)
+        self.track_stage('gemini', duration)
         TOKEN_USAGE.labels(type='input').inc(input_tokens)
         TOKEN_USAGE.labels(type='output').inc(output_tokens)
         
         # Estimate cost
-        model = 'gemini-2.5-flash'
         if model in self.PRICING:
             cost = (input_tokens / 1000 * self.PRICING[model]['input'] +
                    output_tokens / 1000 * self.PRICING[model]['output'])
             LLM_COST.labels(model=model).inc(cost)
     
+    def track_image_fetch(self, duration: float, failures: int = 0):
+        """Track the wall time of the image fetch stage."""
+        self.image_fetch_time = duration
+        IMAGE_FETCH_LATENCY.observe(duration)
+        self.track_stage('s3_fetch', duration)
+        if failures:
+            IMAGE_FETCH_FAILURES.inc(failures)
+    
     def track_guardrail(self, guard_type: str, rule: str, passed: bool):
         """Track guardrail check results."""
         result = 'passed' if passed else 'blocked'
@@ -127,6 +247,61 @@ class MetricsTracker:
             GUARDRAIL_VIOLATIONS.labels(type=guard_type, rule=rule).inc()
 
 
+def _check_stage(stage: str):
+    """Keep the stage label bounded."""
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage {stage!r}; expected one of {STAGES}")
+
+
+def record_cache_event(cache: str, tier: str, event: str, count: int = 1):
+    """Record a cache hit/miss/eviction."""
+    CACHE_EVENTS.labels(cache=cache, tier=tier, event=event).inc(count)
+
+
+_DB_FILE_PID = re.compile(r'_(\d+)\.db$')
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_dead_workers(directory: str = PROMETHEUS_MULTIPROC_DIR) -> list:
+    """
+    Drop the live-gauge files of workers that are no longer running, so
+    their in-flight gauges stop counting. Counter and histogram files are
+    kept: they hold the dead worker's share of the totals.
+
+    Returns:
+        PIDs that were cleaned up
+    """
+    if not directory:
+        return []
+    dead = set()
+    for path in glob.glob(os.path.join(directory, 'gauge_live*.db')):
+        match = _DB_FILE_PID.search(path)
+        if match and not _pid_alive(int(match.group(1))):
+            dead.add(int(match.group(1)))
+    for pid in dead:
+        multiprocess.mark_process_dead(pid, directory)
+    return sorted(dead)
+
+
+def metrics_payload() -> bytes:
+    """Prometheus exposition for /metrics, aggregated over all workers in multiprocess mode."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest()
+    cleanup_dead_workers(PROMETHEUS_MULTIPROC_DIR)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+    return generate_latest(registry)
+
+
 # Global metrics tracker factory
-def create_metrics_tracker() -> MetricsTracker:
-    return MetricsTracker()
+def create_metrics_tracker(endpoint: str = '/chat') -> MetricsTracker:
+    return MetricsTracker(endpoint)
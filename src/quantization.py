@@ -0,0 +1,96 @@
+"""
+Product Quantization
+Compresses the catalog's (normalized) image embeddings for src/vector_index.
+A vector is split into n_subspaces chunks, and each chunk is replaced by the
+index of its nearest centroid in that subspace's codebook (256 centroids,
+so one uint8 per chunk). A 512-d float32 vector (2 KB) with 64 subspaces
+becomes 64 bytes.
+
+Inner products are approximated without decoding: for a query, a
+(n_subspaces, 256) table of chunk-centroid dot products is computed once,
+and each row's score is the sum of its table entries. The approximation
+only picks a shortlist; the index re-ranks that shortlist exactly.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+N_CENTROIDS = 256
+
+
+def _kmeans(vectors: np.ndarray, n_centroids: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are re-seeded from random points."""
+    centroids = vectors[rng.choice(len(vectors), n_centroids, replace=len(vectors) < n_centroids)].copy()
+    squared_norms = (vectors ** 2).sum(axis=1)
+    for _ in range(iterations):
+        distances = squared_norms[:, None] - 2 * vectors @ centroids.T + (centroids ** 2).sum(axis=1)
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=n_centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+    return centroids
+
+
+class ProductQuantizer:
+    """Codebooks of shape (n_subspaces, 256, dim / n_subspaces)."""
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+        self.n_subspaces, self.n_centroids, self.subspace_dim = self.codebooks.shape
+        self.dim = self.n_subspaces * self.subspace_dim
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, n_subspaces: int, iterations: int = 20,
+              sample_size: Optional[int] = 50_000, seed: int = 0) -> "ProductQuantizer":
+        """
+        Fit one codebook per subspace on (a sample of) the vectors.
+
+        Raises:
+            ValueError: If dim is not divisible by n_subspaces
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        if dim % n_subspaces:
+            raise ValueError(f"Embedding dim {dim} is not divisible by {n_subspaces} subspaces")
+        rng = np.random.default_rng(seed)
+        if sample_size and len(vectors) > sample_size:
+            vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        chunks = vectors.reshape(len(vectors), n_subspaces, dim // n_subspaces)
+        return cls(np.stack([_kmeans(np.ascontiguousarray(chunks[:, j]), N_CENTROIDS, iterations, rng)
+                             for j in range(n_subspaces)]))
+
+    def encode(self, vectors: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        """(n, n_subspaces) uint8 codes."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.n_subspaces), dtype=np.uint8)
+        centroid_norms = (self.codebooks ** 2).sum(axis=2)
+        for start in range(0, len(vectors), batch_size):
+            chunks = vectors[start:start + batch_size].reshape(-1, self.n_subspaces, self.subspace_dim)
+            for j in range(self.n_subspaces):
+                # argmin |x - c|^2 == argmin |c|^2 - 2 x.c
+                distances = centroid_norms[j] - 2 * chunks[:, j] @ self.codebooks[j].T
+                codes[start:start + batch_size, j] = distances.argmin(axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        codes = np.asarray(codes)
+        return self.codebooks[np.arange(self.n_subspaces), codes].reshape(len(codes), self.dim)
+
+    def lookup_tables(self, queries: np.ndarray) -> np.ndarray:
+        """(n_queries, n_subspaces, 256) dot products of each query chunk with each centroid."""
+        chunks = np.asarray(queries, dtype=np.float32).reshape(-1, self.n_subspaces, self.subspace_dim)
+        return np.einsum("qjd,jcd->qjc", chunks, self.codebooks)
+
+    def scores(self, tables: np.ndarray, codes: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """Approximate inner products (n_queries, n_rows) from lookup tables and codes."""
+        scores = np.empty((len(tables), len(codes)), dtype=np.float32)
+        subspaces = np.arange(self.n_subspaces)
+        for start in range(0, len(codes), batch_size):
+            block = np.asarray(codes[start:start + batch_size])
+            for q, table in enumerate(tables):
+                scores[q, start:start + len(block)] = table[subspaces, block].sum(axis=1)
+        return scores
@@ -0,0 +1,143 @@
+"""
+Text-Tower Artifact
+Serving only ever calls encode_text, so the API does not need the CLIP vision
+tower or image preprocessing. The build step extracts the text transformer
+weights and tokenizer vocabulary into a standalone directory:
+
+    <dir>/config.json               model name, checkpoint and text config
+    <dir>/text_tower.safetensors    text tower weights
+    <dir>/bpe_simple_vocab.txt.gz   tokenizer vocabulary
+
+The serving loader reads the weights through a memory map (safetensors), so
+cold start skips the checkpoint download/unpickle and workers on the same
+host share the weight pages instead of each holding a private copy.
+
+Usage:
+    python -m src.text_tower --output ./models/text_tower
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TEXT_TOWER_DIR = os.environ.get("TEXT_TOWER_DIR", "./models/text_tower")
+
+CONFIG_FILE = "config.json"
+WEIGHTS_FILE = "text_tower.safetensors"
+VOCAB_FILE = "bpe_simple_vocab.txt.gz"
+
+# Full-CLIP parameters that are not part of the text tower
+_NON_TEXT_PREFIXES = ("visual.", "logit_scale", "logit_bias")
+
+
+def select_text_tower_state(state_dict: Dict) -> Dict:
+    """
+    Text-tower entries of a CLIP state dict, keyed as in a standalone text tower.
+    Handles both layouts: text modules at the top level (CLIP) or under
+    `text.` (CustomTextCLIP).
+    """
+    if any(key.startswith("text.") for key in state_dict):
+        return {key[len("text."):]: value for key, value in state_dict.items() if key.startswith("text.")}
+    return {key: value for key, value in state_dict.items() if not key.startswith(_NON_TEXT_PREFIXES)}
+
+
+def has_text_tower(directory: str = TEXT_TOWER_DIR) -> bool:
+    return all(os.path.exists(os.path.join(directory, name)) for name in (CONFIG_FILE, WEIGHTS_FILE, VOCAB_FILE))
+
+
+def read_config(directory: str = TEXT_TOWER_DIR) -> dict:
+    with open(os.path.join(directory, CONFIG_FILE)) as f:
+        return json.load(f)
+
+
+def build_text_tower(model_name: str, checkpoint: str, output_dir: str = TEXT_TOWER_DIR) -> str:
+    """Extract the text tower and tokenizer of an OpenCLIP checkpoint into output_dir."""
+    import open_clip
+    from open_clip.tokenizer import default_bpe
+    from safetensors.torch import save_file
+
+    logger.info(f"Loading OpenCLIP model: {model_name} ({checkpoint})...")
+    model, _, _ = open_clip.create_model_and_transforms(model_name, pretrained=checkpoint)
+    model_cfg = open_clip.get_model_config(model_name)
+
+    state = select_text_tower_state(model.state_dict())
+    # safetensors refuses shared or non-contiguous storage
+    state = {key: value.detach().contiguous().clone() for key, value in state.items()}
+
+    os.makedirs(output_dir, exist_ok=True)
+    save_file(state, os.path.join(output_dir, WEIGHTS_FILE))
+    shutil.copyfile(default_bpe(), os.path.join(output_dir, VOCAB_FILE))
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "checkpoint": checkpoint,
+            "embed_dim": model_cfg["embed_dim"],
+            "quick_gelu": model_cfg.get("quick_gelu", False),
+            "text_cfg": model_cfg["text_cfg"],
+        }, f, indent=2)
+
+    size_mb = os.path.getsize(os.path.join(output_dir, WEIGHTS_FILE)) / 1e6
+    logger.info(f"Wrote text tower ({len(state)} tensors, {size_mb:.1f} MB) to {output_dir}")
+    return output_dir
+
+
+def load_text_tower(directory: str = TEXT_TOWER_DIR):
+    """
+    Load the text tower from a build_text_tower artifact.
+
+    Returns:
+        (model, tokenizer) where model exposes encode_text like a full CLIP model
+    """
+    import torch
+    try:
+        # Private API; open_clip_torch is pinned in requirements.txt for it
+        from open_clip.model import _build_text_tower
+    except ImportError as e:
+        raise ImportError("open_clip.model._build_text_tower is missing; install the open_clip_torch "
+                          "version pinned in requirements.txt") from e
+    from open_clip.tokenizer import SimpleTokenizer
+    from safetensors.torch import load_file
+
+    config = read_config(directory)
+    text_cfg = config["text_cfg"]
+    text = _build_text_tower(config["embed_dim"], text_cfg, quick_gelu=config["quick_gelu"])
+    # assign=True keeps the memory-mapped tensors instead of copying into the freshly initialised ones
+    text.load_state_dict(load_file(os.path.join(directory, WEIGHTS_FILE), device="cpu"), assign=True)
+
+    class TextOnlyCLIP(torch.nn.Module):
+        def __init__(self, text_tower):
+            super().__init__()
+            self.text = text_tower
+
+        def encode_text(self, tokens):
+            return self.text(tokens)
+
+    model = TextOnlyCLIP(text).eval()
+    tokenizer = SimpleTokenizer(
+        bpe_path=os.path.join(directory, VOCAB_FILE),
+        context_length=text_cfg.get("context_length", 77),
+    )
+    return model, tokenizer
+
+
+def main(argv=None):
+    from src.components import MODEL_NAME, CHECKPOINT
+
+    parser = argparse.ArgumentParser(description="Extract the CLIP text tower for serving.")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--checkpoint", default=CHECKPOINT)
+    parser.add_argument("--output", default=TEXT_TOWER_DIR)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    build_text_tower(args.model, args.checkpoint, args.output)
+
+
+if __name__ == "__main__":
+    main()
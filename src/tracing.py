@@ -0,0 +1,24 @@
+"""
+Lazy LangSmith tracing decorator.
+Importing langsmith costs a few hundred milliseconds, so it is deferred until
+a traced function is first called instead of paid at app import.
+"""
+
+import functools
+
+
+def traceable(name: str):
+    """Drop-in for langsmith.traceable(name=...) that imports langsmith on first call."""
+    def decorator(fn):
+        traced = None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal traced
+            if traced is None:
+                from langsmith import traceable as langsmith_traceable
+                traced = langsmith_traceable(name=name)(fn)
+            return traced(*args, **kwargs)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,331 @@
+"""
+Attribute Bitmap Index
+Restrictive metadata filters (a winter-only or `year >= 2022` query) make
+Chroma's filtered HNSW search slow and can return fewer than k items. This
+index is built from the ingested collection and answers such queries by
+pre-filtering instead:
+
+    <dir>/manifest.json                rows, dim, storage, bitmap keys
+    <dir>/embeddings.npy               (rows, dim) L2-normalized, float32 or float16
+    <dir>/pq_codes.npy                 storage "pq": (rows, subspaces) uint8 product-quantized codes
+    <dir>/pq_codebooks.npy             storage "pq": (subspaces, 256, dim / subspaces) float32
+    <dir>/bitmaps.npy                  (n_bitmaps, ceil(rows / 8)) packed row bitmaps,
+                                       one per (field, value) of INDEXED_FIELDS
+    <dir>/{ids,metadatas,documents}.*  string columns (metadata as JSON)
+
+A filter is evaluated with bitwise AND/OR over the bitmaps (a year range ORs
+the bitmaps of the years it covers). When the candidate set is small enough,
+the query is an exact dot product over just those rows, so it returns
+min(k, candidates) items; otherwise the caller falls back to ANN.
+
+Storage trades memory for recall as the catalog grows: "float16" halves the
+scanned matrix; "pq" scans only the uint8 codes (64 bytes per 512-d vector
+by default) and re-ranks a shortlist of PQ_RERANK_CANDIDATES exactly against
+the float16 rows, whose pages are only touched for that shortlist.
+
+Usage:
+    python -m src.vector_index --chroma ./chroma_db --output ./models/vector_index [--storage pq]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.catalog_store import StringColumn, replace_directory, write_string_column
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+VECTOR_INDEX_DIR = os.environ.get("VECTOR_INDEX_DIR", "./models/vector_index")
+EXACT_SEARCH_MAX_CANDIDATES = int(os.environ.get("EXACT_SEARCH_MAX_CANDIDATES", "5000"))
+VECTOR_INDEX_STORAGE = os.environ.get("VECTOR_INDEX_STORAGE", "float32")
+PQ_SUBSPACES = int(os.environ.get("PQ_SUBSPACES", "64"))
+PQ_RERANK_CANDIDATES = int(os.environ.get("PQ_RERANK_CANDIDATES", "256"))
+
+STORAGES = ("float32", "float16", "pq")
+
+# Metadata fields with bitmaps; year gets one bitmap per year, so ranges are ORs of those
+INDEXED_FIELDS = ("season", "year", "gender", "masterCategory", "baseColour")
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+BITMAPS_FILE = "bitmaps.npy"
+PQ_CODES_FILE = "pq_codes.npy"
+PQ_CODEBOOKS_FILE = "pq_codebooks.npy"
+
+# Rows per block when scanning (bounds the float32 copy of a float16 matrix)
+SCAN_BLOCK_ROWS = 4096
+
+_RANGE_OPERATORS = {
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+def _index_value(value):
+    """Bitmap key value for a metadata value (2012.0 and 2012 share a bitmap); None if not indexable."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, (int, str)):
+        return value
+    return None
+
+
+class UnsupportedFilter(Exception):
+    """The filter uses a field or operator the bitmaps cannot answer."""
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k best scores of each row, best first."""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def _iter_collection(collection, page_size: int) -> Iterable[dict]:
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas", "documents"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            return
+        yield page
+        offset += len(page["ids"])
+
+
+def build_vector_index(collection, output_dir: str = VECTOR_INDEX_DIR, page_size: int = 5000,
+                       storage: str = VECTOR_INDEX_STORAGE, pq_subspaces: int = PQ_SUBSPACES) -> str:
+    """
+    Export a Chroma collection's vectors and metadata and build the attribute bitmaps.
+
+    Args:
+        storage: "float32", "float16", or "pq" (PQ codes plus float16 rows for re-ranking)
+        pq_subspaces: Bytes per vector with storage "pq" (must divide the embedding dim)
+    """
+    if storage not in STORAGES:
+        raise ValueError(f"Unknown storage {storage!r}; expected one of {STORAGES}")
+    ids, embeddings, metadatas, documents = [], [], [], []
+    for page in _iter_collection(collection, page_size):
+        ids.extend(page["ids"])
+        embeddings.extend(np.asarray(e, dtype=np.float32) for e in page["embeddings"])
+        metadatas.extend(m or {} for m in page["metadatas"])
+        documents.extend(d or "" for d in page["documents"])
+    if not ids:
+        raise ValueError("Collection is empty")
+
+    matrix = np.stack(embeddings)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    keys, bitmaps = [], []
+    for field in INDEXED_FIELDS:
+        values = [_index_value(m.get(field)) for m in metadatas]
+        for value in sorted({v for v in values if v is not None}, key=str):
+            keys.append([field, value])
+            bitmaps.append(np.packbits(np.array([v == value for v in values], dtype=bool)))
+
+    tmp_dir = f"{output_dir.rstrip('/')}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), matrix if storage == "float32" else matrix.astype(np.float16))
+    if storage == "pq":
+        from src.quantization import ProductQuantizer
+
+        quantizer = ProductQuantizer.train(matrix, pq_subspaces)
+        np.save(os.path.join(tmp_dir, PQ_CODEBOOKS_FILE), quantizer.codebooks)
+        np.save(os.path.join(tmp_dir, PQ_CODES_FILE), quantizer.encode(matrix))
+    np.save(os.path.join(tmp_dir, BITMAPS_FILE),
+            np.stack(bitmaps) if bitmaps else np.zeros((0, (len(ids) + 7) // 8), dtype=np.uint8))
+    write_string_column(tmp_dir, "ids", ids)
+    write_string_column(tmp_dir, "metadatas", [json.dumps(m) for m in metadatas])
+    write_string_column(tmp_dir, "documents", documents)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump({"rows": len(ids), "dim": int(matrix.shape[1]), "storage": storage, "bitmaps": keys}, f)
+    replace_directory(tmp_dir, output_dir)
+    logger.info(f"Wrote vector index ({len(ids)} {storage} vectors, {len(keys)} bitmaps) to {output_dir}")
+    return output_dir
+
+
+def has_vector_index(directory: str = VECTOR_INDEX_DIR) -> bool:
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+
+class VectorIndex:
+    """Memory-mapped embeddings, metadata and attribute bitmaps of the catalog."""
+
+    def __init__(self, directory: str = VECTOR_INDEX_DIR, rerank_candidates: int = PQ_RERANK_CANDIDATES):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        self.rows = manifest["rows"]
+        self.dim = manifest["dim"]
+        self.storage = manifest.get("storage", "float32")
+        self.rerank_candidates = rerank_candidates
+        self.embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        self.quantizer = self.codes = None
+        if self.storage == "pq":
+            from src.quantization import ProductQuantizer
+
+            self.quantizer = ProductQuantizer(np.load(os.path.join(directory, PQ_CODEBOOKS_FILE)))
+            self.codes = np.load(os.path.join(directory, PQ_CODES_FILE), mmap_mode="r")
+        self.bitmaps = np.load(os.path.join(directory, BITMAPS_FILE), mmap_mode="r")
+        self.ids = StringColumn(directory, "ids")
+        self.metadatas = StringColumn(directory, "metadatas")
+        self.texts = StringColumn(directory, "documents")
+        self._bitmap_rows = {}
+        for row, (field, value) in enumerate(manifest["bitmaps"]):
+            self._bitmap_rows.setdefault(field, {})[value] = row
+
+    def __len__(self) -> int:
+        return self.rows
+
+    # Filters
+
+    def _none(self) -> np.ndarray:
+        return np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+
+    def _all(self) -> np.ndarray:
+        return np.packbits(np.ones(self.rows, dtype=bool))
+
+    def _union(self, field: str, values) -> np.ndarray:
+        rows = [self._bitmap_rows[field][v] for v in values if v in self._bitmap_rows[field]]
+        if not rows:
+            return self._none()
+        return np.bitwise_or.reduce(self.bitmaps[rows], axis=0)
+
+    def _field_bits(self, field: str, condition) -> np.ndarray:
+        if field not in self._bitmap_rows:
+            raise UnsupportedFilter(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        bits = self._all()
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                values = [_index_value(operand)]
+            elif operator == "$in":
+                values = [_index_value(v) for v in operand]
+            elif operator in _RANGE_OPERATORS:
+                compare = _RANGE_OPERATORS[operator]
+                values = [v for v in self._bitmap_rows[field]
+                          if isinstance(v, (int, float)) and compare(v, operand)]
+            else:
+                raise UnsupportedFilter(operator)
+            bits = bits & self._union(field, values)
+        return bits
+
+    def _filter_bits(self, filters: dict) -> np.ndarray:
+        bits = self._all()
+        for key, condition in filters.items():
+            if key == "$and":
+                for clause in condition:
+                    bits = bits & self._filter_bits(clause)
+            elif key == "$or":
+                bits = bits & np.bitwise_or.reduce([self._filter_bits(clause) for clause in condition], axis=0)
+            elif key.startswith("$"):
+                raise UnsupportedFilter(key)
+            else:
+                bits = bits & self._field_bits(key, condition)
+        return bits
+
+    def candidates(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """Row positions matching a Chroma-style `where` filter, or None if the bitmaps cannot answer it."""
+        if not filters:
+            return None
+        try:
+            bits = self._filter_bits(filters)
+        except UnsupportedFilter as e:
+            logger.debug(f"Filter {filters} not answerable from bitmaps ({e})")
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.rows))
+
+    # Search
+
+    def _queries(self, query_embeddings) -> np.ndarray:
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        return queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    def _scores(self, queries: np.ndarray, positions: Optional[np.ndarray]) -> np.ndarray:
+        """Exact scores (n_queries, n_rows), scanning the (possibly float16) matrix block by block."""
+        n = self.rows if positions is None else len(positions)
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        for start in range(0, n, SCAN_BLOCK_ROWS):
+            end = start + SCAN_BLOCK_ROWS
+            rows = slice(start, end) if positions is None else positions[start:end]
+            scores[:, start:end] = queries @ np.asarray(self.embeddings[rows], dtype=np.float32).T
+        return scores
+
+    def _search(self, queries: np.ndarray, k: int, positions: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """(row positions, scores), each (n_queries, min(k, n_rows)), best first."""
+        n = self.rows if positions is None else len(positions)
+        k = min(k, n)
+        if k <= 0:
+            return np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32)
+        if self.storage != "pq":
+            scores = self._scores(queries, positions)
+            top = _top_k(scores, k)
+            rows = top if positions is None else positions[top]
+            return rows, np.take_along_axis(scores, top, axis=1)
+
+        # Shortlist by PQ codes, then re-rank the shortlist exactly
+        codes = self.codes if positions is None else self.codes[positions]
+        approximate = self.quantizer.scores(self.quantizer.lookup_tables(queries), codes)
+        shortlist = _top_k(approximate, min(n, max(k, self.rerank_candidates)))
+        if positions is not None:
+            shortlist = positions[shortlist]
+        shortlist = np.sort(shortlist, axis=1)  # ascending rows read the float16 pages in order
+        exact = np.stack([np.asarray(self.embeddings[rows], dtype=np.float32) @ query
+                          for rows, query in zip(shortlist, queries)])
+        top = _top_k(exact, k)
+        return np.take_along_axis(shortlist, top, axis=1), np.take_along_axis(exact, top, axis=1)
+
+    def search(self, query_embedding, k: int, positions: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k by dot product (cosine on the normalized vectors) over the given
+        rows (all rows if None); exact unless the storage is "pq".
+
+        Returns:
+            (row positions, scores), best first
+        """
+        rows, scores = self._search(self._queries(query_embedding), k, positions)
+        return rows[0], scores[0]
+
+    def search_many(self, query_embeddings, k: int, positions: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """Top-k row positions for several queries, scanning the matrix once."""
+        rows, _ = self._search(self._queries(query_embeddings), k, positions)
+        return list(rows)
+
+    def documents(self, positions: Iterable[int]) -> List:
+        """LangChain Documents for row positions (what the vector store would have returned)."""
+        from langchain_core.documents import Document
+
+        return [Document(page_content=self.texts[int(p)], metadata=json.loads(self.metadatas[int(p)]))
+                for p in positions]
+
+
+def main(argv=None):
+    from src.components import CHROMA_DB_DIR
+
+    parser = argparse.ArgumentParser(description="Build the attribute bitmap index from the Chroma collection.")
+    parser.add_argument("--chroma", default=CHROMA_DB_DIR)
+    parser.add_argument("--collection", default="style_sync")
+    parser.add_argument("--output", default=VECTOR_INDEX_DIR)
+    parser.add_argument("--storage", choices=STORAGES, default=VECTOR_INDEX_STORAGE)
+    parser.add_argument("--pq-subspaces", type=int, default=PQ_SUBSPACES)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=args.chroma).get_collection(args.collection)
+    build_vector_index(collection, args.output, storage=args.storage, pq_subspaces=args.pq_subspaces)
+
+
+if __name__ == "__main__":
+    main()
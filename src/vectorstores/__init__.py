@@ -0,0 +1,8 @@
+# src/vectorstores/__init__.py
+from .base import VectorBackend
+from .chroma import ChromaBackend
+from .numpy_backend import NumpyBackend
+
+VECTOR_BACKENDS = ("chroma", "numpy")
+
+__all__ = ["VectorBackend", "ChromaBackend", "NumpyBackend", "VECTOR_BACKENDS"]
@@ -0,0 +1,31 @@
+"""
+Vector Backend Interface
+What the serving path needs from a vector store: top-k documents for one or
+several query embeddings under a Chroma-style `where` filter (the shape
+determine_filters produces).
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+
+class VectorBackend(ABC):
+    """Top-k retrieval over the catalog embeddings."""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, query_embedding: List[float], k: int, filters: Optional[dict] = None) -> List:
+        """
+        Returns:
+            Up to k LangChain Documents, nearest first
+        """
+
+    def search_many(self, query_embeddings: List[List[float]], k: int,
+                    filters: Optional[dict] = None) -> List[List]:
+        """search() for several queries sharing the same filters; backends may batch this."""
+        return [self.search(embedding, k, filters) for embedding in query_embeddings]
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of vectors in the store."""
@@ -0,0 +1,76 @@
+"""
+Chroma Backend
+LangChain Chroma vector store, with selective filters answered from the
+attribute bitmap index by an exact scan (see src.vector_index) and several
+queries sharing a filter sent as one collection query.
+"""
+
+from typing import List, Optional
+
+from src.metrics import VECTOR_SEARCHES
+from src.vector_index import EXACT_SEARCH_MAX_CANDIDATES
+
+from .base import VectorBackend
+
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, vectorstore, attribute_index=None,
+                 max_exact_candidates: int = EXACT_SEARCH_MAX_CANDIDATES):
+        """
+        Args:
+            vectorstore: langchain_chroma.Chroma (or anything with similarity_search_by_vector)
+            attribute_index: Optional VectorIndex used to pre-filter selective queries
+            max_exact_candidates: Largest candidate set scanned exactly instead of using ANN
+        """
+        self.vectorstore = vectorstore
+        self.attribute_index = attribute_index
+        self.max_exact_candidates = max_exact_candidates
+
+    def _candidates(self, filters: Optional[dict]):
+        """Bitmap candidates when they are few enough for an exact scan, else None (ANN)."""
+        if self.attribute_index is None or not filters:
+            return None
+        candidates = self.attribute_index.candidates(filters)
+        if candidates is None or len(candidates) > self.max_exact_candidates:
+            return None
+        return candidates
+
+    def search(self, query_embedding: List[float], k: int, filters: Optional[dict] = None) -> List:
+        # Selective filters: exact scan of the pre-filtered rows (always k results if k match)
+        candidates = self._candidates(filters)
+        if candidates is not None:
+            VECTOR_SEARCHES.labels(path='exact').inc()
+            positions, _ = self.attribute_index.search(query_embedding, k, candidates)
+            return self.attribute_index.documents(positions)
+        VECTOR_SEARCHES.labels(path='ann').inc()
+        return self.vectorstore.similarity_search_by_vector(query_embedding, k=k, filter=filters or None)
+
+    def search_many(self, query_embeddings: List[List[float]], k: int,
+                    filters: Optional[dict] = None) -> List[List]:
+        candidates = self._candidates(filters)
+        if candidates is not None:
+            VECTOR_SEARCHES.labels(path='exact').inc(len(query_embeddings))
+            return [self.attribute_index.documents(positions)
+                    for positions in self.attribute_index.search_many(query_embeddings, k, candidates)]
+        collection = getattr(self.vectorstore, "_collection", None)
+        if collection is None:
+            return super().search_many(query_embeddings, k, filters)
+
+        from langchain_core.documents import Document
+
+        VECTOR_SEARCHES.labels(path='ann').inc(len(query_embeddings))
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=filters or None,
+            include=["documents", "metadatas"]
+        )
+        return [
+            [Document(page_content=text or "", metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(results["documents"], results["metadatas"])
+        ]
+
+    def count(self) -> int:
+        return self.vectorstore._collection.count()
@@ -0,0 +1,49 @@
+"""
+NumPy Exact-Search Backend
+The catalog is ~44k 512-d vectors, so an exact float32 scan is a ~90 MB
+memory-mapped matrix and one matrix-vector product per query: no HNSW
+graph, no Chroma persistence. Reads the artifact written by
+`python -m src.vector_index` (embedding matrix + side metadata table);
+filters are evaluated on its attribute bitmaps and top-k is taken with
+argpartition. An index built with --storage float16/pq is searched the same
+way, trading some recall for memory (see VectorIndex).
+"""
+
+from typing import List, Optional
+
+from src.metrics import VECTOR_SEARCHES
+
+from .base import VectorBackend
+
+
+class NumpyBackend(VectorBackend):
+    name = "numpy"
+
+    def __init__(self, index):
+        """
+        Args:
+            index: src.vector_index.VectorIndex
+        """
+        self.index = index
+
+    def _positions(self, filters: Optional[dict]):
+        if not filters:
+            return None
+        candidates = self.index.candidates(filters)
+        if candidates is None:
+            raise ValueError(f"Filter not supported by the numpy vector backend: {filters}")
+        return candidates
+
+    def search(self, query_embedding: List[float], k: int, filters: Optional[dict] = None) -> List:
+        VECTOR_SEARCHES.labels(path='exact').inc()
+        positions, _ = self.index.search(query_embedding, k, self._positions(filters))
+        return self.index.documents(positions)
+
+    def search_many(self, query_embeddings: List[List[float]], k: int,
+                    filters: Optional[dict] = None) -> List[List]:
+        VECTOR_SEARCHES.labels(path='exact').inc(len(query_embeddings))
+        return [self.index.documents(positions)
+                for positions in self.index.search_many(query_embeddings, k, self._positions(filters))]
+
+    def count(self) -> int:
+        return len(self.index)
@@ -0,0 +1,188 @@
+"""
+Zero-Shot Attribute Prediction
+CLIP zero-shot classification of uploaded product images over the catalog's
+own labels (category, subcategory, colour, usage). The prompt embeddings of
+every label are computed once into a single normalized matrix, so a
+prediction is one image forward pass plus one matmul for the whole batch.
+torch/open_clip are imported on first use so importing this module stays cheap.
+"""
+
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+# Configuration
+ZERO_SHOT_MIN_LABEL_COUNT = int(os.environ.get("ZERO_SHOT_MIN_LABEL_COUNT", "10"))
+ZERO_SHOT_IMAGE_SIDE = int(os.environ.get("ZERO_SHOT_IMAGE_SIDE", "224"))
+
+# Predicted attribute -> catalog (styles.csv) column
+ATTRIBUTE_COLUMNS = {
+    "category": "masterCategory",
+    "subcategory": "subCategory",
+    "colour": "baseColour",
+    "usage": "usage",
+}
+
+# Prompt embeddings of a label are averaged over its attribute's templates
+PROMPT_TEMPLATES = {
+    "category": ("a photo of {label}.", "a product photo of {label}."),
+    "subcategory": ("a photo of {label}.", "a product photo of {label}."),
+    "colour": ("a photo of a {label} item.", "a product photo of something {label} in colour."),
+    "usage": ("a photo of {label} wear.", "a product photo of clothing for {label} use."),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def catalog_labels(catalog, min_count: int = ZERO_SHOT_MIN_LABEL_COUNT) -> Dict[str, List[str]]:
+    """
+    Candidate labels per attribute from the catalog (a CatalogStore).
+    Labels used by fewer than min_count products, and "NA" placeholders, are dropped.
+    """
+    labels = {}
+    for attribute, column in ATTRIBUTE_COLUMNS.items():
+        if column not in catalog.categories:
+            continue
+        counts = catalog.value_counts(column)
+        values = sorted(label for label, count in counts.items() if count >= min_count and label != "NA")
+        if values:
+            labels[attribute] = values
+    return labels
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+@dataclass
+class LabelSpace:
+    """All label prompt embeddings as one matrix, with each attribute's row range."""
+    labels: Dict[str, List[str]]
+    matrix: np.ndarray  # (n_labels, dim) float32, rows L2-normalized
+    slices: Dict[str, slice]
+
+
+def build_label_space(text_embedder, labels: Dict[str, List[str]],
+                      templates: Dict[str, Sequence[str]] = PROMPT_TEMPLATES,
+                      batch_size: int = 256) -> LabelSpace:
+    """
+    Embed every (label, template) prompt with a text embedder (embed_documents)
+    and average each label's prompts into one row of the label matrix.
+    """
+    prompts = []
+    for attribute, values in labels.items():
+        for label in values:
+            prompts.extend(template.format(label=label.lower()) for template in templates[attribute])
+
+    vectors = []
+    for i in range(0, len(prompts), batch_size):
+        vectors.extend(text_embedder.embed_documents(prompts[i:i + batch_size]))
+    vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+    rows = []
+    slices = {}
+    offset = 0
+    for attribute, values in labels.items():
+        n_templates = len(templates[attribute])
+        slices[attribute] = slice(len(rows), len(rows) + len(values))
+        for _ in values:
+            rows.append(vectors[offset:offset + n_templates].mean(axis=0))
+            offset += n_templates
+    return LabelSpace(labels=labels, matrix=_normalize_rows(np.stack(rows)).astype(np.float32), slices=slices)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class ZeroShotClassifier:
+    """Predicts the most likely catalog label of every attribute for a batch of images."""
+
+    def __init__(self, encode_images: Callable[[list], np.ndarray], label_space: LabelSpace,
+                 logit_scale: float = 100.0):
+        """
+        Args:
+            encode_images: Maps a list of PIL images to an (n, dim) array of image embeddings
+            label_space: Precomputed label prompt embeddings
+            logit_scale: CLIP's learned temperature (model.logit_scale.exp())
+        """
+        self.encode_images = encode_images
+        self.label_space = label_space
+        self.logit_scale = logit_scale
+
+    def predict(self, images: list) -> List[dict]:
+        """
+        Returns:
+            One dict per image: {attribute: label, ..., "scores": {attribute: probability}}
+        """
+        if not images:
+            return []
+        features = _normalize_rows(np.asarray(self.encode_images(images), dtype=np.float32))
+        logits = self.logit_scale * features @ self.label_space.matrix.T
+
+        predictions = [{"scores": {}} for _ in images]
+        for attribute, rows in self.label_space.slices.items():
+            probabilities = _softmax(logits[:, rows])
+            best = probabilities.argmax(axis=-1)
+            for prediction, index, probs in zip(predictions, best, probabilities):
+                prediction[attribute] = self.label_space.labels[attribute][index]
+                prediction["scores"][attribute] = float(probs[index])
+        return predictions
+
+
+def decode_image(data: bytes, side: int = ZERO_SHOT_IMAGE_SIDE):
+    """
+    Decode an upload at reduced resolution for a side x side model input.
+    JPEGs are decoded straight to a smaller scale (libjpeg DCT scaling);
+    other formats are reduced by an integer factor after decoding. The
+    shorter side is never taken below `side`, so CLIP preprocessing sees
+    the same crop it would at full resolution.
+
+    Raises:
+        ValueError: If the bytes are not a readable image, or exceed PIL's decompression bomb limit
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft("RGB", (side, side))
+        image = image.convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"Unreadable image: {e}") from e
+    factor = min(image.size) // side
+    if factor > 1:
+        image = image.reduce(factor)
+    return image
+
+
+def load_zero_shot_classifier(labels: Dict[str, List[str]], model_name: str = None,
+                              checkpoint: str = None) -> ZeroShotClassifier:
+    """Load the CLIP model and precompute the label matrix (one-off, at startup)."""
+    import open_clip
+    import torch
+
+    from src.components import CHECKPOINT, MODEL_NAME
+    from src.embeddings import OpenCLIPEmbedder
+
+    model_name = model_name or MODEL_NAME
+    checkpoint = checkpoint or CHECKPOINT
+    logger.info(f"Loading OpenCLIP model for zero-shot prediction: {model_name} ({checkpoint})...")
+    model, _, preprocess = open_clip.create_model_and_transforms(model_name, pretrained=checkpoint)
+    model.eval()
+    tokenizer = open_clip.get_tokenizer(model_name)
+
+    label_space = build_label_space(OpenCLIPEmbedder(model, tokenizer), labels)
+    logger.info(f"Label matrix: {label_space.matrix.shape[0]} labels over {list(labels)}")
+
+    def encode_images(images):
+        with torch.no_grad():
+            batch = torch.stack([preprocess(image) for image in images])
+            return model.encode_image(batch).float().numpy()
+
+    return ZeroShotClassifier(encode_images, label_space, logit_scale=float(model.logit_scale.exp()))
@@ -1,27 +1,399 @@
 """
 Unit tests for FastAPI app
 """
+import io
+import json
+import time
 import pytest
 from fastapi.testclient import TestClient
 
-# Skip tests that require full app initialization
-pytest.importorskip("botocore")
+from src.app import create_app
+from src.catalog_images import CatalogImageFetcher
+from src.components import Components
 
-from src.app import app
 
-client = TestClient(app)
+class FakeEmbedder:
+    def embed_documents(self, texts):
+        return [[1.0, float(len(t)), 0.0] for t in texts]
 
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
 
-def test_health():
+
+class FakeDoc:
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.searches = []
+
+    def similarity_search_by_vector(self, embedding, k=3, filter=None):
+        self.searches.append(filter)
+        return [FakeDoc({"id": i, "productDisplayName": f"Blue Linen Shirt {i}"}) for i in range(1, k + 1)]
+
+
+class FakeS3Client:
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(b"jpeg")}
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        return f"https://signed/{Params['Key']}"
+
+
+class FakeMessage:
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeMessage("The suggested linen shirt is breathable.",
+                           {"input_tokens": 1200, "output_tokens": 40, "total_tokens": 1240})
+
+    async def astream(self, messages):
+        self.calls += 1
+        for chunk in ["The suggested ", "linen shirt ", "is breathable."]:
+            yield FakeMessage(chunk)
+
+
+@pytest.fixture
+def components():
+    embedder = FakeEmbedder()
+    return Components(
+        text_embedder=embedder,
+        embedding_function=embedder,
+        vectorstore=FakeVectorStore(),
+        image_fetcher=CatalogImageFetcher(FakeS3Client()),
+        llm=FakeLLM(),
+    )
+
+
+@pytest.fixture
+def client(components):
+    return TestClient(create_app(components, warm_up=False))
+
+
+def test_health(client):
     """Test health endpoint."""
     r = client.get("/health")
     assert r.status_code == 200
     assert r.json() == {"status": "ok"}
 
 
-def test_metrics():
+def test_metrics(client):
     """Test metrics endpoint returns Prometheus metrics."""
     r = client.get("/metrics")
     assert r.status_code == 200
     # Check for Prometheus metric format
     assert "python_gc" in r.text or "llm" in r.text
+
+
+def test_guardrails_stats(client):
+    before = client.get("/guardrails/stats").json()["blocked_inputs"]
+    client.post("/chat", json={"query": "jailbreak the stylist"})
+    stats = client.get("/guardrails/stats").json()
+    assert set(stats) >= {"total_events", "blocked_inputs", "by_rule"}
+    # Counted on the log writer thread, so allow it a moment
+    for _ in range(50):
+        if stats["blocked_inputs"] > before:
+            break
+        time.sleep(0.01)
+        stats = client.get("/guardrails/stats").json()
+    assert stats["blocked_inputs"] == before + 1
+
+
+def test_ready_after_warm_up(client, components):
+    assert client.get("/ready").status_code == 503
+    components.warm_up()
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json() == {"status": "ready"}
+
+
+def test_chat(client, components):
+    r = client.post("/chat", json={"query": "summer linen shirt"}, headers={"X-Cache-Bypass": "true"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["response"] == "The suggested linen shirt is breathable."
+    assert len(body["recommended_items"]) == 3
+    assert body["recommended_items"][0]["s3_uri"].startswith("https://signed/")
+    assert components.vectorstore.searches[-1] == {"season": "Summer"}
+
+
+def _sample(name, labels):
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_chat_records_stage_latencies_and_tokens(client):
+    stages = ['guardrails', 'filter_routing', 'query_embedding', 'chroma_search',
+              's3_fetch', 'presign', 'gemini', 'output_moderation']
+    before = {stage: _sample('request_stage_latency_seconds_count', {'endpoint': '/chat', 'stage': stage})
+              for stage in stages}
+    tokens_before = _sample('llm_token_usage_total', {'type': 'input'})
+    client.post("/chat", json={"query": "denim jacket"}, headers={"X-Cache-Bypass": "true"})
+    for stage in stages:
+        assert _sample('request_stage_latency_seconds_count', {'endpoint': '/chat', 'stage': stage}) == before[stage] + 1, stage
+    assert _sample('llm_token_usage_total', {'type': 'input'}) == tokens_before + 1200
+
+
+def test_chat_blocks_pii(client, components):
+    r = client.post("/chat", json={"query": "email me at john@example.com"})
+    assert r.status_code == 200
+    assert r.json()["recommended_items"] == []
+    assert components.llm.calls == 0
+
+
+def test_chat_scans_input_once(client, monkeypatch):
+    import src.app
+    calls = []
+    check = src.app.input_guardrails.check
+    monkeypatch.setattr(src.app.input_guardrails, "check", lambda query: calls.append(query) or check(query))
+    client.post("/chat", json={"query": "linen trousers"}, headers={"X-Cache-Bypass": "true"})
+    assert calls == ["linen trousers"]
+
+
+def test_chat_serves_repeat_intent_from_cache(client, components):
+    client.post("/chat", json={"query": "winter wool coat"})
+    client.post("/chat", json={"query": "Winter  wool coat"})
+    assert components.llm.calls == 1
+
+
+class VersionedS3Client(FakeS3Client):
+    """Signs a new URL on every call, like a real signer with a moving timestamp."""
+
+    def __init__(self):
+        self.signed = 0
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        self.signed += 1
+        return f"https://signed/{Params['Key']}?v={self.signed}"
+
+
+def test_cached_response_is_presigned_again(monkeypatch):
+    import src.app
+    from src.cache import PresignedUrlCache, SemanticResponseCache
+    monkeypatch.setattr(src.app, "response_cache", SemanticResponseCache())
+    embedder = FakeEmbedder()
+    fetcher = CatalogImageFetcher(VersionedS3Client(), presign_cache=PresignedUrlCache())
+    components = Components(text_embedder=embedder, embedding_function=embedder,
+                            vectorstore=FakeVectorStore(), image_fetcher=fetcher, llm=FakeLLM())
+    client = TestClient(create_app(components, warm_up=False))
+
+    first = client.post("/chat", json={"query": "black formal blazer"}).json()
+    # The URLs signed for the first answer have expired by the time it is served again
+    fetcher.presign_cache = PresignedUrlCache()
+    second = client.post("/chat", json={"query": "Black formal blazer"}).json()
+
+    assert components.llm.calls == 1
+    assert second["response"] == first["response"]
+    first_urls = [item["s3_uri"] for item in first["recommended_items"]]
+    second_urls = [item["s3_uri"] for item in second["recommended_items"]]
+    assert len(second_urls) == 3 and all(url.startswith("https://signed/") for url in second_urls)
+    assert not set(first_urls) & set(second_urls)
+
+
+def _sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def test_chat_stream(client):
+    r = client.post("/chat/stream", json={"query": "linen shirt for a wedding"}, headers={"X-Cache-Bypass": "1"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+
+    events = _sse_events(r.text)
+
+    names = [name for name, _ in events]
+    assert names[0] == "items" and names[-1] == "done"
+    assert names.count("token") == 3
+    assert len(events[0][1]["recommended_items"]) == 3
+    assert events[-1][1]["response"] == "The suggested linen shirt is breathable."
+
+
+class BrokenStreamLLM(FakeLLM):
+    """Fails after the first streamed chunk."""
+
+    async def astream(self, messages):
+        self.calls += 1
+        yield FakeMessage("The suggested linen ")
+        raise RuntimeError("stream reset")
+
+
+def test_chat_stream_failure_is_not_cached(monkeypatch):
+    import src.app
+    from src.app import GEMINI_ERROR_RESPONSE
+    from src.cache import SemanticResponseCache
+    monkeypatch.setattr(src.app, "response_cache", SemanticResponseCache())
+    embedder = FakeEmbedder()
+    components = Components(text_embedder=embedder, embedding_function=embedder, vectorstore=FakeVectorStore(),
+                            image_fetcher=CatalogImageFetcher(FakeS3Client()), llm=BrokenStreamLLM())
+    client = TestClient(create_app(components, warm_up=False))
+
+    for _ in range(2):
+        events = _sse_events(client.post("/chat/stream", json={"query": "linen shirt for a beach"}).text)
+        assert [name for name, _ in events] == ["items", "token", "done"]
+        assert events[-1][1] == {"response": GEMINI_ERROR_RESPONSE, "moderated": False, "failed": True}
+    assert components.llm.calls == 2
+    # /chat shares the cache; it must not get the broken streamed answer either
+    assert client.post("/chat", json={"query": "linen shirt for a beach"}).json()["response"] != GEMINI_ERROR_RESPONSE
+    assert components.llm.calls == 3
+
+
+def test_chat_stream_disconnect_releases_slot_and_request(components):
+    """A client dropping mid-stream must not leak the admission slot or the active-request gauge."""
+    import asyncio
+    import src.app
+
+    app = create_app(components, warm_up=False)
+    active_before = _sample("llm_active_requests", {})
+    slots_before = src.app.request_limiter._semaphore._value
+    body = json.dumps({"query": "linen shirt for a beach party"}).encode()
+
+    async def run():
+        disconnected = asyncio.Event()
+        received = []
+        sent = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body" and message.get("body"):
+                # Client goes away after the first event; the server is cancelled mid-send
+                disconnected.set()
+                await asyncio.sleep(5)
+
+        scope = {"type": "http", "method": "POST", "path": "/chat/stream", "raw_path": b"/chat/stream",
+                 "query_string": b"", "root_path": "", "scheme": "http", "server": ("testserver", 80),
+                 "client": ("testclient", 50000), "http_version": "1.1",
+                 "headers": [(b"content-type", b"application/json"), (b"x-cache-bypass", b"1")]}
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+        return sent
+
+    sent = asyncio.run(run())
+    bodies = [m["body"] for m in sent if m["type"] == "http.response.body"]
+    assert bodies[0].startswith(b"event: items")
+    assert not any(b"event: done" in chunk for chunk in bodies)
+    assert src.app.request_limiter._semaphore._value == slots_before
+    assert _sample("llm_active_requests", {}) == active_before
+    assert _sample("llm_requests_total", {"endpoint": "/chat/stream", "status": "disconnected"}) >= 1
+
+
+class FakeCollection:
+    def __init__(self, fail_on=None):
+        self.queries = []
+        self.fail_on = fail_on
+
+    def query(self, query_embeddings, n_results, where=None, include=None):
+        self.queries.append((len(query_embeddings), where))
+        if where == self.fail_on:
+            raise RuntimeError("collection unavailable")
+        # Every query gets the same two items, so images are shared across the batch
+        return {
+            "documents": [["", ""] for _ in query_embeddings],
+            "metadatas": [[{"id": 1, "productDisplayName": "Blue Linen Shirt 1"},
+                           {"id": 2, "productDisplayName": "Blue Linen Shirt 2"}] for _ in query_embeddings],
+        }
+
+
+class FakeChromaStore(FakeVectorStore):
+    def __init__(self, fail_on=None):
+        super().__init__()
+        self._collection = FakeCollection(fail_on)
+
+
+class CountingS3Client(FakeS3Client):
+    def __init__(self):
+        self.gets = []
+
+    def get_object(self, Bucket, Key):
+        self.gets.append(Key)
+        return super().get_object(Bucket, Key)
+
+
+@pytest.fixture
+def batch_components():
+    embedder = FakeEmbedder()
+    return Components(
+        text_embedder=embedder,
+        embedding_function=embedder,
+        vectorstore=FakeChromaStore(fail_on={"season": "Winter"}),
+        image_fetcher=CatalogImageFetcher(CountingS3Client()),
+        llm=FakeLLM(),
+    )
+
+
+def test_chat_batch(batch_components):
+    client = TestClient(create_app(batch_components, warm_up=False))
+    queries = ["summer linen shirt", "email me at john@example.com", "summer beach hat",
+               "black leather boots", "winter wool scarf"]
+    r = client.post("/chat/batch", json={"queries": queries}, headers={"X-Cache-Bypass": "true"})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [item["query"] for item in results] == queries
+
+    assert results[0]["response"] == "The suggested linen shirt is breathable."
+    assert len(results[0]["recommended_items"]) == 2
+    assert results[1]["recommended_items"] == [] and "Personal information" in results[1]["response"]
+    assert results[4]["error"] == "Retrieval failed: collection unavailable"
+    assert results[4]["response"] is None
+
+    # One search per filter set, holding all of its queries
+    assert sorted(batch_components.vectorstore._collection.queries, key=str) == sorted(
+        [(2, {"season": "Summer"}), (1, None), (1, {"season": "Winter"})], key=str)
+    # Shared catalog images are downloaded once for the whole batch
+    assert len(batch_components.image_fetcher.s3_client.gets) == 2
+    assert batch_components.llm.calls == 3
+
+
+def test_chat_batch_rejects_oversized_batches(client, monkeypatch):
+    import src.app
+    monkeypatch.setattr(src.app, "CHAT_BATCH_MAX_QUERIES", 2)
+    r = client.post("/chat/batch", json={"queries": ["a", "b", "c"]})
+    assert r.status_code == 413
+
+
+def test_chat_uses_exact_search_for_selective_filters(tmp_path):
+    from src.vector_index import VectorIndex, build_vector_index
+    from tests.test_vector_index import FakeCollection
+
+    build_vector_index(FakeCollection(dim=3), str(tmp_path / "index"))
+    embedder = FakeEmbedder()
+    components = Components(
+        text_embedder=embedder,
+        embedding_function=embedder,
+        vectorstore=FakeVectorStore(),
+        attribute_index=VectorIndex(str(tmp_path / "index")),
+        image_fetcher=CatalogImageFetcher(FakeS3Client()),
+        llm=FakeLLM(),
+    )
+    client = TestClient(create_app(components, warm_up=False))
+    exact_before = _sample('vector_searches_total', {'path': 'exact'})
+
+    r = client.post("/chat", json={"query": "trendy winter coat"}, headers={"X-Cache-Bypass": "true"})
+    items = r.json()["recommended_items"]
+    assert len(items) == 3
+    assert all(item["metadata"]["season"] == "Winter" and item["metadata"]["year"] >= 2022 for item in items)
+    assert components.vectorstore.searches == []
+    assert _sample('vector_searches_total', {'path': 'exact'}) == exact_before + 1
+
+    # Unfiltered queries still go to the vector store
+    client.post("/chat", json={"query": "linen shirt"}, headers={"X-Cache-Bypass": "true"})
+    assert components.vectorstore.searches == [None]
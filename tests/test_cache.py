@@ -0,0 +1,261 @@
+"""
+Unit tests for the serving caches
+"""
+import io
+import time
+from src.cache import (LRUCache, ImageCache, PresignedUrlCache, EmbeddingCache, CachedEmbedder,
+                       normalize_query, SemanticResponseCache)
+from src.catalog_images import CatalogImageFetcher
+
+
+class TestLRUCache:
+    """Tests for LRUCache."""
+
+    def test_evicts_least_recently_used_by_count(self):
+        evicted = []
+        cache = LRUCache(max_entries=2, on_evict=lambda k, v: evicted.append(k))
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert evicted == ["b"]
+        assert "a" in cache and "c" in cache
+
+    def test_evicts_by_byte_budget(self):
+        cache = LRUCache(max_bytes=10)
+        cache.put("a", "x" * 6)
+        cache.put("b", "y" * 6)
+        assert "a" not in cache
+        assert cache.total_bytes == 6
+
+    def test_skips_values_larger_than_budget(self):
+        cache = LRUCache(max_bytes=4)
+        cache.put("a", "x" * 10)
+        assert len(cache) == 0
+
+
+class TestImageCache:
+    """Tests for ImageCache."""
+
+    def test_memory_hit(self, tmp_path):
+        cache = ImageCache(memory_bytes=1024, disk_dir=str(tmp_path))
+        cache.put("s3://b/1.jpg", "abcd", etag='"e1"')
+        hit = cache.get("s3://b/1.jpg")
+        assert hit.image_b64 == "abcd"
+        assert hit.etag == '"e1"'
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        ImageCache(memory_bytes=1024, disk_dir=str(tmp_path)).put("s3://b/1.jpg", "abcd", etag='"e1"')
+        cache = ImageCache(memory_bytes=1024, disk_dir=str(tmp_path))
+        hit = cache.get("s3://b/1.jpg")
+        assert hit.image_b64 == "abcd"
+        assert "s3://b/1.jpg" in cache.memory  # promoted
+
+    def test_disk_tier_is_size_capped(self, tmp_path):
+        cache = ImageCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=250)
+        for i in range(5):
+            cache.put(f"s3://b/{i}.jpg", "x" * 100)
+        assert cache.disk.total_bytes <= 250
+        assert len(list(tmp_path.glob("*.b64"))) == 2
+        assert cache.get("s3://b/4.jpg") is not None
+        assert cache.get("s3://b/0.jpg") is None
+
+    def test_disk_cap_holds_across_workers(self, tmp_path):
+        first = ImageCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=250)
+        second = ImageCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=250)
+        first.put("s3://b/0.jpg", "x" * 100)
+        second.put("s3://b/1.jpg", "x" * 100)
+        assert first.get("s3://b/0.jpg") is not None  # now more recent than 1.jpg
+        first.put("s3://b/2.jpg", "x" * 100)
+        assert len(list(tmp_path.glob("*.b64"))) == 2
+        assert second.get("s3://b/1.jpg") is None
+        assert second.get("s3://b/0.jpg") is not None
+
+    def test_memory_only(self):
+        cache = ImageCache(memory_bytes=1024, disk_dir=None)
+        assert cache.get("s3://b/1.jpg") is None
+        cache.put("s3://b/1.jpg", "abcd")
+        assert cache.get("s3://b/1.jpg").image_b64 == "abcd"
+
+
+class TestPresignedUrlCache:
+    """Tests for PresignedUrlCache."""
+
+    def setup_method(self):
+        self.signed = 0
+
+    def sign(self):
+        self.signed += 1
+        return f"https://signed/{self.signed}"
+
+    def test_reuses_url_until_refresh_margin(self):
+        cache = PresignedUrlCache(refresh_margin=60)
+        first = cache.get_or_sign("s3://b/1.jpg", 3600, self.sign)
+        assert cache.get_or_sign("s3://b/1.jpg", 3600, self.sign) == first
+        assert self.signed == 1
+
+    def test_resigns_near_expiry(self):
+        cache = PresignedUrlCache(refresh_margin=60)
+        first = cache.get_or_sign("s3://b/1.jpg", 2, self.sign)
+        time.sleep(0.01)
+        # margin is clamped to half the 2s lifetime, so a fresh URL is reused
+        assert cache.get_or_sign("s3://b/1.jpg", 2, self.sign) == first
+        cache._urls.put(("s3://b/1.jpg", 2), (first, time.time() + 0.5))
+        assert cache.get_or_sign("s3://b/1.jpg", 2, self.sign) != first
+
+    def test_reuse_is_capped_at_credentials_expiry(self):
+        cache = PresignedUrlCache(refresh_margin=60)
+        expiry = time.time() + 600
+        first = cache.get_or_sign("s3://b/1.jpg", 3600, self.sign, lambda: expiry)
+        assert cache.get_or_sign("s3://b/1.jpg", 3600, self.sign, lambda: expiry) == first
+        # The session token is about to expire; the URL would stop working with it
+        expiry = time.time() + 30
+        cache._urls.put(("s3://b/1.jpg", 3600), (first, expiry))
+        assert cache.get_or_sign("s3://b/1.jpg", 3600, self.sign, lambda: None) != first
+
+    def test_failed_signing_is_not_cached(self):
+        cache = PresignedUrlCache()
+        assert cache.get_or_sign("s3://b/1.jpg", 3600, lambda: None) is None
+        assert cache.get_or_sign("s3://b/1.jpg", 3600, self.sign) == "https://signed/1"
+
+    def test_is_bounded(self):
+        cache = PresignedUrlCache(max_entries=2)
+        for i in range(5):
+            cache.get_or_sign(f"s3://b/{i}.jpg", 3600, self.sign)
+        assert len(cache._urls) == 2
+
+
+class FakeEmbedder:
+    """Counts forward passes and returns a deterministic vector per text."""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t)), 0.5, -1.0] for t in texts]
+
+
+class TestEmbeddingCache:
+    """Tests for EmbeddingCache and CachedEmbedder."""
+
+    def test_normalize_query(self):
+        assert normalize_query("  Summer   dress ") == "summer dress"
+
+    def test_near_identical_queries_share_entry(self):
+        model = FakeEmbedder()
+        embedder = CachedEmbedder(model, EmbeddingCache("m/1", store_path=None))
+        first = embedder.embed_query("summer dress")
+        assert embedder.embed_query("Summer dress ") == first
+        assert model.batches == [["summer dress"]]
+
+    def test_only_misses_are_embedded_in_one_batch(self):
+        model = FakeEmbedder()
+        embedder = CachedEmbedder(model, EmbeddingCache("m/1", store_path=None))
+        embedder.embed_query("red shoes")
+        vectors = embedder.embed_documents(["red shoes", "blue jeans", "Blue Jeans", "hat"])
+        assert model.batches[-1] == ["blue jeans", "hat"]
+        assert vectors[1] == vectors[2]
+
+    def test_persistent_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "emb.sqlite")
+        CachedEmbedder(FakeEmbedder(), EmbeddingCache("m/1", store_path=path)).embed_query("red shoes")
+        model = FakeEmbedder()
+        embedder = CachedEmbedder(model, EmbeddingCache("m/1", store_path=path))
+        assert embedder.embed_query("red shoes") == [9.0, 0.5, -1.0]
+        assert model.batches == []
+
+    def test_model_change_invalidates_store(self, tmp_path):
+        path = str(tmp_path / "emb.sqlite")
+        CachedEmbedder(FakeEmbedder(), EmbeddingCache("m/1", store_path=path)).embed_query("red shoes")
+        model = FakeEmbedder()
+        CachedEmbedder(model, EmbeddingCache("m/2", store_path=path)).embed_query("red shoes")
+        assert model.batches == [["red shoes"]]
+
+
+class TestSemanticResponseCache:
+    """Tests for SemanticResponseCache."""
+
+    RESPONSE = {"response": "Try the linen shirt", "recommended_items": [{"id": 1}]}
+    SUMMER = {"season": "Summer"}
+
+    def test_hit_for_similar_embedding_same_filters(self):
+        cache = SemanticResponseCache(threshold=0.95)
+        cache.store([1.0, 0.0, 0.0], self.SUMMER, self.RESPONSE)
+        assert cache.lookup([0.99, 0.05, 0.0], {"season": "Summer"}) == self.RESPONSE
+
+    def test_miss_below_threshold(self):
+        cache = SemanticResponseCache(threshold=0.95)
+        cache.store([1.0, 0.0, 0.0], self.SUMMER, self.RESPONSE)
+        assert cache.lookup([0.5, 0.5, 0.0], self.SUMMER) is None
+
+    def test_miss_for_different_filters(self):
+        cache = SemanticResponseCache(threshold=0.95)
+        cache.store([1.0, 0.0, 0.0], self.SUMMER, self.RESPONSE)
+        assert cache.lookup([1.0, 0.0, 0.0], {"season": "Winter"}) is None
+        assert cache.lookup([1.0, 0.0, 0.0], None) is None
+
+    def test_entries_expire(self):
+        cache = SemanticResponseCache(ttl=0.01)
+        cache.store([1.0, 0.0], None, self.RESPONSE)
+        time.sleep(0.02)
+        assert cache.lookup([1.0, 0.0], None) is None
+        assert len(cache) == 0
+
+    def test_size_bound_evicts_least_recently_used(self):
+        cache = SemanticResponseCache(threshold=0.99, max_entries=2)
+        cache.store([1.0, 0.0, 0.0], None, {"response": "a"})
+        cache.store([0.0, 1.0, 0.0], None, {"response": "b"})
+        cache.lookup([1.0, 0.0, 0.0], None)
+        cache.store([0.0, 0.0, 1.0], None, {"response": "c"})
+        assert len(cache) == 2
+        assert cache.lookup([1.0, 0.0, 0.0], None) == {"response": "a"}
+        assert cache.lookup([0.0, 1.0, 0.0], None) is None
+
+    def test_near_duplicate_replaces_entry(self):
+        cache = SemanticResponseCache(threshold=0.95)
+        cache.store([1.0, 0.0], None, {"response": "old"})
+        cache.store([1.0, 0.01], None, {"response": "new"})
+        assert len(cache) == 1
+        assert cache.lookup([1.0, 0.0], None) == {"response": "new"}
+
+
+class NotModified(Exception):
+    response = {"Error": {"Code": "304"}}
+
+
+class CountingS3Client:
+    def __init__(self):
+        self.calls = []
+
+    def get_object(self, **params):
+        self.calls.append(params)
+        if params.get("IfNoneMatch") == '"e1"':
+            raise NotModified()
+        return {"Body": io.BytesIO(b"jpeg"), "ETag": '"e1"'}
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        return "https://signed"
+
+
+class TestFetcherWithCache:
+    """Tests for CatalogImageFetcher backed by ImageCache."""
+
+    def test_repeat_fetch_skips_s3(self):
+        s3 = CountingS3Client()
+        fetcher = CatalogImageFetcher(s3, cache=ImageCache(disk_dir=None))
+        first = fetcher.get_image_base64("s3://b/1.jpg")
+        second = fetcher.get_image_base64("s3://b/1.jpg")
+        assert first == second
+        assert len(s3.calls) == 1
+
+    def test_stale_entry_is_revalidated_by_etag(self):
+        s3 = CountingS3Client()
+        cache = ImageCache(disk_dir=None, max_age=0)
+        fetcher = CatalogImageFetcher(s3, cache=cache)
+        first = fetcher.get_image_base64("s3://b/1.jpg")
+        before = cache.get("s3://b/1.jpg").stored_at
+        time.sleep(0.01)
+        assert fetcher.get_image_base64("s3://b/1.jpg") == first
+        assert s3.calls[-1]["IfNoneMatch"] == '"e1"'
+        assert cache.get("s3://b/1.jpg").stored_at > before
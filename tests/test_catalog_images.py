@@ -0,0 +1,115 @@
+"""
+Unit tests for the concurrent catalog image fetch stage
+"""
+import base64
+import io
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from src.cache import PresignedUrlCache
+from src.catalog_images import CatalogImageFetcher, credentials_expiry, parse_s3_uri
+
+
+class FakeS3Client:
+    """Minimal stand-in for a boto3 S3 client with a fixed GET latency."""
+
+    def __init__(self, latency=0.2, missing=(), slow=()):
+        self.latency = latency
+        self.missing = set(missing)
+        self.slow = set(slow)
+
+    def get_object(self, Bucket, Key):
+        time.sleep(self.latency * (10 if Key in self.slow else 1))
+        if Key in self.missing:
+            raise KeyError(Key)
+        return {"Body": io.BytesIO(f"jpeg:{Key}".encode())}
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3/{Params['Key']}?expires={ExpiresIn}"
+
+
+URIS = [f"s3://bucket/images/{i}.jpg" for i in range(3)]
+
+
+def test_parse_s3_uri():
+    assert parse_s3_uri("s3://bucket/a/b.jpg") == ("bucket", "a/b.jpg")
+
+
+def test_presigned_urls_expire_with_temporary_credentials():
+    client = FakeS3Client()
+    assert credentials_expiry(client) is None  # static keys
+    expires = datetime.now(timezone.utc) + timedelta(minutes=10)
+    client._request_signer = SimpleNamespace(_credentials=SimpleNamespace(_expiry_time=expires))
+    assert credentials_expiry(client) == pytest.approx(expires.timestamp())
+
+    cache = PresignedUrlCache()
+    CatalogImageFetcher(client, presign_cache=cache).generate_presigned_url(URIS[0])
+    _, valid_until = cache._urls.get((URIS[0], 3600))
+    assert valid_until == pytest.approx(expires.timestamp())
+
+
+def test_fetch_all_runs_concurrently():
+    fetcher = CatalogImageFetcher(FakeS3Client(latency=0.2), pool_size=3, timeout=5)
+    results, wall_time = fetcher.fetch_all(URIS)
+    assert all(r.ok for r in results)
+    assert base64.b64decode(results[1].image_b64) == b"jpeg:images/1.jpg"
+    assert results[1].presigned_url.endswith("images/1.jpg?expires=3600")
+    # k=3 should cost about one GET, not three
+    assert wall_time < 0.45
+
+
+def test_fetch_all_keeps_partial_results():
+    fetcher = CatalogImageFetcher(FakeS3Client(latency=0.01, missing={"images/1.jpg"}), pool_size=3)
+    results, _ = fetcher.fetch_all(URIS)
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].error
+
+
+def test_fetch_all_times_out_slow_objects():
+    fetcher = CatalogImageFetcher(FakeS3Client(latency=0.05, slow={"images/2.jpg"}), pool_size=3, timeout=0.2)
+    results, wall_time = fetcher.fetch_all(URIS)
+    assert [r.ok for r in results] == [True, True, False]
+    assert "timed out" in results[2].error
+    assert wall_time < 0.4
+
+
+def test_fetch_all_times_each_object_from_its_own_start():
+    # 9 objects on 3 threads take three waves of 0.1s; each object alone is well within 0.25s
+    uris = [f"s3://bucket/images/{i}.jpg" for i in range(9)]
+    fetcher = CatalogImageFetcher(FakeS3Client(latency=0.1), pool_size=3, timeout=0.25)
+    results, wall_time = fetcher.fetch_all(uris)
+    assert all(r.ok for r in results)
+    assert wall_time >= 0.3
+
+
+def test_fetch_all_large_batch_gets_every_object():
+    # A /chat/batch image stage: far more objects than threads, each well within its own timeout
+    uris = [f"s3://bucket/images/{i}.jpg" for i in range(300)]
+    fetcher = CatalogImageFetcher(FakeS3Client(latency=0.01), pool_size=10, timeout=0.1)
+    results, _ = fetcher.fetch_all(uris)
+    assert sum(r.ok for r in results) == 300
+
+
+def test_fetch_all_gives_up_on_objects_that_never_start():
+    # Every thread hangs on a slow object, so the queued ones never get a thread
+    uris = [f"s3://bucket/images/{i}.jpg" for i in range(4)]
+    fetcher = CatalogImageFetcher(FakeS3Client(latency=0.2, slow={"images/0.jpg", "images/1.jpg"}),
+                                  pool_size=2, timeout=0.1)
+    results, wall_time = fetcher.fetch_all(uris)
+    assert not any(r.ok for r in results)
+    assert "waiting for a fetch thread" in results[3].error
+    assert wall_time < 0.5
+
+
+def test_fetch_all_prefers_derivatives():
+    s3 = FakeS3Client(latency=0.01, missing={"derived/2.jpg"})
+    fetcher = CatalogImageFetcher(s3, pool_size=3)
+    derivatives = [None, "s3://bucket/derived/1.jpg", "s3://bucket/derived/2.jpg"]
+    results, _ = fetcher.fetch_all(URIS, derivatives)
+    assert base64.b64decode(results[0].image_b64) == b"jpeg:images/0.jpg"
+    assert base64.b64decode(results[1].image_b64) == b"jpeg:derived/1.jpg"
+    # Missing derivative falls back to the original
+    assert base64.b64decode(results[2].image_b64) == b"jpeg:images/2.jpg"
+    # Presigned URLs always point at the originals
+    assert results[1].presigned_url.startswith("https://bucket.s3/images/1.jpg")
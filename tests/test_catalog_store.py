@@ -0,0 +1,133 @@
+"""
+Unit tests for the columnar catalog store
+"""
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+import src.catalog_store as catalog_store
+from src.catalog_store import CatalogStore, build_catalog_store, has_catalog_store, open_catalog_store
+
+STYLES = """id,gender,masterCategory,subCategory,articleType,baseColour,season,year,usage,productDisplayName
+15970,Men,Apparel,Topwear,Shirts,Navy Blue,Fall,2011,Casual,Turtle Check Men Navy Blue Shirt
+39386,Men,Apparel,Bottomwear,Jeans,Blue,Summer,2012,Casual,Peter England Men Party Blue Jeans
+59263,Women,Accessories,Watches,Watches,Silver,Winter,2016,Casual,Titan Women Silver Watch
+21379,Men,Apparel,Bottomwear,Track Pants,Black,Fall,,Casual,Manchester United Men Solid Black Track Pants
+53759,Men,Apparel,Topwear,Tshirts,Grey,Summer,2012,Casual,Puma Men Grey T-shirt, with, extra, commas
+1855,Men,Apparel,Topwear,Tshirts,Grey,Winter,2022,Casual,Inkfruit Mens Chain Reaction T-shirt
+"""
+
+IMAGES = """filename,link
+15970.jpg,http://img/15970.jpg
+39386.jpg,http://img/39386.jpg
+59263.jpg,http://img/59263.jpg
+1855.jpg,http://img/1855.jpg
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    (tmp_path / "styles.csv").write_text(STYLES)
+    (tmp_path / "images.csv").write_text(IMAGES)
+    build_catalog_store(str(tmp_path / "styles.csv"), str(tmp_path / "images.csv"), str(tmp_path / "store"))
+    return CatalogStore(str(tmp_path / "store"))
+
+
+def test_build_skips_malformed_rows(store):
+    assert len(store) == 5
+    assert store.get(53759) is None
+
+
+def test_get_by_id(store):
+    product = store.get(39386)
+    assert product["productDisplayName"] == "Peter England Men Party Blue Jeans"
+    assert product["baseColour"] == "Blue"
+    assert product["year"] == 2012
+    assert product["link"] == "http://img/39386.jpg"
+    assert store.get(1) is None
+    assert store.get("not an id") is None
+
+
+def test_missing_values(store):
+    product = store.get(21379)
+    assert product["year"] is None
+    # No images.csv row: the product is kept without an image
+    assert product["filename"] == ""
+
+
+def test_vectorized_queries(store):
+    assert sorted(store.ids(store.mask(season="Summer"))) == [39386]
+    assert sorted(store.ids(store.mask(season=["Fall", "Winter"], gender="Men"))) == [1855, 15970, 21379]
+    assert list(store.ids(store.mask(year=(2016, None)))) == [59263, 1855]
+    assert not store.mask(season="Monsoon").any()
+    assert store.value_counts("subCategory") == {"Bottomwear": 2, "Topwear": 2, "Watches": 1}
+
+
+def test_columns_are_memory_mapped(store):
+    assert isinstance(store.codes("season"), np.memmap)
+    assert isinstance(store.id_index, np.memmap)
+
+
+def test_rebuild_replaces_store(tmp_path, store):
+    (tmp_path / "styles.csv").write_text(STYLES.splitlines()[0] + "\n1,Men,Apparel,Topwear,Shirts,Red,Fall,2020,Casual,Red Shirt\n")
+    build_catalog_store(str(tmp_path / "styles.csv"), None, str(tmp_path / "store"))
+    rebuilt = CatalogStore(str(tmp_path / "store"))
+    assert len(rebuilt) == 1
+    assert rebuilt.get(1)["productDisplayName"] == "Red Shirt"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["images.csv", "store", "styles.csv"]
+
+
+def test_open_builds_once(tmp_path):
+    (tmp_path / "styles.csv").write_text(STYLES)
+    directory = str(tmp_path / "store")
+    assert open_catalog_store(directory) is None
+    store = open_catalog_store(directory, str(tmp_path / "styles.csv"))
+    assert has_catalog_store(directory)
+    assert len(store) == 5
+
+
+def test_open_rebuilds_when_csv_changes(tmp_path):
+    styles = tmp_path / "styles.csv"
+    styles.write_text(STYLES)
+    directory = str(tmp_path / "store")
+    assert len(open_catalog_store(directory, str(styles))) == 5
+    styles.write_text(STYLES.splitlines()[0] + "\n1,Men,Apparel,Topwear,Shirts,Red,Fall,2020,Casual,Red Shirt\n")
+    store = open_catalog_store(directory, str(styles))
+    assert len(store) == 1
+    assert store.get(1)["productDisplayName"] == "Red Shirt"
+    # Without the CSVs the existing store is used as is
+    assert len(open_catalog_store(directory, str(tmp_path / "missing.csv"))) == 1
+
+
+def test_concurrent_opens_build_once(tmp_path, monkeypatch):
+    (tmp_path / "styles.csv").write_text(STYLES)
+    directory = str(tmp_path / "store")
+    builds = []
+
+    def counting_build(*args):
+        builds.append(args)
+        return build_catalog_store(*args)
+
+    monkeypatch.setattr(catalog_store, "build_catalog_store", counting_build)
+    stores = []
+    threads = [threading.Thread(target=lambda: stores.append(open_catalog_store(directory, str(tmp_path / "styles.csv"))))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert [len(store) for store in stores] == [5] * 4
+    assert sorted(os.listdir(tmp_path)) == ["store", "store.lock", "styles.csv"]
+
+
+def test_importable_without_fcntl():
+    # Windows has no fcntl; the lock falls back to msvcrt and only the build path needs it
+    script = ("import sys; sys.modules['fcntl'] = None; "
+              "import src.catalog_store, src.components; print('ok')")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,113 @@
+"""
+Unit tests for executors and admission control
+"""
+import asyncio
+import contextvars
+import time
+import pytest
+from src.concurrency import ConcurrencyLimiter, Overloaded, RateLimiter, run_cpu, run_io
+
+
+def test_blocking_calls_do_not_block_event_loop():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(run_io(time.sleep, 0.1), run_cpu(time.sleep, 0.1))
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
+
+
+def test_executor_calls_keep_context_vars():
+    var = contextvars.ContextVar("trace_parent", default=None)
+
+    async def main():
+        var.set("parent-run")
+        return await run_io(var.get)
+
+    assert asyncio.run(main()) == "parent-run"
+
+
+def test_limiter_rejects_when_queue_full():
+    async def main():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter:
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        assert limiter.waiting == 1
+
+        start = time.perf_counter()
+        with pytest.raises(Overloaded):
+            async with limiter:
+                pass
+        assert time.perf_counter() - start < 0.05
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+
+    asyncio.run(main())
+
+
+def test_limiter_times_out_queued_requests():
+    async def main():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=5, queue_timeout=0.05)
+        async with limiter:
+            with pytest.raises(Overloaded):
+                async with limiter:
+                    pass
+        assert limiter.waiting == 0
+        # Slot is free again once the holder exits
+        async with limiter:
+            pass
+
+    asyncio.run(main())
+
+
+def test_rate_limiter_spaces_call_starts():
+    async def main():
+        limiter = RateLimiter(rate_per_second=50, max_concurrent=10)
+        starts = []
+
+        async def call():
+            async with limiter:
+                starts.append(time.perf_counter())
+
+        await asyncio.gather(*(call() for _ in range(5)))
+        return starts
+
+    starts = sorted(asyncio.run(main()))
+    # 5 starts at 50/s take at least 4 intervals of 20ms
+    assert starts[-1] - starts[0] >= 0.075
+
+
+def test_rate_limiter_caps_concurrency():
+    async def main():
+        limiter = RateLimiter(rate_per_second=0, max_concurrent=2)
+        active = peak = 0
+
+        async def call():
+            nonlocal active, peak
+            async with limiter:
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak
+
+    assert asyncio.run(main()) == 2
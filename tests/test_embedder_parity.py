@@ -0,0 +1,42 @@
+"""
+Unit tests for the embedder parity metrics
+"""
+import numpy as np
+import pytest
+from src.embedder_parity import cosine_agreement, top_k_overlap, measure_latency
+
+
+class TestParityMetrics:
+    """Tests for the parity check helpers."""
+
+    def setup_method(self):
+        rng = np.random.default_rng(0)
+        self.catalog = rng.normal(size=(200, 16)).astype(np.float32)
+        self.queries = rng.normal(size=(20, 16)).astype(np.float32)
+
+    def test_identical_embeddings_agree(self):
+        report = cosine_agreement(self.queries, self.queries.copy())
+        assert report["mean"] == pytest.approx(1.0)
+        assert top_k_overlap(self.queries, self.queries, self.catalog, k=5) == 1.0
+
+    def test_small_noise_keeps_high_agreement(self):
+        noisy = self.queries + 0.01 * np.random.default_rng(1).normal(size=self.queries.shape)
+        report = cosine_agreement(self.queries, noisy)
+        assert report["min"] > 0.99
+        assert top_k_overlap(self.queries, noisy, self.catalog, k=5) > 0.8
+
+    def test_unrelated_embeddings_disagree(self):
+        report = cosine_agreement(self.queries, -self.queries)
+        assert report["mean"] == pytest.approx(-1.0)
+        assert top_k_overlap(self.queries, -self.queries, self.catalog, k=5) == 0.0
+
+    def test_measure_latency(self):
+        class Embedder:
+            def embed_documents(self, texts):
+                return [[0.0] for _ in texts]
+
+            def embed_query(self, text):
+                return [0.0]
+
+        report = measure_latency(Embedder(), ["a", "b", "c"], runs=5, batch_size=2)
+        assert set(report) == {"p50_ms", "p99_ms", "batch_texts_per_s"}
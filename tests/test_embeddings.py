@@ -0,0 +1,73 @@
+"""
+Unit tests for the embedding micro-batcher
+"""
+import threading
+import time
+import pytest
+from src.embeddings import EmbeddingBatcher
+
+
+class SlowEmbedder:
+    """Records each batch and takes a fixed time per forward pass."""
+
+    def __init__(self, latency=0.02, fail_on=None):
+        self.latency = latency
+        self.fail_on = fail_on
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.latency)
+        if self.fail_on in texts:
+            raise RuntimeError("encode failed")
+        return [[float(len(t))] for t in texts]
+
+
+def _embed_concurrently(batcher, texts):
+    results = {}
+
+    def worker(text):
+        results[text] = batcher.embed_query(text)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_queries_share_a_batch():
+    model = SlowEmbedder()
+    batcher = EmbeddingBatcher(model, max_batch_size=16, max_wait_ms=50)
+    texts = [f"query {'x' * i}" for i in range(8)]
+    results = _embed_concurrently(batcher, texts)
+    assert all(results[t] == [float(len(t))] for t in texts)
+    assert len(model.batches) < len(texts)
+    batcher.close()
+
+
+def test_batch_size_is_capped():
+    model = SlowEmbedder(latency=0)
+    batcher = EmbeddingBatcher(model, max_batch_size=3, max_wait_ms=20)
+    vectors = batcher.embed_documents([f"t{i}" for i in range(7)])
+    assert len(vectors) == 7
+    assert max(len(b) for b in model.batches) <= 3
+    batcher.close()
+
+
+def test_single_query_waits_at_most_max_wait():
+    batcher = EmbeddingBatcher(SlowEmbedder(latency=0), max_wait_ms=10)
+    start = time.perf_counter()
+    assert batcher.embed_query("red shoes") == [9.0]
+    assert time.perf_counter() - start < 0.2
+    batcher.close()
+
+
+def test_failure_is_sent_to_every_caller_in_batch():
+    batcher = EmbeddingBatcher(SlowEmbedder(latency=0, fail_on="bad"), max_wait_ms=10)
+    with pytest.raises(RuntimeError):
+        batcher.embed_documents(["good", "bad"])
+    # The worker keeps serving after a failed batch
+    assert batcher.embed_query("good") == [4.0]
+    batcher.close()
@@ -0,0 +1,172 @@
+"""
+Unit tests for incremental guardrail statistics
+"""
+import json
+import logging
+from src.guardrails.stats import (
+    GuardrailStats, StatsHandler, WorkerGuardrailStats, compact_worker_stats, scan_log_file
+)
+from src.log_pipeline import BatchedRotatingFileHandler
+
+
+def _line(event_type, rule, **extra):
+    event = {"event_type": event_type, "rule": rule, "details": {}, **extra}
+    return f"2025-12-05 00:37:23,506 - WARNING - {json.dumps(event)}\n"
+
+
+class _Event:
+    def __init__(self, event):
+        self.event = event
+
+    def __str__(self):
+        return json.dumps(self.event)
+
+
+def _pipeline(tmp_path, max_bytes=0):
+    log_file = tmp_path / "guardrails.log"
+    stats = GuardrailStats(log_file, tmp_path / "stats.json", checkpoint_interval=0)
+    file_handler = BatchedRotatingFileHandler(log_file, max_bytes=max_bytes, backup_count=3)
+    logger = logging.getLogger(f"test.stats.{tmp_path.name}")
+    logger.propagate = False
+    logger.handlers = [file_handler, StatsHandler(stats, file_handler)]
+    return stats, logger, file_handler
+
+
+def _log(logger, handler, event_type, rule):
+    logger.warning("%s", _Event({"event_type": event_type, "rule": rule}))
+    handler.flush()
+    for h in logger.handlers[1:]:
+        h.flush()
+
+
+def test_counts_by_event_type_and_rule(tmp_path):
+    stats = GuardrailStats(tmp_path / "guardrails.log")
+    stats.record("INPUT_BLOCKED", "PII_DETECTED")
+    stats.record("INPUT_BLOCKED", "PROMPT_INJECTION")
+    stats.record("OUTPUT_WARNING", "HALLUCINATION")
+    stats.record("INPUT_PASSED", "ALL_CHECKS")
+    snapshot = stats.snapshot()
+    assert snapshot["total_events"] == 4
+    assert snapshot["blocked_inputs"] == 2
+    assert snapshot["warnings"] == 1
+    assert snapshot["by_rule"]["PII_DETECTED"] == 1
+
+
+def test_backfills_existing_log_without_checkpoint(tmp_path):
+    log_file = tmp_path / "guardrails.log"
+    log_file.write_text(_line("INPUT_BLOCKED", "PII_DETECTED") + _line("OUTPUT_BLOCKED", "TOXICITY")
+                        + _line("INPUT_PASSED", "ALL_CHECKS", sample_rate=0.1))
+    snapshot = GuardrailStats(log_file, tmp_path / "stats.json").snapshot()
+    assert snapshot["blocked_inputs"] == 1
+    assert snapshot["blocked_outputs"] == 1
+    # A sampled pass line stands for 1 / sample_rate events
+    assert snapshot["by_event_type"]["INPUT_PASSED"] == 10
+
+
+def test_restart_replays_only_lines_after_checkpoint(tmp_path):
+    stats, logger, handler = _pipeline(tmp_path)
+    for _ in range(3):
+        _log(logger, handler, "INPUT_BLOCKED", "PII_DETECTED")
+    # Written after the last checkpoint (e.g. crash before the next one)
+    with open(tmp_path / "guardrails.log", "a") as f:
+        f.write(_line("OUTPUT_BLOCKED", "TOXICITY"))
+    handler.close()
+
+    restored = GuardrailStats(tmp_path / "guardrails.log", tmp_path / "stats.json").snapshot()
+    assert restored["blocked_inputs"] == 3
+    assert restored["blocked_outputs"] == 1
+
+
+def test_restart_follows_rotation(tmp_path):
+    stats, logger, handler = _pipeline(tmp_path, max_bytes=300)
+    _log(logger, handler, "INPUT_BLOCKED", "PII_DETECTED")
+    # Stop checkpointing, then log enough to rotate the checkpointed file away to .1
+    stats.checkpoint_interval = 3600
+    for _ in range(5):
+        _log(logger, handler, "OUTPUT_BLOCKED", "TOXICITY")
+    handler.close()
+    assert (tmp_path / "guardrails.log.1").exists()
+
+    restored = GuardrailStats(tmp_path / "guardrails.log", tmp_path / "stats.json").snapshot()
+    assert restored["blocked_inputs"] == 1
+    assert restored["blocked_outputs"] == 5
+
+
+def test_scan_log_file(tmp_path):
+    log_file = tmp_path / "other.log"
+    log_file.write_text(_line("OUTPUT_WARNING", "OFF_TOPIC") + "not json\n")
+    assert scan_log_file(log_file)["warnings"] == 1
+
+
+def _worker(log_dir, pid):
+    stats = WorkerGuardrailStats(log_dir, pid=pid, checkpoint_interval=0)
+    file_handler = BatchedRotatingFileHandler(stats.log_file, max_bytes=0, backup_count=3)
+    logger = logging.getLogger(f"test.stats.{log_dir.name}.{pid}")
+    logger.propagate = False
+    logger.handlers = [file_handler, StatsHandler(stats, file_handler)]
+    return stats, logger, file_handler
+
+
+def test_workers_sum_each_others_counts(tmp_path):
+    first, first_logger, first_handler = _worker(tmp_path, 101)
+    second, second_logger, second_handler = _worker(tmp_path, 102)
+    for _ in range(2):
+        _log(first_logger, first_handler, "INPUT_BLOCKED", "PII_DETECTED")
+    _log(second_logger, second_handler, "OUTPUT_BLOCKED", "TOXICITY")
+    # Logged by the second worker after its last checkpoint: the first sees it by replaying the log
+    second.checkpoint_interval = 3600
+    _log(second_logger, second_handler, "INPUT_BLOCKED", "PROMPT_INJECTION")
+
+    assert first.log_file != second.log_file
+    for stats in (first, second):
+        snapshot = stats.snapshot()
+        assert snapshot["blocked_inputs"] == 3
+        assert snapshot["blocked_outputs"] == 1
+        assert snapshot["by_rule"] == {"PII_DETECTED": 2, "TOXICITY": 1, "PROMPT_INJECTION": 1}
+
+
+def test_restart_compacts_previous_workers(tmp_path):
+    first, first_logger, first_handler = _worker(tmp_path, 101)
+    second, second_logger, second_handler = _worker(tmp_path, 102)
+    _log(first_logger, first_handler, "INPUT_BLOCKED", "PII_DETECTED")
+    _log(second_logger, second_handler, "INPUT_BLOCKED", "PII_DETECTED")
+    first_handler.close()
+    second_handler.close()
+
+    assert compact_worker_stats(tmp_path) == 2
+    assert compact_worker_stats(tmp_path) == 0
+    # A new worker reusing an old pid starts from an empty log of its own
+    restarted, logger, handler = _worker(tmp_path, 101)
+    assert restarted.counts() == ({}, {})
+    _log(logger, handler, "OUTPUT_BLOCKED", "TOXICITY")
+    snapshot = restarted.snapshot()
+    assert snapshot["blocked_inputs"] == 2
+    assert snapshot["blocked_outputs"] == 1
+
+
+def test_other_workers_are_reread_once_per_interval(tmp_path):
+    first, first_logger, first_handler = _worker(tmp_path, 101)
+    second, second_logger, second_handler = _worker(tmp_path, 102)
+    first.checkpoint_interval = 3600
+    assert first.snapshot()["blocked_inputs"] == 0
+    _log(second_logger, second_handler, "INPUT_BLOCKED", "PII_DETECTED")
+    _log(first_logger, first_handler, "INPUT_BLOCKED", "PII_DETECTED")
+    # Its own counts are live; the other worker's are cached until the next interval
+    assert first.snapshot()["blocked_inputs"] == 1
+    first._others_read_at -= 3600
+    assert first.snapshot()["blocked_inputs"] == 2
+
+
+def test_compaction_keeps_logs_of_the_last_runs(tmp_path):
+    for name in ("guardrails.7-20200101000000.log", "guardrails.7-20200101000000.log.1",
+                 "guardrails.8-20210101000000.log"):
+        (tmp_path / name).write_text(_line("INPUT_BLOCKED", "PII_DETECTED"))
+    _, logger, handler = _worker(tmp_path, 101)
+    _log(logger, handler, "INPUT_BLOCKED", "PII_DETECTED")
+    handler.close()
+
+    assert compact_worker_stats(tmp_path, keep_runs=2) == 1
+    retired = sorted(path.name for path in tmp_path.glob("guardrails.*-*.log*"))
+    assert len(retired) == 2
+    assert retired[1] == "guardrails.8-20210101000000.log"
+    assert retired[0].startswith("guardrails.101-")
@@ -0,0 +1,56 @@
+"""
+Unit tests for ingest-time image derivatives
+"""
+import io
+from PIL import Image
+from src.image_derivatives import DerivativeReport, build_derivative, derivative_key, make_derivative
+
+
+def _jpeg(size, quality=95):
+    image = Image.new("RGB", size)
+    for x in range(0, size[0], 7):
+        for y in range(0, size[1], 5):
+            image.putpixel((x, y), ((x * 3) % 256, (y * 5) % 256, (x + y) % 256))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return image, buffer.getvalue()
+
+
+def test_derivative_key():
+    assert derivative_key(15970, "style-sync/derived/") == "style-sync/derived/15970.jpg"
+
+
+def test_make_derivative_bounds_longest_side():
+    image, _ = _jpeg((1800, 2400))
+    derivative = Image.open(io.BytesIO(make_derivative(image, max_side=512, quality=80)))
+    assert derivative.format == "JPEG"
+    assert derivative.size == (384, 512)
+
+
+def test_make_derivative_never_upscales():
+    image, _ = _jpeg((200, 100))
+    assert Image.open(io.BytesIO(make_derivative(image, max_side=512))).size == (200, 100)
+
+
+def test_build_derivative_skips_when_not_smaller():
+    image, original = _jpeg((1200, 1600))
+    assert len(build_derivative(image, original, max_side=512)) < len(original)
+    small, small_bytes = _jpeg((64, 64), quality=20)
+    assert build_derivative(small, small_bytes, max_side=512, quality=95) is None
+
+
+def test_report(tmp_path):
+    report = DerivativeReport()
+    report.add(1, 100_000, 20_000)
+    report.add(2, 50_000, 10_000)
+    summary = report.summary()
+    assert summary["saved_bytes"] == 120_000
+    assert summary["saved_ratio"] == 0.8
+
+    path = tmp_path / "report.csv"
+    report.write_csv(str(path))
+    report.write_csv(str(path))
+    lines = path.read_text().splitlines()
+    assert lines[0].startswith("id,original_bytes")
+    assert lines[1] == "1,100000,20000,80000,0.8000"
+    assert len(lines) == 5
@@ -0,0 +1,93 @@
+"""
+Unit tests for the async log pipeline
+"""
+import logging
+import threading
+from src.log_pipeline import AsyncHandler, AsyncLogWriter, BatchedRotatingFileHandler
+from src.guardrails.logger import GuardrailLogger, guardrail_logger
+
+
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+        self.flushes = 0
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+        self.threads.add(threading.current_thread().name)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def test_records_are_formatted_on_writer_thread_in_batches():
+    writer = AsyncLogWriter(batch_size=100)
+    sink = CountingHandler()
+    logger = _logger("test.async", AsyncHandler(sink, writer=writer))
+    for i in range(50):
+        logger.info("event %d", i)
+    writer.close()
+    assert sink.records == [f"event {i}" for i in range(50)]
+    assert sink.threads == {"log-writer"}
+    assert sink.flushes < 50
+
+
+def test_full_queue_drops_instead_of_blocking():
+    writer = AsyncLogWriter(max_queue=1)
+    gate = threading.Event()
+
+    class Blocking(CountingHandler):
+        def emit(self, record):
+            gate.wait()
+            super().emit(record)
+
+    logger = _logger("test.drop", AsyncHandler(Blocking(), writer=writer))
+    for i in range(20):
+        logger.info("event %d", i)
+    assert writer.dropped > 0
+    gate.set()
+    writer.close()
+
+
+def test_rotates_by_size(tmp_path):
+    path = tmp_path / "app.log"
+    handler = BatchedRotatingFileHandler(path, max_bytes=200, backup_count=2)
+    logger = _logger("test.rotate", handler)
+    for i in range(30):
+        logger.info("x" * 40)
+    handler.flush()
+    assert (tmp_path / "app.log.1").exists()
+    assert path.stat().st_size <= 200
+
+
+def test_disabled_level_skips_serialization(monkeypatch):
+    import src.guardrails.logger as guardrails_logging
+
+    def explode(event):
+        raise AssertionError("serialized")
+
+    monkeypatch.setattr(guardrails_logging, "_JsonEvent", explode)
+    guardrail_logger.setLevel(logging.ERROR)
+    try:
+        GuardrailLogger().log_event("INPUT_BLOCKED", "PII_DETECTED", "q", {})
+    finally:
+        guardrail_logger.setLevel(logging.INFO)
+
+
+def test_pass_events_are_sampled(monkeypatch):
+    logged = []
+    monkeypatch.setattr(guardrail_logger, "log", lambda level, fmt, event: logged.append(event))
+    GuardrailLogger(pass_sample_rate=0).log_event("INPUT_PASSED", "ALL_CHECKS", "q", {})
+    assert logged == []
+    GuardrailLogger(pass_sample_rate=1).log_event("INPUT_PASSED", "ALL_CHECKS", "q", {})
+    assert len(logged) == 1 and logged[0].event["sample_rate"] == 1
@@ -1,8 +1,14 @@
 """
 Unit tests for metrics module
 """
+import os
+import subprocess
+import sys
+
 import pytest
-from src.metrics import MetricsTracker, create_metrics_tracker
+from prometheus_client import REGISTRY
+from src import metrics
+from src.metrics import MetricsTracker, cleanup_dead_workers, create_metrics_tracker
 
 
 class TestMetricsTracker:
@@ -30,6 +36,16 @@ class TestMetricsTracker:
         assert tracker.generation_time == 2.0
         assert tracker.input_tokens == 100
         assert tracker.output_tokens == 200
+
+    def test_cost_is_labelled_with_the_configured_model(self):
+        def cost(model):
+            return REGISTRY.get_sample_value('llm_cost_usd_total', {'model': model}) or 0
+
+        before = cost('gemini-2.5-flash')
+        MetricsTracker().track_generation(1.0, input_tokens=1000, output_tokens=1000, model='gemini-2.5-flash')
+        assert cost('gemini-2.5-flash') - before == pytest.approx(0.00075)
+        MetricsTracker().track_generation(1.0, input_tokens=1000, output_tokens=1000, model='gemini-unpriced')
+        assert cost('gemini-unpriced') == 0
     
     def test_track_guardrail_passed(self):
         tracker = MetricsTracker()
@@ -40,3 +56,82 @@ class TestMetricsTracker:
         tracker = MetricsTracker()
         tracker.track_guardrail('input', 'pii', False)
         # Should not raise
+    
+    def test_track_first_byte(self):
+        tracker = MetricsTracker(endpoint='/chat/stream')
+        tracker.start_request()
+        tracker.track_first_byte('items')
+        tracker.end_request('success')
+        # Should not raise
+    
+    def test_span_records_stage(self):
+        tracker = MetricsTracker(endpoint='/test-span')
+        with tracker.span('filter_routing'):
+            pass
+        tracker.track_retrieval(0.25)
+        assert set(tracker.stage_times) == {'filter_routing', 'chroma_search'}
+        assert tracker.stage_times['chroma_search'] == 0.25
+        count = REGISTRY.get_sample_value(
+            'request_stage_latency_seconds_count', {'endpoint': '/test-span', 'stage': 'chroma_search'}
+        )
+        assert count == 1
+    
+    def test_span_records_on_error(self):
+        tracker = MetricsTracker()
+        try:
+            with tracker.span('gemini'):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        assert 'gemini' in tracker.stage_times
+
+    def test_unknown_stage_is_rejected(self):
+        tracker = MetricsTracker()
+        with pytest.raises(ValueError):
+            tracker.track_stage('vector_search', 0.1)
+        with pytest.raises(ValueError):
+            with tracker.span('vector_search'):
+                pass
+        assert tracker.stage_times == {}
+
+
+class TestMultiprocessMetrics:
+    """Tests for multiprocess (PROMETHEUS_MULTIPROC_DIR) mode."""
+
+    WORKER = (
+        "import sys; from prometheus_client import Counter, Gauge; "
+        "Counter('mp_test_requests', 'test').inc(int(sys.argv[1])); "
+        "Gauge('mp_test_active', 'test', multiprocess_mode='livesum').set(1)"
+    )
+
+    def _run_worker(self, directory, increment):
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(directory))
+        subprocess.run([sys.executable, "-c", self.WORKER, str(increment)], env=env, check=True)
+
+    def test_cleanup_removes_live_gauges_of_dead_workers(self, tmp_path):
+        self._run_worker(tmp_path, 1)
+        names = sorted(p.name for p in tmp_path.iterdir())
+        assert any(n.startswith('gauge_livesum_') for n in names)
+        dead = cleanup_dead_workers(str(tmp_path))
+        assert len(dead) == 1
+        remaining = sorted(p.name for p in tmp_path.iterdir())
+        assert not any(n.startswith('gauge_livesum_') for n in remaining)
+        assert any(n.startswith('counter_') for n in remaining)
+
+    def test_cleanup_keeps_live_workers(self, tmp_path):
+        (tmp_path / f'gauge_livesum_{os.getpid()}.db').write_bytes(b'')
+        assert cleanup_dead_workers(str(tmp_path)) == []
+        assert (tmp_path / f'gauge_livesum_{os.getpid()}.db').exists()
+
+    def test_payload_aggregates_workers(self, tmp_path, monkeypatch):
+        self._run_worker(tmp_path, 2)
+        self._run_worker(tmp_path, 3)
+        monkeypatch.setattr(metrics, 'PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+        payload = metrics.metrics_payload().decode()
+        assert 'mp_test_requests_total 5.0' in payload
+        # Both workers have exited, so their in-flight gauge no longer counts
+        assert 'mp_test_active 1.0' not in payload
+
+    def test_payload_single_process(self, monkeypatch):
+        monkeypatch.setattr(metrics, 'PROMETHEUS_MULTIPROC_DIR', None)
+        assert b'llm_active_requests' in metrics.metrics_payload()
@@ -0,0 +1,37 @@
+"""
+Unit tests for product quantization
+"""
+import numpy as np
+import pytest
+
+from src.quantization import ProductQuantizer
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 16))
+    vectors = centers[rng.integers(20, size=1000)] + 0.2 * rng.normal(size=(1000, 16))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_encode_decode(vectors):
+    pq = ProductQuantizer.train(vectors, n_subspaces=4, iterations=10)
+    codes = pq.encode(vectors, batch_size=300)
+    assert codes.shape == (1000, 4) and codes.dtype == np.uint8
+    error = np.linalg.norm(pq.decode(codes) - vectors, axis=1).mean()
+    assert error < 0.3
+
+
+def test_lookup_scores_equal_decoded_dot_products(vectors):
+    pq = ProductQuantizer.train(vectors, n_subspaces=8, iterations=5)
+    codes = pq.encode(vectors)
+    queries = vectors[:3]
+    scores = pq.scores(pq.lookup_tables(queries), codes, batch_size=128)
+    assert scores.shape == (3, 1000)
+    assert np.allclose(scores, queries @ pq.decode(codes).T, atol=1e-5)
+
+
+def test_dim_must_split_into_subspaces(vectors):
+    with pytest.raises(ValueError):
+        ProductQuantizer.train(vectors, n_subspaces=5)
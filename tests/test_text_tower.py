@@ -0,0 +1,50 @@
+"""
+Unit tests for the text-tower artifact helpers
+"""
+import inspect
+import json
+import pytest
+from src.text_tower import select_text_tower_state, has_text_tower, read_config, CONFIG_FILE, WEIGHTS_FILE, VOCAB_FILE
+
+
+def test_select_text_tower_state_drops_vision_tower():
+    state = {
+        "visual.conv1.weight": 1,
+        "logit_scale": 2,
+        "token_embedding.weight": 3,
+        "positional_embedding": 4,
+        "transformer.resblocks.0.attn.in_proj_weight": 5,
+        "ln_final.weight": 6,
+        "text_projection": 7,
+    }
+    assert select_text_tower_state(state) == {
+        "token_embedding.weight": 3,
+        "positional_embedding": 4,
+        "transformer.resblocks.0.attn.in_proj_weight": 5,
+        "ln_final.weight": 6,
+        "text_projection": 7,
+    }
+
+
+def test_select_text_tower_state_custom_text_layout():
+    state = {"visual.trunk.weight": 1, "text.transformer.weight": 2, "text.proj": 3, "logit_scale": 4}
+    assert select_text_tower_state(state) == {"transformer.weight": 2, "proj": 3}
+
+
+def test_has_text_tower(tmp_path):
+    assert not has_text_tower(str(tmp_path))
+    (tmp_path / CONFIG_FILE).write_text(json.dumps({"model_name": "ViT-B-32", "checkpoint": "x"}))
+    (tmp_path / WEIGHTS_FILE).write_bytes(b"")
+    assert not has_text_tower(str(tmp_path))
+    (tmp_path / VOCAB_FILE).write_bytes(b"")
+    assert has_text_tower(str(tmp_path))
+    assert read_config(str(tmp_path))["model_name"] == "ViT-B-32"
+
+
+def test_open_clip_still_has_private_text_tower_builder():
+    open_clip_model = pytest.importorskip("open_clip.model")
+    assert hasattr(open_clip_model, "_build_text_tower"), (
+        "load_text_tower relies on open_clip.model._build_text_tower, which this open_clip_torch no "
+        "longer has; keep the version pinned in requirements.txt or port load_text_tower")
+    parameters = inspect.signature(open_clip_model._build_text_tower).parameters
+    assert list(parameters)[:3] == ["embed_dim", "text_cfg", "quick_gelu"]
@@ -0,0 +1,150 @@
+"""
+Unit tests for the attribute bitmap index
+"""
+import numpy as np
+import pytest
+
+from src.vector_index import VectorIndex, build_vector_index, has_vector_index
+
+SEASONS = ["Summer", "Winter", "Fall", "Spring"]
+GENDERS = ["Men", "Women"]
+
+
+class FakeCollection:
+    """Chroma-like collection with paged get()."""
+
+    def __init__(self, n=200, dim=8, seed=0):
+        rng = np.random.default_rng(seed)
+        self.embeddings = rng.normal(size=(n, dim)).astype(np.float32)
+        self.metadatas = [{
+            "id": i,
+            "season": SEASONS[i % 4],
+            "gender": GENDERS[i % 2],
+            "year": float(2010 + i % 14),  # pandas writes years as floats when a value is missing
+            "baseColour": "Black" if i % 10 == 0 else "Blue",
+            "productDisplayName": f"Item {i}",
+        } for i in range(n)]
+
+    def count(self):
+        return len(self.metadatas)
+
+    def get(self, include, limit, offset):
+        rows = range(offset, min(offset + limit, len(self.metadatas)))
+        return {
+            "ids": [str(i) for i in rows],
+            "embeddings": [self.embeddings[i] for i in rows],
+            "metadatas": [self.metadatas[i] for i in rows],
+            "documents": [f"caption {i}" for i in rows],
+        }
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection()
+
+
+@pytest.fixture
+def index(tmp_path, collection):
+    build_vector_index(collection, str(tmp_path / "index"), page_size=64)
+    return VectorIndex(str(tmp_path / "index"))
+
+
+def expected(collection, predicate):
+    return [i for i, m in enumerate(collection.metadatas) if predicate(m)]
+
+
+def test_build(tmp_path, index):
+    assert has_vector_index(str(tmp_path / "index"))
+    assert len(index) == 200
+    assert np.allclose(np.linalg.norm(index.embeddings, axis=1), 1.0)
+
+
+def test_equality_filters(index, collection):
+    assert list(index.candidates({"season": "Winter"})) == expected(collection, lambda m: m["season"] == "Winter")
+    assert list(index.candidates({"season": {"$in": ["Fall", "Spring"]}})) == \
+        expected(collection, lambda m: m["season"] in ("Fall", "Spring"))
+    assert len(index.candidates({"season": "Monsoon"})) == 0
+
+
+def test_year_range_and_conjunction(index, collection):
+    filters = {"$and": [{"year": {"$gte": 2022}}, {"season": "Summer"}]}
+    assert list(index.candidates(filters)) == \
+        expected(collection, lambda m: m["year"] >= 2022 and m["season"] == "Summer")
+    assert list(index.candidates({"year": 2015})) == expected(collection, lambda m: m["year"] == 2015)
+
+
+def test_unsupported_filters_fall_back(index):
+    assert index.candidates(None) is None
+    assert index.candidates({"usage": "Casual"}) is None
+    assert index.candidates({"season": {"$ne": "Winter"}}) is None
+
+
+def test_exact_search_matches_brute_force(index, collection):
+    query = collection.embeddings[7] + 0.1
+    candidates = index.candidates({"baseColour": "Black"})
+    positions, scores = index.search(query, 3, candidates)
+
+    normalized = collection.embeddings / np.linalg.norm(collection.embeddings, axis=1, keepdims=True)
+    brute = normalized[candidates] @ (query / np.linalg.norm(query))
+    assert list(positions) == list(candidates[np.argsort(-brute)[:3]])
+    assert scores[0] >= scores[1] >= scores[2]
+
+
+def test_selective_filter_returns_k(index):
+    candidates = index.candidates({"$and": [{"year": {"$gte": 2023}}, {"season": "Winter"}]})
+    assert 3 <= len(candidates) < 20
+    positions, _ = index.search(np.ones(8), 3, candidates)
+    assert len(positions) == 3
+    assert set(positions) <= set(candidates)
+
+
+def test_documents(index):
+    docs = index.documents([5])
+    assert docs[0].page_content == "caption 5"
+    assert docs[0].metadata["productDisplayName"] == "Item 5"
+
+
+def test_search_many_matches_search(index, collection):
+    queries = collection.embeddings[:5] + 0.05
+    candidates = index.candidates({"season": "Fall"})
+    for positions in (None, candidates):
+        many = index.search_many(queries, 4, positions)
+        assert [list(rows) for rows in many] == [list(index.search(q, 4, positions)[0]) for q in queries]
+
+
+def _recall(index, exact, queries, k=10):
+    found = index.search_many(queries, k)
+    truth = exact.search_many(queries, k)
+    return np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+
+
+def test_float16_storage(tmp_path, index, collection):
+    build_vector_index(collection, str(tmp_path / "f16"), storage="float16")
+    compressed = VectorIndex(str(tmp_path / "f16"))
+    assert compressed.storage == "float16" and compressed.embeddings.dtype == np.float16
+    assert _recall(compressed, index, collection.embeddings[:20]) >= 0.95
+    # Filters and documents are unaffected
+    assert list(compressed.candidates({"season": "Winter"})) == list(index.candidates({"season": "Winter"}))
+
+
+def test_pq_storage_reranks_shortlist(tmp_path):
+    collection = FakeCollection(n=600, dim=16, seed=3)
+    build_vector_index(collection, str(tmp_path / "exact"))
+    build_vector_index(collection, str(tmp_path / "pq"), storage="pq", pq_subspaces=4)
+    exact = VectorIndex(str(tmp_path / "exact"))
+    compressed = VectorIndex(str(tmp_path / "pq"), rerank_candidates=100)
+    assert compressed.codes.shape == (600, 4) and compressed.codes.dtype == np.uint8
+
+    queries = collection.embeddings[:20] + 0.1
+    assert _recall(compressed, exact, queries) >= 0.8
+    # A shortlist covering every row is an exact (float16) search
+    compressed.rerank_candidates = 600
+    assert _recall(compressed, exact, queries) >= 0.95
+    # Re-ranked scores are exact, so they are sorted
+    _, scores = compressed.search(queries[0], 5)
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_unknown_storage(tmp_path, collection):
+    with pytest.raises(ValueError):
+        build_vector_index(collection, str(tmp_path / "bad"), storage="int4")
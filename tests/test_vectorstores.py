@@ -0,0 +1,104 @@
+"""
+Unit tests for the pluggable vector backends
+"""
+import numpy as np
+import pytest
+
+from src.components import Components
+from src.vector_index import VectorIndex, build_vector_index
+from src.vectorstores import ChromaBackend, NumpyBackend, VectorBackend
+from tests.test_vector_index import FakeCollection
+
+
+class FakeDoc:
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+class FakeChroma:
+    def __init__(self, collection):
+        self._collection = collection
+        self.searches = []
+
+    def similarity_search_by_vector(self, embedding, k=3, filter=None):
+        self.searches.append(filter)
+        return [FakeDoc({"id": i}) for i in range(k)]
+
+
+@pytest.fixture
+def collection():
+    return FakeCollection(n=300, dim=16, seed=1)
+
+
+@pytest.fixture
+def index(tmp_path, collection):
+    build_vector_index(collection, str(tmp_path / "index"))
+    return VectorIndex(str(tmp_path / "index"))
+
+
+def brute_force(collection, query, k, predicate=lambda m: True):
+    rows = [i for i, m in enumerate(collection.metadatas) if predicate(m)]
+    matrix = collection.embeddings[rows]
+    scores = matrix / np.linalg.norm(matrix, axis=1, keepdims=True) @ query
+    return [collection.metadatas[rows[i]]["id"] for i in np.argsort(-scores)[:k]]
+
+
+def test_numpy_backend_exact_top_k(index, collection):
+    backend = NumpyBackend(index)
+    query = collection.embeddings[11]
+    docs = backend.search(query, 5)
+    assert [d.metadata["id"] for d in docs] == brute_force(collection, query, 5)
+    assert docs[0].metadata["id"] == 11
+    assert backend.count() == 300
+
+
+def test_numpy_backend_filters(index, collection):
+    backend = NumpyBackend(index)
+    query = collection.embeddings[3]
+    filters = {"$and": [{"year": {"$gte": 2022}}, {"season": "Winter"}]}
+    docs = backend.search(query, 4, filters)
+    assert [d.metadata["id"] for d in docs] == brute_force(
+        collection, query, 4, lambda m: m["year"] >= 2022 and m["season"] == "Winter")
+    with pytest.raises(ValueError):
+        backend.search(query, 4, {"usage": "Casual"})
+
+
+def test_numpy_backend_search_many_matches_search(index, collection):
+    backend = NumpyBackend(index)
+    queries = collection.embeddings[:6]
+    many = backend.search_many(queries, 3, {"season": "Summer"})
+    single = [backend.search(q, 3, {"season": "Summer"}) for q in queries]
+    assert [[d.metadata["id"] for d in docs] for docs in many] == \
+        [[d.metadata["id"] for d in docs] for docs in single]
+
+
+def test_chroma_backend_prefilters_selective_queries(index, collection):
+    store = FakeChroma(collection)
+    backend = ChromaBackend(store, attribute_index=index, max_exact_candidates=50)
+    query = collection.embeddings[0]
+
+    docs = backend.search(query, 3, {"$and": [{"year": {"$gte": 2022}}, {"season": "Winter"}]})
+    assert len(docs) == 3 and store.searches == []
+    # Too many candidates for an exact scan: ANN with the filter
+    backend.search(query, 3, {"season": "Winter"})
+    assert store.searches == [{"season": "Winter"}]
+    backend.search(query, 3)
+    assert store.searches[-1] is None
+
+
+def test_backends_must_implement_search_and_count():
+    class SearchOnly(VectorBackend):
+        def search(self, query_embedding, k, filters=None):
+            return []
+
+    with pytest.raises(TypeError):
+        SearchOnly()
+
+
+def test_components_select_backend(tmp_path, monkeypatch, index):
+    import src.components
+    monkeypatch.setattr(src.components, "VECTOR_INDEX_DIR", index.directory)
+    assert isinstance(Components(backend="numpy").vector_backend, NumpyBackend)
+    assert isinstance(Components(vectorstore=FakeChroma(None)).vector_backend, ChromaBackend)
+    with pytest.raises(ValueError):
+        Components(backend="faiss")
@@ -0,0 +1,112 @@
+"""
+Unit tests for zero-shot attribute prediction
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.catalog_store import CatalogStore, build_catalog_store
+from src.zero_shot import (
+    PROMPT_TEMPLATES, ZeroShotClassifier, build_label_space, catalog_labels, decode_image
+)
+
+LABELS = {
+    "category": ["Apparel", "Footwear"],
+    "colour": ["Black", "Blue", "Red"],
+}
+# One embedding axis per label
+AXES = {"apparel": 0, "footwear": 1, "black": 2, "blue": 3, "red": 4}
+
+
+class FakeTextEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        vectors = []
+        for text in texts:
+            vector = np.full(len(AXES), 0.01)
+            for word, axis in AXES.items():
+                if word in text:
+                    vector[axis] = 1.0
+            vectors.append(vector.tolist())
+        return vectors
+
+
+def image_with(*words):
+    """Fake image embedding pointing at the given labels."""
+    vector = np.zeros(len(AXES))
+    for word in words:
+        vector[AXES[word]] = 1.0
+    return vector
+
+
+class FakeImageEncoder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, images):
+        self.batches.append(len(images))
+        return np.stack(images)
+
+
+def test_catalog_labels_drops_rare_and_missing(tmp_path):
+    rows = ["1,Apparel,Blue", "2,Apparel,Blue", "3,Footwear,NA", "4,Footwear,NA", "5,Free Items,"]
+    (tmp_path / "styles.csv").write_text("id,masterCategory,baseColour\n" + "\n".join(rows) + "\n")
+    build_catalog_store(str(tmp_path / "styles.csv"), None, str(tmp_path / "store"))
+    labels = catalog_labels(CatalogStore(str(tmp_path / "store")), min_count=2)
+    assert labels == {"category": ["Apparel", "Footwear"], "colour": ["Blue"]}
+
+
+def test_label_space_is_one_normalized_matrix():
+    embedder = FakeTextEmbedder()
+    space = build_label_space(embedder, LABELS, batch_size=4)
+    assert space.matrix.shape == (5, len(AXES))
+    assert np.allclose(np.linalg.norm(space.matrix, axis=1), 1.0)
+    assert space.slices == {"category": slice(0, 2), "colour": slice(2, 5)}
+    # Every label is embedded under every template of its attribute
+    assert sum(embedder.calls) == 2 * len(PROMPT_TEMPLATES["category"]) + 3 * len(PROMPT_TEMPLATES["colour"])
+
+
+def test_predict_batch():
+    space = build_label_space(FakeTextEmbedder(), LABELS)
+    encoder = FakeImageEncoder()
+    classifier = ZeroShotClassifier(encoder, space)
+
+    predictions = classifier.predict([image_with("footwear", "red"), image_with("apparel", "black")])
+    assert encoder.batches == [2]
+    assert [(p["category"], p["colour"]) for p in predictions] == [("Footwear", "Red"), ("Apparel", "Black")]
+    assert all(0.5 < p["scores"]["colour"] <= 1.0 for p in predictions)
+    assert classifier.predict([]) == []
+
+
+def _jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_decode_image_reduces_resolution():
+    image = decode_image(_jpeg(2400, 1800), side=224)
+    assert image.mode == "RGB"
+    assert min(image.size) >= 224
+    assert image.size[0] < 1200
+
+
+def test_decode_image_keeps_small_images():
+    assert decode_image(_jpeg(300, 200), side=224).size == (300, 200)
+
+
+def test_decode_image_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_image(b"not an image")
+
+
+def test_decode_image_rejects_decompression_bombs(monkeypatch):
+    # Over twice MAX_IMAGE_PIXELS PIL refuses to decode; the API must answer 400, not 500
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(ValueError):
+        decode_image(_jpeg(100, 100), side=32)